@@ -1,134 +1,79 @@
-import os
-import time
-import requests
-from dotenv import load_dotenv
-from utils.retry import get_retry_delay
+from agents.fallback import run_with_fallback, arun_with_fallback, stream_with_fallback, response_cache_key
+from utils.cache import cached_call, acached_call
+from utils.providers import (
+    groq_chat, gemini_generate, huggingface_generate, agroq_chat, agemini_generate, ahuggingface_generate,
+    groq_chat_stream, gemini_generate_stream, huggingface_generate_stream
+)
 
-def run_booking_huggingface(input_text):
-    """Using Hugging Face Inference API (Free)"""
-    load_dotenv()
-    
-    API_URL = "https://api-inference.huggingface.co/models/microsoft/DialoGPT-medium"
-    headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY')}"}
-    
-    prompt = f"""As a Travel Booking Specialist, suggest the best travel options for the following itinerary and budget:
-    {input_text}
-    
-    Please provide:
-    1. Recommended flights with estimated prices
-    2. Suggested accommodations with price ranges
-    3. Booking tips and best practices
-    4. Alternative options for different price points
-    5. Links to popular booking platforms
-    6. Seasonal considerations and best booking times
+BOOKING_PROMPT = """As a Travel Booking Specialist, suggest the best travel options for the following itinerary and budget:
+{input_text}
 
-    Format the response in a clear, organized manner with specific recommendations."""
+Please provide:
+1. Recommended flights with estimated prices
+2. Suggested accommodations with price ranges
+3. Booking tips and best practices
+4. Alternative options for different price points
+5. Links to popular booking platforms
+6. Seasonal considerations and best booking times
 
-    payload = {
-        "inputs": prompt,
-        "parameters": {
-            "max_length": 1000,
-            "temperature": 0.7,
-            "do_sample": True
-        }
-    }
+Format the response in a clear, organized manner with specific recommendations."""
 
-    for attempt in range(3):
-        try:
-            response = requests.post(API_URL, headers=headers, json=payload)
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    return result[0].get('generated_text', 'No response generated')
-                return str(result)
-            elif response.status_code == 503:
-                time.sleep(20)  # Model is loading
-                continue
-            else:
-                raise Exception(f"API request failed with status {response.status_code}: {response.text}")
-        except Exception as e:
-            if attempt < 2:
-                time.sleep(get_retry_delay(attempt))
-            else:
-                return f"Error generating booking suggestions: {str(e)}"
+def run_booking_huggingface(input_text):
+    """Using Hugging Face Inference API (Free)"""
+    return huggingface_generate(BOOKING_PROMPT.format(input_text=input_text))
 
 def run_booking_gemini(input_text):
     """Using Google Gemini (Free tier)"""
-    load_dotenv()
-    
-    try:
-        import google.generativeai as genai
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel('gemini-pro')
-        
-        prompt = f"""As a Travel Booking Specialist, suggest the best travel options for the following itinerary and budget:
-        {input_text}
-        
-        Please provide:
-        1. Recommended flights with estimated prices
-        2. Suggested accommodations with price ranges
-        3. Booking tips and best practices
-        4. Alternative options for different price points
-        5. Links to popular booking platforms
-        6. Seasonal considerations and best booking times
-
-        Format the response in a clear, organized manner with specific recommendations."""
-
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Error with Gemini API: {str(e)}"
+    return gemini_generate(BOOKING_PROMPT.format(input_text=input_text))
 
 def run_booking_groq(input_text):
     """Using Groq (Free tier)"""
-    load_dotenv()
-    
-    try:
-        from groq import Groq
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        
-        prompt = f"""As a Travel Booking Specialist, suggest the best travel options for the following itinerary and budget:
-        {input_text}
-        
-        Please provide:
-        1. Recommended flights with estimated prices
-        2. Suggested accommodations with price ranges
-        3. Booking tips and best practices
-        4. Alternative options for different price points
-        5. Links to popular booking platforms
-        6. Seasonal considerations and best booking times
+    return groq_chat(BOOKING_PROMPT.format(input_text=input_text))
 
-        Format the response in a clear, organized manner with specific recommendations."""
+def run_booking(input_text, strategy=None, use_cache=True):
+    """Try multiple free APIs in order of preference; repeat requests are served from the cache.
 
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            model="llama3-8b-8192",
-        )
-        return chat_completion.choices[0].message.content
-    except Exception as e:
-        return f"Error with Groq API: {str(e)}"
+    Raises AllProvidersFailedError when no provider could answer.
+    """
+    providers = {
+        "groq": run_booking_groq,
+        "gemini": run_booking_gemini,
+        "huggingface": run_booking_huggingface,
+    }
+    return cached_call(
+        "booking", response_cache_key(providers, input_text),
+        lambda: run_with_fallback(providers, input_text, strategy), use_cache
+    )
+
+def stream_booking(input_text, use_cache=True):
+    """Yield the response in chunks as the first available provider generates it"""
+    prompt = BOOKING_PROMPT.format(input_text=input_text)
+    return stream_with_fallback("booking", {
+        "groq": lambda timeout: groq_chat_stream(prompt, timeout=timeout),
+        "gemini": lambda timeout: gemini_generate_stream(prompt, timeout=timeout),
+        "huggingface": lambda timeout: huggingface_generate_stream(prompt, timeout=timeout),
+    }, input_text, use_cache)
+
+async def arun_booking_huggingface(input_text):
+    """Async Hugging Face Inference API call"""
+    return await ahuggingface_generate(BOOKING_PROMPT.format(input_text=input_text))
 
-def run_booking(input_text):
-    """Try multiple free APIs in order of preference"""
-    
-    # Try Groq first (fastest and most reliable free API)
-    if os.getenv("GROQ_API_KEY"):
-        result = run_booking_groq(input_text)
-        if not result.startswith("Error"):
-            return result
-    
-    # Try Gemini second
-    if os.getenv("GEMINI_API_KEY"):
-        result = run_booking_gemini(input_text)
-        if not result.startswith("Error"):
-            return result
-    
-    # Try Hugging Face as fallback
-    if os.getenv("HUGGINGFACE_API_KEY"):
-        result = run_booking_huggingface(input_text)
-        if not result.startswith("Error"):
-            return result
-    
-    return "Error: No valid API keys found. Please set GROQ_API_KEY, GEMINI_API_KEY, or HUGGINGFACE_API_KEY in your .env file."
\ No newline at end of file
+async def arun_booking_gemini(input_text):
+    """Async Google Gemini call"""
+    return await agemini_generate(BOOKING_PROMPT.format(input_text=input_text))
+
+async def arun_booking_groq(input_text):
+    """Async Groq call"""
+    return await agroq_chat(BOOKING_PROMPT.format(input_text=input_text))
+
+async def arun_booking(input_text, strategy=None, use_cache=True):
+    """Async variant of run_booking; hedged/raced losers are cancelled"""
+    providers = {
+        "groq": arun_booking_groq,
+        "gemini": arun_booking_gemini,
+        "huggingface": arun_booking_huggingface,
+    }
+    return await acached_call(
+        "booking", response_cache_key(providers, input_text),
+        lambda: arun_with_fallback(providers, input_text, strategy), use_cache
+    )
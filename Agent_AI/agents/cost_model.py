@@ -0,0 +1,314 @@
+"""Offline trip cost model: regional price tables and FX rates evaluated with NumPy.
+
+Prices live in data/cost_tables.json (base currency, per region, category and
+tier) and data/fx_rates.json. A trip's costs are a few array operations over
+those tables, so a budget takes microseconds instead of an LLM round-trip and
+many itineraries can be costed in one call (CostModel.estimate_batch).
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+from utils.destination_extractor import get_destination_extractor
+from utils.gazetteer import DATA_DIR
+from utils.trip_request import DEFAULT_CURRENCY, parse_budget, parse_days, parse_tier, parse_travelers
+
+COST_TABLES_PATH = os.getenv("COST_TABLES_PATH", os.path.join(DATA_DIR, "cost_tables.json"))
+FX_RATES_PATH = os.getenv("FX_RATES_PATH", os.path.join(DATA_DIR, "fx_rates.json"))
+DEFAULT_TIER = "mid"
+# Share of a stated budget the on-the-ground costs may take when picking a tier; the rest is for flights
+LOCAL_BUDGET_SHARE = float(os.getenv("LOCAL_BUDGET_SHARE", "0.7"))
+TRAVELERS_PER_ROOM = 2
+
+CATEGORY_LABELS = {
+    "accommodation": "Accommodation",
+    "food": "Food and dining",
+    "transport": "Local transport",
+    "activities": "Activities and attractions",
+    "extras": "Additional expenses (insurance, incidentals)",
+}
+TIER_LABELS = {"budget": "budget", "mid": "mid-range", "luxury": "luxury"}
+
+
+@dataclass
+class TripFacts:
+    """What the cost model needs to know about one trip"""
+    destination: str
+    days: int
+    travelers: int = 1
+    currency: str = DEFAULT_CURRENCY
+    # None picks the dearest tier the stated budget covers (mid-range without a budget)
+    tier: str | None = None
+    budget: float | None = None
+    # (day, per-person price) pairs from the itinerary, in cost_currency
+    activity_costs: list = field(default_factory=list)
+    cost_currency: str = DEFAULT_CURRENCY
+
+
+@dataclass
+class CostEstimate:
+    destination: str
+    region: str
+    tier: str
+    currency: str
+    days: int
+    nights: int
+    travelers: int
+    rooms: int
+    # Category -> amount in currency, in CATEGORY_LABELS order
+    lines: dict
+    per_day: list
+    total: float
+    budget: float | None = None
+    activities_from_itinerary: bool = False
+    prices_as_of: str = ""
+    fx_as_of: str = ""
+
+
+class CostModel:
+    """Price tables as arrays: rates[region, category, tier] in the base currency"""
+
+    def __init__(self, tables, fx):
+        self.tiers = list(tables["tiers"])
+        self.categories = list(tables["categories"])
+        self.regions = list(tables["regions"])
+        self.rates = np.array(
+            [[tables["regions"][region][category] for category in self.categories] for region in self.regions],
+            dtype=float,
+        )
+        # Accommodation is priced per room and night, everything else per person and day
+        self.per_room = np.array([tables["units"][c] == "room_night" for c in self.categories])
+        self.region_of = {name.lower(): self.regions.index(region) for name, region in tables["countries"].items()}
+        self.factor_of = {
+            name.lower(): factor for group in tables["price_factors"].values() for name, factor in group.items()
+        }
+        self.default_region = self.regions.index("default")
+        self.fx = {code: float(rate) for code, rate in fx["rates"].items()}
+        self.prices_as_of = tables.get("as_of", "")
+        self.fx_as_of = fx.get("as_of", "")
+        # Batches repeat destinations; each is looked up in the gazetteer once
+        self.locate = lru_cache(maxsize=4096)(self._locate)
+
+    def currency(self, code):
+        """code when there is an FX rate for it, else the default currency"""
+        code = (code or "").upper()
+        return code if code in self.fx else DEFAULT_CURRENCY
+
+    def _locate(self, destination):
+        """(region index, price factor, place name or None) for a free-text destination"""
+        record = get_destination_extractor().extract(destination) if destination else None
+        if record is None:
+            return self.default_region, 1.0, None
+        country = record["name"] if record.get("kind") == "country" else record.get("country", "")
+        region = self.region_of.get(country.lower(), self.default_region)
+        factor = self.factor_of.get(country.lower(), 1.0)
+        if record["name"].lower() != country.lower():
+            factor *= self.factor_of.get(record["name"].lower(), 1.0)
+        return region, factor, record["name"]
+
+    def estimate(self, facts):
+        return self.estimate_batch([facts])[0]
+
+    def estimate_batch(self, trips):
+        """CostEstimate for every TripFacts; the arithmetic runs once over all trips"""
+        n = len(trips)
+        if n == 0:
+            return []
+        located = [self.locate(trip.destination) for trip in trips]
+        region = np.array([place[0] for place in located])
+        factor = np.array([place[1] for place in located])
+        days = np.array([max(1, int(trip.days)) for trip in trips], dtype=float)
+        travelers = np.array([max(1, int(trip.travelers or 1)) for trip in trips], dtype=float)
+        rooms = np.ceil(travelers / TRAVELERS_PER_ROOM)
+        nights = np.maximum(days - 1, 1)
+        currencies = [self.currency(trip.currency) for trip in trips]
+        fx = np.array([self.fx[code] for code in currencies])
+
+        # Every tier at once: cost[trip, category, tier] in the base currency
+        units = np.where(self.per_room, (nights * rooms)[:, None], (days * travelers)[:, None])
+        cost = self.rates[region] * factor[:, None, None] * units[:, :, None]
+
+        # Prices the planner gave for its activities replace the typical daily spend
+        counts = np.array([len(trip.activity_costs) for trip in trips])
+        owner = np.repeat(np.arange(n), counts)
+        if owner.size:
+            day = np.array([min(max(int(d), 1), int(days[i])) for i, trip in enumerate(trips)
+                            for d, _ in trip.activity_costs]) - 1
+            cost_fx = np.array([self.fx[self.currency(trip.cost_currency)] for trip in trips])
+            price = np.array([p for trip in trips for _, p in trip.activity_costs], dtype=float) / cost_fx[owner]
+        else:
+            day, price = np.zeros(0, dtype=int), np.zeros(0)
+        known = counts > 0
+        activities = self.categories.index("activities")
+        itinerary_total = np.bincount(owner, weights=price, minlength=n) * travelers
+        cost[:, activities, :] = np.where(known[:, None], itinerary_total[:, None], cost[:, activities, :])
+
+        # Tier: as requested, else the dearest the budget covers, else mid-range
+        budget = np.array([trip.budget if trip.budget else np.nan for trip in trips], dtype=float)
+        affordable = cost.sum(axis=1) <= (budget / fx * LOCAL_BUDGET_SHARE)[:, None]
+        last = len(self.tiers) - 1
+        fitting = np.where(affordable.any(axis=1), last - np.argmax(affordable[:, ::-1], axis=1), 0)
+        requested = np.array([self.tiers.index(t.tier) if t.tier in self.tiers else -1 for t in trips])
+        default = self.tiers.index(DEFAULT_TIER)
+        tier = np.where(requested >= 0, requested, np.where(np.isnan(budget), default, fitting))
+
+        chosen = cost[np.arange(n), :, tier] * fx[:, None]
+        totals = chosen.sum(axis=1)
+
+        # Spend per day: a room night (none after the last night), daily costs and that day's activities
+        max_days = int(days.max())
+        day_index = np.arange(max_days)
+        person_daily = np.where(self.per_room, 0.0, chosen)
+        person_daily[:, activities] = 0.0
+        per_day = np.tile((person_daily.sum(axis=1) / days)[:, None], (1, max_days))
+        accommodation = self.categories.index("accommodation")
+        per_day += np.where(day_index[None, :] < nights[:, None], (chosen[:, accommodation] / nights)[:, None], 0.0)
+        spread = np.where(known, 0.0, chosen[:, activities] / days)
+        per_day += spread[:, None]
+        if owner.size:
+            scheduled = np.bincount(owner * max_days + day, weights=price * travelers[owner] * fx[owner],
+                                    minlength=n * max_days)
+            per_day += scheduled.reshape(n, max_days)
+
+        return [
+            CostEstimate(
+                destination=located[i][2] or trips[i].destination,
+                region=self.regions[region[i]],
+                tier=self.tiers[tier[i]],
+                currency=currencies[i],
+                days=int(days[i]),
+                nights=int(nights[i]),
+                travelers=int(travelers[i]),
+                rooms=int(rooms[i]),
+                lines={category: float(chosen[i, c]) for c, category in enumerate(self.categories)},
+                per_day=[float(v) for v in per_day[i, :int(days[i])]],
+                total=float(totals[i]),
+                budget=trips[i].budget if trips[i].budget else None,
+                activities_from_itinerary=bool(known[i]),
+                prices_as_of=self.prices_as_of,
+                fx_as_of=self.fx_as_of,
+            )
+            for i in range(n)
+        ]
+
+
+def load_cost_model(tables_path=COST_TABLES_PATH, fx_path=FX_RATES_PATH):
+    with open(tables_path, encoding="utf-8") as f:
+        tables = json.load(f)
+    with open(fx_path, encoding="utf-8") as f:
+        fx = json.load(f)
+    return CostModel(tables, fx)
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_cost_model():
+    """Process-wide CostModel over the bundled tables"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_cost_model()
+    return _model
+
+
+def trip_facts(request_text, itinerary=None, model=None, destination=None):
+    """TripFacts from the request and, when there is one, the structured itinerary.
+
+    destination is a hint such as the plan's title, tried before the request text
+    (which may mention side trips). Returns None when the trip length cannot be worked out.
+    """
+    model = model or get_cost_model()
+    days = len(itinerary.days) if itinerary else parse_days(request_text)
+    if not days:
+        return None
+    amount, currency = parse_budget(request_text, model.fx)
+    candidates = [itinerary.destination if itinerary else None, destination, request_text]
+    place = next((c for c in candidates if c and model.locate(c)[2]), request_text)
+    return TripFacts(
+        destination=place,
+        days=days,
+        travelers=(itinerary.travelers if itinerary and itinerary.travelers else parse_travelers(request_text)) or 1,
+        currency=model.currency(currency),
+        tier=parse_tier(request_text),
+        budget=amount,
+        activity_costs=[
+            (day.day, activity.cost) for day in (itinerary.days if itinerary else [])
+            for activity in day.activities if activity.cost is not None
+        ],
+        cost_currency=model.currency(itinerary.currency) if itinerary else DEFAULT_CURRENCY,
+    )
+
+
+def estimate_requests(requests, itineraries=None, model=None):
+    """CostEstimate (or None when the length is unknown) for many request texts in one batch"""
+    model = model or get_cost_model()
+    itineraries = itineraries or [None] * len(requests)
+    facts = [trip_facts(text, itinerary, model) for text, itinerary in zip(requests, itineraries)]
+    estimates = iter(model.estimate_batch([f for f in facts if f is not None]))
+    return [next(estimates) if f is not None else None for f in facts]
+
+
+def _money(amount, currency):
+    return f"{currency} {amount:,.0f}"
+
+
+def _basis(estimate, category):
+    if category == "accommodation":
+        return f"{estimate.nights} nights × {estimate.rooms} room{'s' if estimate.rooms > 1 else ''}"
+    if category == "activities" and estimate.activities_from_itinerary:
+        return "prices from the itinerary"
+    return f"{estimate.days} days × {estimate.travelers} traveler{'s' if estimate.travelers > 1 else ''}"
+
+
+def render_budget(estimate):
+    """Budget markdown in the budgeter's layout, for display"""
+    lines = [
+        f"# 💰 Estimated budget: {estimate.destination}",
+        "",
+        f"{estimate.days} days, {estimate.travelers} traveler{'s' if estimate.travelers > 1 else ''}, "
+        f"{TIER_LABELS.get(estimate.tier, estimate.tier)} travel. Worked out from regional price tables "
+        f"({estimate.prices_as_of}) and exchange rates as of {estimate.fx_as_of}.",
+        "",
+        "| Category | Basis | Cost |",
+        "|---|---|---|",
+    ]
+    for category, amount in estimate.lines.items():
+        lines.append(f"| {CATEGORY_LABELS.get(category, category)} | {_basis(estimate, category)} "
+                     f"| {_money(amount, estimate.currency)} |")
+    lines += ["", f"**Total estimated budget (excluding flights): {_money(estimate.total, estimate.currency)}**", ""]
+    if estimate.budget:
+        left = estimate.budget - estimate.total
+        if left >= 0:
+            lines.append(f"Your budget of {_money(estimate.budget, estimate.currency)} leaves about "
+                         f"{_money(left, estimate.currency)} for flights.")
+        else:
+            lines.append(f"This is {_money(-left, estimate.currency)} over your budget of "
+                         f"{_money(estimate.budget, estimate.currency)} before flights; "
+                         f"consider fewer nights or a cheaper stay.")
+    else:
+        lines.append("Flights are not included because the departure city is not known.")
+    lines += ["", "## Daily spend"]
+    lines += [f"- Day {i}: {_money(amount, estimate.currency)}" for i, amount in enumerate(estimate.per_day, 1)]
+    return "\n".join(lines)
+
+
+def budget_facts(estimate):
+    """Exact figures for the budgeter LLM to narrate instead of computing (hybrid mode)"""
+    lines = [
+        f"Computed costs in {estimate.currency} for {estimate.travelers} travelers, "
+        f"{TIER_LABELS.get(estimate.tier, estimate.tier)} (use these exact figures; add flights as an estimate):"
+    ]
+    for category, amount in estimate.lines.items():
+        lines.append(f"- {CATEGORY_LABELS.get(category, category)} ({_basis(estimate, category)}): "
+                     f"{_money(amount, estimate.currency)}")
+    lines.append(f"- Total excluding flights: {_money(estimate.total, estimate.currency)}")
+    if estimate.budget:
+        lines.append(f"- Stated budget: {_money(estimate.budget, estimate.currency)}")
+    return "\n".join(lines)
@@ -0,0 +1,411 @@
+import asyncio
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from utils.cache import CACHE_ENABLED, get_cache, make_key, normalize_prompt
+from utils.errors import (
+    AllProvidersFailedError, CircuitOpenError, NoProvidersConfiguredError, ProviderTimeoutError,
+    classify_exception
+)
+from utils.health import health
+from utils.metrics import FALLBACKS, PROVIDER_LATENCY, PROVIDER_REQUESTS
+from utils.providers import GEMINI_MODEL, GROQ_MODEL, HF_TEXT_MODEL, HF_TEXT_PARAMETERS, ensure_env
+from utils.rate_limit import get_rate_limit
+from utils.retry import TEXT_RETRY_POLICY, Deadline, deadline_scope
+
+# Fallback strategies:
+#   sequential - try the next provider only after the previous one failed
+#   hedged     - also start the next provider when the current one is slower than its p95
+#   race       - start every available provider at once, first good answer wins
+STRATEGIES = ("sequential", "hedged", "race")
+DEFAULT_STRATEGY = os.getenv("FALLBACK_STRATEGY", "sequential")
+
+PROVIDER_KEYS = {
+    "groq": "GROQ_API_KEY",
+    "gemini": "GEMINI_API_KEY",
+    "huggingface": "HUGGINGFACE_API_KEY",
+}
+
+PROVIDER_MODELS = {
+    "groq": GROQ_MODEL,
+    "gemini": GEMINI_MODEL,
+    "huggingface": HF_TEXT_MODEL,
+}
+
+# Per provider/model budgets shared by every process on the host, in requests and tokens per
+# minute (0 = unlimited). Defaults follow the free tiers; override with e.g. GROQ_RPM=30 GROQ_TPM=30000
+DEFAULT_PROVIDER_LIMITS = {"groq": (30, 30000), "gemini": (60, 32000), "huggingface": (0, 0)}
+PROVIDER_RPM = {name: float(os.getenv(f"{name.upper()}_RPM", rpm)) for name, (rpm, _) in DEFAULT_PROVIDER_LIMITS.items()}
+PROVIDER_TPM = {name: float(os.getenv(f"{name.upper()}_TPM", tpm)) for name, (_, tpm) in DEFAULT_PROVIDER_LIMITS.items()}
+# Completion length assumed when charging a request against the tokens-per-minute budget
+ESTIMATED_OUTPUT_TOKENS = int(os.getenv("ESTIMATED_OUTPUT_TOKENS", "800"))
+
+NO_KEYS_MESSAGE = "No valid API keys found. Please set GROQ_API_KEY, GEMINI_API_KEY, or HUGGINGFACE_API_KEY in your .env file."
+
+# Hedge delay bounds (seconds) and the delay used before a provider has history
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1.0"))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "20.0"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "8.0"))
+# How often a hedge timer checks whether the attempt it times has left the rate limit queue
+_HEDGE_POLL_SECONDS = 0.05
+
+# Losing attempts keep running in the background until their call returns
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="fallback")
+
+
+def hedge_delay(provider):
+    """How long to wait for a provider before hedging to the next one"""
+    p95 = health.latency_percentile(provider, 95)
+    if p95 is None:
+        return HEDGE_DEFAULT_DELAY
+    return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, p95))
+
+
+def _hedge_wait(attempts, next_index, sent):
+    """Timeout for the next wait: None with nobody left to hedge with, a short poll while the
+    latest attempt still waits for rate limit capacity, else what is left of its hedge delay"""
+    if next_index >= len(attempts):
+        return None
+    name = attempts[next_index - 1][0]
+    if name not in sent:
+        return _HEDGE_POLL_SECONDS
+    return max(0.0, hedge_delay(name) - (time.monotonic() - sent[name]))
+
+
+def _hedge_due(attempts, next_index, sent):
+    """The latest attempt has been with its provider (not in the rate limit queue) past its hedge delay"""
+    if next_index >= len(attempts):
+        return False
+    name = attempts[next_index - 1][0]
+    return name in sent and time.monotonic() - sent[name] >= hedge_delay(name)
+
+
+def set_provider_rpm(name, rpm):
+    """Change a provider's request budget for this process (0 removes the limit)"""
+    PROVIDER_RPM[name] = float(rpm)
+
+
+def set_provider_tpm(name, tpm):
+    """Change a provider's token budget for this process (0 removes the limit)"""
+    PROVIDER_TPM[name] = float(tpm)
+
+
+def estimate_tokens(input_text):
+    """Rough token cost of one call: about four characters per prompt token plus the expected answer"""
+    return len(input_text or "") // 4 + ESTIMATED_OUTPUT_TOKENS
+
+
+def provider_limit(name):
+    """Shared rate limit for a provider's current model"""
+    return get_rate_limit(f"{name}:{PROVIDER_MODELS[name]}", PROVIDER_RPM.get(name, 0), PROVIDER_TPM.get(name, 0))
+
+
+def available_providers(providers):
+    """Providers (name, fn) whose API key is configured, in preference order"""
+    ensure_env()
+    return [(name, fn) for name, fn in providers.items() if os.getenv(PROVIDER_KEYS[name])]
+
+
+def response_cache_key(providers, input_text):
+    """Cache key from the normalized prompt, the usable provider/model chain and generation params"""
+    chain = [(name, PROVIDER_MODELS[name]) for name, _ in available_providers(providers)]
+    return make_key(normalize_prompt(input_text), chain, HF_TEXT_PARAMETERS)
+
+
+def _resolve_strategy(strategy):
+    strategy = strategy or DEFAULT_STRATEGY
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown fallback strategy '{strategy}', expected one of {STRATEGIES}")
+    return strategy
+
+
+def _attempts_or_raise(providers):
+    attempts = available_providers(providers)
+    if not attempts:
+        raise NoProvidersConfiguredError(NO_KEYS_MESSAGE)
+    return attempts
+
+
+def _exhausted(errors):
+    summary = "; ".join(str(error) for error in errors)
+    return AllProvidersFailedError(f"All providers failed: {summary}", errors=errors)
+
+
+def _record_call(name, model, outcome, seconds=None):
+    PROVIDER_REQUESTS.inc(provider=name, model=model, outcome=outcome)
+    if seconds is not None:
+        PROVIDER_LATENCY.observe(seconds, provider=name, model=model, outcome=outcome)
+
+
+def _check_circuit(name, model):
+    try:
+        health.check(name, model)
+    except CircuitOpenError:
+        _record_call(name, model, "circuit_open")
+        raise
+
+
+def _honour_rate_limit(name, error):
+    """A 429 with Retry-After holds back every process's calls to that provider, not just this one"""
+    if error.kind == "rate_limit" and error.retry_after:
+        provider_limit(name).pause(error.retry_after)
+
+
+def _not_started(name, model, outcome):
+    """Give back the circuit slot of a call that never reached the provider"""
+    health.release(name, model)
+    _record_call(name, model, outcome)
+
+
+def _queue_timeout(name, model):
+    _not_started(name, model, "timeout")
+    return ProviderTimeoutError("Request deadline exceeded waiting for rate limit capacity",
+                                provider=name, model=model)
+
+
+def _succeeded(attempts, name, result):
+    if name != attempts[0][0]:
+        FALLBACKS.inc(provider=name)
+    return result
+
+
+def _timed_call(name, fn, input_text, deadline, sent=None):
+    """Call one provider under its circuit breaker and record the outcome.
+
+    sent[name] is set to the time the call left the rate limit queue.
+    """
+    model = PROVIDER_MODELS[name]
+    _check_circuit(name, model)
+    if not provider_limit(name).acquire(estimate_tokens(input_text), timeout=deadline.remaining()):
+        raise _queue_timeout(name, model)
+    if sent is not None:
+        sent[name] = time.monotonic()
+    start = time.perf_counter()
+    try:
+        with deadline_scope(deadline):
+            result = fn(input_text)
+    except Exception as e:
+        error = classify_exception(e, name, model)
+        health.record_failure(name, model, error)
+        _honour_rate_limit(name, error)
+        _record_call(name, model, error.kind, time.perf_counter() - start)
+        raise error from e
+    elapsed = time.perf_counter() - start
+    health.record_success(name, model, elapsed)
+    _record_call(name, model, "ok", elapsed)
+    return result
+
+
+def run_with_fallback(providers, input_text, strategy=None):
+    """Call the providers with the given strategy and return the first successful result.
+
+    Providers with an open circuit are skipped without a network call. Every
+    attempt, including rate limit waits and retries, shares one deadline
+    (TEXT_RETRY_POLICY.deadline). Raises AllProvidersFailedError (carrying
+    each typed error) when nothing succeeds.
+    """
+    strategy = _resolve_strategy(strategy)
+    attempts = _attempts_or_raise(providers)
+    errors = []
+    deadline = Deadline(TEXT_RETRY_POLICY.deadline)
+
+    if strategy == "sequential":
+        for name, fn in attempts:
+            try:
+                return _succeeded(attempts, name, _timed_call(name, fn, input_text, deadline))
+            except Exception as e:
+                errors.append(e)
+        raise _exhausted(errors)
+
+    pending = {}
+    sent = {}
+    next_index = 0
+
+    def launch():
+        nonlocal next_index
+        name, fn = attempts[next_index]
+        pending[_executor.submit(_timed_call, name, fn, input_text, deadline, sent)] = name
+        next_index += 1
+
+    launch()
+    if strategy == "race":
+        while next_index < len(attempts):
+            launch()
+
+    while pending:
+        done, _ = wait(pending, timeout=_hedge_wait(attempts, next_index, sent), return_when=FIRST_COMPLETED)
+        if not done:
+            if _hedge_due(attempts, next_index, sent):
+                # Current provider is slower than usual, hedge with the next one
+                launch()
+            continue
+        winner = None
+        for future in done:
+            name = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            winner = winner or (name, result)
+        if winner:
+            for loser in pending:
+                loser.cancel()
+            return _succeeded(attempts, *winner)
+        if next_index < len(attempts):
+            # A provider failed outright (or its circuit is open), move on immediately
+            launch()
+    raise _exhausted(errors)
+
+
+async def _atimed_call(name, fn, input_text, deadline, sent=None):
+    model = PROVIDER_MODELS[name]
+    _check_circuit(name, model)
+    try:
+        acquired = await provider_limit(name).aacquire(estimate_tokens(input_text), timeout=deadline.remaining())
+    except asyncio.CancelledError:
+        _not_started(name, model, "cancelled")
+        raise
+    if not acquired:
+        raise _queue_timeout(name, model)
+    if sent is not None:
+        sent[name] = time.monotonic()
+    start = time.perf_counter()
+    try:
+        with deadline_scope(deadline):
+            result = await fn(input_text)
+    except asyncio.CancelledError:
+        _not_started(name, model, "cancelled")
+        raise
+    except Exception as e:
+        error = classify_exception(e, name, model)
+        health.record_failure(name, model, error)
+        _honour_rate_limit(name, error)
+        _record_call(name, model, error.kind, time.perf_counter() - start)
+        raise error from e
+    elapsed = time.perf_counter() - start
+    health.record_success(name, model, elapsed)
+    _record_call(name, model, "ok", elapsed)
+    return name, result
+
+
+async def arun_with_fallback(providers, input_text, strategy=None):
+    """Async run_with_fallback; losing attempts are cancelled"""
+    strategy = _resolve_strategy(strategy)
+    attempts = _attempts_or_raise(providers)
+    errors = []
+    deadline = Deadline(TEXT_RETRY_POLICY.deadline)
+
+    if strategy == "sequential":
+        for name, fn in attempts:
+            try:
+                return _succeeded(attempts, *await _atimed_call(name, fn, input_text, deadline))
+            except Exception as e:
+                errors.append(e)
+        raise _exhausted(errors)
+
+    pending = set()
+    sent = {}
+    next_index = 0
+
+    def launch():
+        nonlocal next_index
+        name, fn = attempts[next_index]
+        pending.add(asyncio.ensure_future(_atimed_call(name, fn, input_text, deadline, sent)))
+        next_index += 1
+
+    launch()
+    if strategy == "race":
+        while next_index < len(attempts):
+            launch()
+
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending, timeout=_hedge_wait(attempts, next_index, sent), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                if _hedge_due(attempts, next_index, sent):
+                    launch()
+                continue
+            # Every finished task is retrieved, so none is left with an unread exception
+            winner = None
+            for task in done:
+                pending.discard(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                winner = winner or result
+            if winner:
+                return _succeeded(attempts, *winner)
+            if next_index < len(attempts):
+                launch()
+        raise _exhausted(errors)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def stream_with_fallback(namespace, providers, input_text, use_cache=True):
+    """Yield text chunks from the first provider that starts streaming.
+
+    Providers map a name to fn(timeout) returning a chunk iterator, where timeout
+    is the request timeout left under the shared deadline; the deadline is also
+    checked between chunks.
+    Falling back is only possible before the first chunk has been emitted, so
+    streaming always uses the sequential strategy; a failure after that raises
+    the typed ProviderError. The complete text is stored in the response cache
+    under the same key as the non-streaming call.
+    """
+    key = response_cache_key(providers, input_text)
+    caching = use_cache and CACHE_ENABLED
+    if caching:
+        cached = get_cache().get(namespace, key)
+        if cached is not None:
+            yield cached
+            return
+
+    errors = []
+    attempts = _attempts_or_raise(providers)
+    deadline = Deadline(TEXT_RETRY_POLICY.deadline)
+    for name, fn in attempts:
+        model = PROVIDER_MODELS[name]
+        try:
+            _check_circuit(name, model)
+        except CircuitOpenError as e:
+            errors.append(e)
+            continue
+        if not provider_limit(name).acquire(estimate_tokens(input_text), timeout=deadline.remaining()):
+            errors.append(_queue_timeout(name, model))
+            continue
+        chunks = []
+        start = time.perf_counter()
+        try:
+            for chunk in fn(deadline.timeout(TEXT_RETRY_POLICY.attempt_timeout)):
+                chunks.append(chunk)
+                yield chunk
+                if deadline.expired():
+                    raise ProviderTimeoutError("Request deadline exceeded while streaming", provider=name, model=model)
+        except GeneratorExit:
+            health.release(name, model)
+            _record_call(name, model, "cancelled")
+            raise
+        except Exception as e:
+            error = classify_exception(e, name, model)
+            health.record_failure(name, model, error)
+            _honour_rate_limit(name, error)
+            _record_call(name, model, error.kind, time.perf_counter() - start)
+            if chunks:
+                raise error from e
+            errors.append(error)
+            continue
+        elapsed = time.perf_counter() - start
+        health.record_success(name, model, elapsed)
+        _record_call(name, model, "ok", elapsed)
+        _succeeded(attempts, name, None)
+        if caching:
+            get_cache().set(namespace, key, "".join(chunks))
+        return
+    raise _exhausted(errors)
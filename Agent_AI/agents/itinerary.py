@@ -0,0 +1,254 @@
+"""Structured itinerary records passed between the trip agents.
+
+The planner answers in JSON (provider JSON mode) which is validated into the
+records below. Downstream agents get the compact `brief` text instead of the
+full markdown, and markdown is rendered only for display.
+"""
+import json
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+
+# Caps that keep the hand-off small even when a model over-produces
+MAX_DAYS = 30
+MAX_ACTIVITIES_PER_DAY = 8
+MAX_TIPS = 5
+MAX_FIELD_CHARS = 80
+# Budget for the markdown fallback brief (planner answered without JSON)
+MAX_BRIEF_CHARS = 2000
+MAX_BUDGET_LINES = 16
+MAX_AREAS = 5
+
+ITINERARY_SCHEMA = """{
+  "destination": string,
+  "travelers": number or null,
+  "currency": string (ISO code, e.g. "USD"),
+  "plan": [
+    {"day": number, "title": string,
+     "activities": [{"time": string, "name": string, "location": string, "cost": number or null}]}
+  ],
+  "tips": [string]
+}"""
+
+_JSON_BLOCK = re.compile(r"\{.*\}", re.DOTALL)
+_MARKDOWN = re.compile(r"[*_`#>|]+")
+_BULLET = re.compile(r"^\s*(?:[-•*]|\d+[.)])\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_DAY_HEADING = re.compile(r"^\W*day\s*\d+", re.IGNORECASE)
+_AMOUNT = re.compile(r"(?:[$€£¥₹]|USD|EUR|GBP|JPY|AUD|CAD|LKR|INR|Rs\.?)\s?\d|\d[\d,]*(?:\.\d+)?\s?(?:USD|EUR|GBP|JPY|LKR|INR)")
+
+
+@dataclass
+class Activity:
+    name: str
+    time: str = ""
+    location: str = ""
+    cost: float | None = None
+
+
+@dataclass
+class Day:
+    day: int
+    title: str = ""
+    activities: list = field(default_factory=list)
+
+
+@dataclass
+class Itinerary:
+    destination: str
+    days: list
+    travelers: int | None = None
+    currency: str = "USD"
+    tips: list = field(default_factory=list)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _text(value):
+    if value is None:
+        return ""
+    return " ".join(str(value).split())[:MAX_FIELD_CHARS]
+
+
+def _number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", str(value))
+    return float(match.group().replace(",", "")) if match else None
+
+
+def itinerary_from_dict(data):
+    """Validate a decoded JSON object into an Itinerary; raises ValueError when it has no usable days"""
+    if not isinstance(data, dict):
+        raise ValueError("Itinerary must be a JSON object")
+    days = []
+    for index, entry in enumerate((data.get("plan") or data.get("itinerary") or [])[:MAX_DAYS]):
+        if not isinstance(entry, dict):
+            continue
+        activities = []
+        for item in (entry.get("activities") or [])[:MAX_ACTIVITIES_PER_DAY]:
+            if isinstance(item, str):
+                item = {"name": item}
+            if isinstance(item, dict) and _text(item.get("name")):
+                activities.append(Activity(
+                    name=_text(item.get("name")), time=_text(item.get("time")),
+                    location=_text(item.get("location")), cost=_number(item.get("cost"))
+                ))
+        day_number = _number(entry.get("day"))
+        days.append(Day(day=int(day_number) if day_number else index + 1,
+                        title=_text(entry.get("title")), activities=activities))
+    if not any(day.activities for day in days):
+        raise ValueError("Itinerary has no activities")
+    travelers = _number(data.get("travelers"))
+    return Itinerary(
+        destination=_text(data.get("destination")),
+        days=days,
+        travelers=int(travelers) if travelers else None,
+        currency=_text(data.get("currency")).upper()[:3] or "USD",
+        tips=[_text(tip) for tip in (data.get("tips") or [])[:MAX_TIPS] if _text(tip)],
+    )
+
+
+def itinerary_from_state(data):
+    """Rebuild the records from Itinerary.to_dict() (as stored in the graph state)"""
+    return Itinerary(
+        destination=data["destination"],
+        days=[Day(day=d["day"], title=d["title"], activities=[Activity(**a) for a in d["activities"]])
+              for d in data["days"]],
+        travelers=data.get("travelers"),
+        currency=data.get("currency", "USD"),
+        tips=list(data.get("tips", [])),
+    )
+
+
+def parse_itinerary(text):
+    """Itinerary from a model answer (bare JSON or JSON inside prose/code fences), or None"""
+    if not text:
+        return None
+    match = _JSON_BLOCK.search(text)
+    if match is None:
+        return None
+    try:
+        return itinerary_from_dict(json.loads(match.group()))
+    except ValueError:
+        # json.JSONDecodeError is a ValueError too
+        return None
+
+
+def _money(cost, currency):
+    return f"{cost:,.0f} {currency}" if cost is not None else ""
+
+
+def render_markdown(itinerary):
+    """Display markdown for the Itinerary tab"""
+    heading = f"# {itinerary.destination or 'Your trip'}: {len(itinerary.days)}-day itinerary"
+    if itinerary.travelers:
+        heading += f" for {itinerary.travelers}"
+    lines = [heading, ""]
+    for day in itinerary.days:
+        lines.append(f"## Day {day.day}" + (f": {day.title}" if day.title else ""))
+        for activity in day.activities:
+            line = "- "
+            if activity.time:
+                line += f"**{activity.time}** "
+            line += activity.name
+            if activity.location:
+                line += f" ({activity.location})"
+            if activity.cost is not None:
+                line += f" — about {_money(activity.cost, itinerary.currency)}"
+            lines.append(line)
+        lines.append("")
+    if itinerary.tips:
+        lines.append("## Travel tips")
+        lines.extend(f"- {tip}" for tip in itinerary.tips)
+    return "\n".join(lines).strip()
+
+
+def _header(itinerary):
+    header = [itinerary.destination or "Trip", f"{len(itinerary.days)} days"]
+    if itinerary.travelers:
+        header.append(f"{itinerary.travelers} travelers")
+    header.append(f"costs in {itinerary.currency}")
+    return " | ".join(header)
+
+
+def brief(itinerary):
+    """Compact one-line-per-day text handed to the budgeter"""
+    lines = [_header(itinerary)]
+    for day in itinerary.days:
+        items = []
+        for activity in day.activities:
+            item = " ".join(part for part in (activity.time, activity.name) if part)
+            if activity.location and activity.location not in activity.name:
+                item += f" @ {activity.location}"
+            if activity.cost is not None:
+                item += f" ~{activity.cost:,.0f}"
+            items.append(item)
+        title = f" {day.title}" if day.title else ""
+        lines.append(f"D{day.day}{title}: " + "; ".join(items))
+    if itinerary.tips:
+        lines.append("Notes: " + "; ".join(itinerary.tips))
+    return "\n".join(lines)
+
+
+def summary(itinerary):
+    """Destination, length and the most visited areas: what the booking agent needs to pick stays"""
+    areas = Counter(a.location for day in itinerary.days for a in day.activities if a.location)
+    lines = [_header(itinerary)]
+    if areas:
+        lines.append("Areas: " + ", ".join(area for area, _ in areas.most_common(MAX_AREAS)))
+    return "\n".join(lines)
+
+
+def _plain(line):
+    return " ".join(_MARKDOWN.sub("", _BULLET.sub("", line)).split())
+
+
+def _condense(line):
+    """First sentence plus any sentence that mentions a price"""
+    sentences = _SENTENCE_END.split(line)
+    kept = sentences[:1] + [s for s in sentences[1:] if _AMOUNT.search(s)]
+    return " ".join(kept)[:MAX_FIELD_CHARS + 40]
+
+
+def brief_from_markdown(text, max_chars=MAX_BRIEF_CHARS):
+    """Condensed hand-off for a free-form markdown plan (streamed or from a model without JSON mode)"""
+    lines, size = [], 0
+    for raw in (text or "").splitlines():
+        line = _plain(raw)
+        if not line:
+            continue
+        if not (_DAY_HEADING.match(line) or _BULLET.match(raw) or _AMOUNT.search(line)):
+            continue
+        line = _condense(line)
+        if size + len(line) > max_chars:
+            break
+        lines.append(line)
+        size += len(line) + 1
+    # A plan with no recognisable structure is passed on truncated rather than dropped
+    return "\n".join(lines) if lines else _plain(text or "")[:max_chars]
+
+
+def headline(text):
+    """First line of a markdown plan (usually its title), standing in for summary() without JSON"""
+    for raw in (text or "").splitlines():
+        line = _plain(raw)
+        if line:
+            return line[:MAX_FIELD_CHARS + 40]
+    return ""
+
+
+def budget_brief(budget_text, total=None, max_lines=MAX_BUDGET_LINES):
+    """The budget's priced lines (plus its total) for the booking agent"""
+    lines = []
+    for raw in (budget_text or "").splitlines():
+        line = _plain(raw)
+        if line and _AMOUNT.search(line):
+            lines.append(line[:MAX_FIELD_CHARS + 40])
+    lines = lines[:max_lines]
+    if total and not any(total in line for line in lines):
+        lines.append(f"Total: {total}")
+    return "\n".join(lines)
@@ -1,128 +1,131 @@
-import os
-import time
-import requests
-from dotenv import load_dotenv
-from utils.retry import get_retry_delay
+from agents.fallback import available_providers, run_with_fallback, arun_with_fallback, stream_with_fallback, response_cache_key
+from agents.itinerary import ITINERARY_SCHEMA
+from utils.cache import cached_call, acached_call
+from utils.providers import (
+    groq_chat, gemini_generate, huggingface_generate, agroq_chat, agemini_generate, ahuggingface_generate,
+    groq_chat_stream, gemini_generate_stream, huggingface_generate_stream
+)
+
+PLANNER_PROMPT = """As a Travel Planning Expert, create a detailed day-by-day itinerary for the following request:
+{input_text}
+
+Please provide:
+1. A day-by-day schedule
+2. Recommended activities and locations
+3. Timing for each activity
+4. Any important travel tips or considerations
+
+Format the response in a clear, organized manner."""
+
+PLANNER_JSON_PROMPT = """As a Travel Planning Expert, create a day-by-day itinerary for the following request:
+{input_text}
+
+Answer with a single JSON object and nothing else, using this shape:
+""" + ITINERARY_SCHEMA.replace("{", "{{").replace("}", "}}") + """
+Give every activity a time, a short name and its location, an estimated cost per person where one applies,
+and at most five short travel tips."""
 
 def run_planner_huggingface(input_text):
     """Using Hugging Face Inference API (Free)"""
-    load_dotenv()
-    
-    API_URL = "https://api-inference.huggingface.co/models/microsoft/DialoGPT-medium"
-    headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY')}"}
-    
-    prompt = f"""As a Travel Planning Expert, create a detailed day-by-day itinerary for the following request:
-    {input_text}
-    
-    Please provide:
-    1. A day-by-day schedule
-    2. Recommended activities and locations
-    3. Timing for each activity
-    4. Any important travel tips or considerations
-
-    Format the response in a clear, organized manner."""
-
-    payload = {
-        "inputs": prompt,
-        "parameters": {
-            "max_length": 1000,
-            "temperature": 0.7,
-            "do_sample": True
-        }
-    }
-
-    for attempt in range(3):
-        try:
-            response = requests.post(API_URL, headers=headers, json=payload)
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    return result[0].get('generated_text', 'No response generated')
-                return str(result)
-            elif response.status_code == 503:
-                time.sleep(20)
-                continue
-            else:
-                raise Exception(f"API request failed with status {response.status_code}: {response.text}")
-        except Exception as e:
-            if attempt < 2:
-                time.sleep(get_retry_delay(attempt))
-            else:
-                return f"Error generating itinerary: {str(e)}"
+    return huggingface_generate(PLANNER_PROMPT.format(input_text=input_text))
 
 def run_planner_gemini(input_text):
     """Using Google Gemini (Free tier)"""
-    load_dotenv()
-    
-    try:
-        import google.generativeai as genai
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel('gemini-pro')
-        
-        prompt = f"""As a Travel Planning Expert, create a detailed day-by-day itinerary for the following request:
-        {input_text}
-        
-        Please provide:
-        1. A day-by-day schedule
-        2. Recommended activities and locations
-        3. Timing for each activity
-        4. Any important travel tips or considerations
-
-        Format the response in a clear, organized manner."""
-
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Error with Gemini API: {str(e)}"
+    return gemini_generate(PLANNER_PROMPT.format(input_text=input_text))
 
 def run_planner_groq(input_text):
     """Using Groq (Free tier)"""
-    load_dotenv()
-    
-    try:
-        from groq import Groq
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        
-        prompt = f"""As a Travel Planning Expert, create a detailed day-by-day itinerary for the following request:
-        {input_text}
-        
-        Please provide:
-        1. A day-by-day schedule
-        2. Recommended activities and locations
-        3. Timing for each activity
-        4. Any important travel tips or considerations
-
-        Format the response in a clear, organized manner."""
-
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            model="llama3-8b-8192",  # Free model
-        )
-        return chat_completion.choices[0].message.content
-    except Exception as e:
-        return f"Error with Groq API: {str(e)}"
-
-def run_planner(input_text):
-    """Try multiple free APIs in order of preference"""
-    
-    # Try Groq 
-    if os.getenv("GROQ_API_KEY"):
-        result = run_planner_groq(input_text)
-        if not result.startswith("Error"):
-            return result
-    
-    # Try Gemini 
-    if os.getenv("GEMINI_API_KEY"):
-        result = run_planner_gemini(input_text)
-        if not result.startswith("Error"):
-            return result
-    
-    # Try Hugging 
-    if os.getenv("HUGGINGFACE_API_KEY"):
-        result = run_planner_huggingface(input_text)
-        if not result.startswith("Error"):
-            return result
-    
-    return "Error: No valid API keys found. Please set GROQ_API_KEY, GEMINI_API_KEY, or HUGGINGFACE_API_KEY in your .env file."
\ No newline at end of file
+    return groq_chat(PLANNER_PROMPT.format(input_text=input_text))
+
+def run_planner(input_text, strategy=None, use_cache=True):
+    """Try multiple free APIs in order of preference; repeat requests are served from the cache.
+
+    Raises AllProvidersFailedError when no provider could answer.
+    """
+    providers = {
+        "groq": run_planner_groq,
+        "gemini": run_planner_gemini,
+        "huggingface": run_planner_huggingface,
+    }
+    return cached_call(
+        "planner", response_cache_key(providers, input_text),
+        lambda: run_with_fallback(providers, input_text, strategy), use_cache
+    )
+
+def run_planner_groq_json(input_text):
+    """Groq in JSON mode"""
+    return groq_chat(PLANNER_JSON_PROMPT.format(input_text=input_text), json_mode=True)
+
+def run_planner_gemini_json(input_text):
+    """Gemini with an application/json response"""
+    return gemini_generate(PLANNER_JSON_PROMPT.format(input_text=input_text), json_mode=True)
+
+def run_planner_structured(input_text, strategy=None, use_cache=True):
+    """Itinerary JSON from the providers that support a JSON mode (Groq, Gemini).
+
+    Returns None when neither is configured, so the caller can fall back to run_planner.
+    """
+    providers = {
+        "groq": run_planner_groq_json,
+        "gemini": run_planner_gemini_json,
+    }
+    if not available_providers(providers):
+        return None
+    return cached_call(
+        "planner_json", response_cache_key(providers, input_text),
+        lambda: run_with_fallback(providers, input_text, strategy), use_cache
+    )
+
+def stream_planner(input_text, use_cache=True):
+    """Yield the response in chunks as the first available provider generates it"""
+    prompt = PLANNER_PROMPT.format(input_text=input_text)
+    return stream_with_fallback("planner", {
+        "groq": lambda timeout: groq_chat_stream(prompt, timeout=timeout),
+        "gemini": lambda timeout: gemini_generate_stream(prompt, timeout=timeout),
+        "huggingface": lambda timeout: huggingface_generate_stream(prompt, timeout=timeout),
+    }, input_text, use_cache)
+
+async def arun_planner_groq_json(input_text):
+    """Async Groq call in JSON mode"""
+    return await agroq_chat(PLANNER_JSON_PROMPT.format(input_text=input_text), json_mode=True)
+
+async def arun_planner_gemini_json(input_text):
+    """Async Gemini call with an application/json response"""
+    return await agemini_generate(PLANNER_JSON_PROMPT.format(input_text=input_text), json_mode=True)
+
+async def arun_planner_structured(input_text, strategy=None, use_cache=True):
+    """Async variant of run_planner_structured"""
+    providers = {
+        "groq": arun_planner_groq_json,
+        "gemini": arun_planner_gemini_json,
+    }
+    if not available_providers(providers):
+        return None
+    return await acached_call(
+        "planner_json", response_cache_key(providers, input_text),
+        lambda: arun_with_fallback(providers, input_text, strategy), use_cache
+    )
+
+async def arun_planner_huggingface(input_text):
+    """Async Hugging Face Inference API call"""
+    return await ahuggingface_generate(PLANNER_PROMPT.format(input_text=input_text))
+
+async def arun_planner_gemini(input_text):
+    """Async Google Gemini call"""
+    return await agemini_generate(PLANNER_PROMPT.format(input_text=input_text))
+
+async def arun_planner_groq(input_text):
+    """Async Groq call"""
+    return await agroq_chat(PLANNER_PROMPT.format(input_text=input_text))
+
+async def arun_planner(input_text, strategy=None, use_cache=True):
+    """Async variant of run_planner; hedged/raced losers are cancelled"""
+    providers = {
+        "groq": arun_planner_groq,
+        "gemini": arun_planner_gemini,
+        "huggingface": arun_planner_huggingface,
+    }
+    return await acached_call(
+        "planner", response_cache_key(providers, input_text),
+        lambda: arun_with_fallback(providers, input_text, strategy), use_cache
+    )
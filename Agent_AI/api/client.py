@@ -0,0 +1,61 @@
+"""Small client for the HTTP API in api/server.py, used by the Streamlit app when TRAVEL_API_URL is set."""
+import json
+import os
+import time
+
+import requests
+
+TRAVEL_API_URL = os.getenv("TRAVEL_API_URL", "").rstrip("/")
+
+
+class ServerBusy(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Trip planning service is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TripPlannerClient:
+    def __init__(self, base_url=TRAVEL_API_URL, timeout=200, busy_retries=2):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.busy_retries = busy_retries
+        self.session = requests.Session()
+
+    def _post(self, path, **kwargs):
+        """POST, waiting out up to busy_retries 429 responses as the server's Retry-After asks"""
+        for attempt in range(self.busy_retries + 1):
+            response = self.session.post(f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+            if response.status_code != 429:
+                response.raise_for_status()
+                return response
+            retry_after = int(response.headers.get("Retry-After", "5"))
+            if attempt == self.busy_retries:
+                raise ServerBusy(retry_after)
+            time.sleep(retry_after)
+
+    def plan_trip(self, input_text, mode=None):
+        return self._post("/v1/plan", json={"input": input_text, "mode": mode}).json()
+
+    def stream_plan_trip(self, input_text, mode=None):
+        """Yield the same events as workflows.trip_graph.stream_plan_trip"""
+        response = self._post("/v1/plan/stream", json={"input": input_text, "mode": mode}, stream=True)
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("data: "):
+                    yield json.loads(line[len("data: "):])
+
+    def analyze_image(self, image_bytes):
+        return self._post("/v1/analyze-image", data=image_bytes).json()["analysis"]
+
+    def transcribe(self, audio_bytes, suffix=".wav"):
+        return self._post("/v1/transcribe", data=audio_bytes, params={"suffix": suffix}).json()["text"]
+
+    def visuals(self, destination, ai_images=False, count=3):
+        return self._post("/v1/visuals", json={"destination": destination, "ai_images": ai_images,
+                                               "count": count}).json()
+
+    def ready(self):
+        try:
+            return self.session.get(f"{self.base_url}/readyz", timeout=5).status_code == 200
+        except requests.RequestException:
+            return False
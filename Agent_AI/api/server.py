@@ -0,0 +1,363 @@
+"""HTTP API for trip planning, image analysis, transcription and destination visuals.
+
+Run from Agent_AI/:
+
+    uvicorn api.server:app --host 0.0.0.0 --port 8000
+
+Every endpoint goes through a bounded work queue. When the queue for an
+endpoint is full the request is rejected at once with 429 and a
+Retry-After estimate instead of piling up, and work that runs longer than
+its timeout returns 504.
+"""
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from agents.fallback import PROVIDER_KEYS
+from utils.health import OPEN, health
+from utils.metrics import registry as metrics_registry
+from utils.providers import ensure_env
+from workflows.trip_graph import GRAPH_MODES, aplan_trip, stream_plan_trip
+
+# (workers, queued requests beyond the workers, timeout seconds) per endpoint
+QUEUE_LIMITS = {
+    "plan": (int(os.getenv("API_PLAN_WORKERS", "8")), int(os.getenv("API_PLAN_QUEUE", "32")),
+             float(os.getenv("API_PLAN_TIMEOUT", "180"))),
+    "image": (int(os.getenv("API_IMAGE_WORKERS", "4")), int(os.getenv("API_IMAGE_QUEUE", "16")),
+              float(os.getenv("API_IMAGE_TIMEOUT", "60"))),
+    "audio": (int(os.getenv("API_AUDIO_WORKERS", "2")), int(os.getenv("API_AUDIO_QUEUE", "8")),
+              float(os.getenv("API_AUDIO_TIMEOUT", "300"))),
+    "visuals": (int(os.getenv("API_VISUALS_WORKERS", "4")), int(os.getenv("API_VISUALS_QUEUE", "16")),
+                float(os.getenv("API_VISUALS_TIMEOUT", "120"))),
+}
+MAX_UPLOAD_BYTES = int(os.getenv("API_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+# Blocking work (SDK calls, Whisper, PIL) runs here so the event loop stays responsive
+_blocking = ThreadPoolExecutor(max_workers=int(os.getenv("API_BLOCKING_THREADS", "16")),
+                               thread_name_prefix="api-blocking")
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Server is busy")
+        self.retry_after = retry_after
+
+
+class WorkQueue:
+    """At most `workers` jobs run at once and at most `max_queued` wait; anything beyond is refused"""
+
+    def __init__(self, name, workers, max_queued, timeout):
+        self.name = name
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.running = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(workers)
+        # Moving average of job duration, used for Retry-After
+        self._avg_seconds = 5.0
+
+    def retry_after(self):
+        backlog = (self.waiting + 1) / max(1, self.workers)
+        return max(1, int(round(backlog * self._avg_seconds)))
+
+    def check(self):
+        """Raise QueueFull if a request arriving now would be refused"""
+        if self.waiting >= self.max_queued and self.running >= self.workers:
+            raise QueueFull(self.retry_after())
+
+    def reserve(self):
+        """Claim a place in the queue or raise QueueFull"""
+        self.check()
+        self.waiting += 1
+
+    async def start(self):
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        return time.perf_counter()
+
+    def finish(self, started):
+        self.running -= 1
+        self._slots.release()
+        self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.perf_counter() - started)
+
+    async def run(self, fn):
+        """Run an async zero-argument callable within the queue limits and timeout.
+
+        The slot is held until the work has really ended: a coroutine that times
+        out is cancelled, while executor work, which cannot be interrupted, keeps
+        its slot until its thread returns. Otherwise timed-out threads would pile
+        up beyond `workers`.
+        """
+        self.reserve()
+        started = await self.start()
+        try:
+            work = fn()
+        except BaseException:
+            self.finish(started)
+            raise
+        cancellable = asyncio.iscoroutine(work)
+        task = asyncio.ensure_future(work)
+
+        def done(task):
+            self.finish(started)
+            if not task.cancelled():
+                # Retrieved here so an abandoned job's error is not reported as never retrieved
+                task.exception()
+
+        task.add_done_callback(done)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+        except BaseException:
+            if cancellable:
+                task.cancel()
+            raise
+
+    def status(self):
+        return {"workers": self.workers, "running": self.running, "waiting": self.waiting,
+                "max_queued": self.max_queued, "timeout_s": self.timeout}
+
+
+queues = {}
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    ensure_env()
+    # Semaphores belong to the serving event loop, so they are created once it runs
+    for name, (workers, max_queued, timeout) in QUEUE_LIMITS.items():
+        queues[name] = WorkQueue(name, workers, max_queued, timeout)
+    yield
+
+
+app = FastAPI(title="AI Travel Assistant API", lifespan=_lifespan)
+
+
+@app.exception_handler(QueueFull)
+async def _queue_full(request, exc):
+    return JSONResponse({"error": "busy", "retry_after": exc.retry_after}, status_code=429,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+
+@app.exception_handler(asyncio.TimeoutError)
+async def _timed_out(request, exc):
+    return JSONResponse({"error": "timeout"}, status_code=504)
+
+
+def _blocking_call(fn, *args):
+    return lambda: asyncio.get_running_loop().run_in_executor(_blocking, fn, *args)
+
+
+async def _read_upload(request):
+    body = await request.body()
+    if not body:
+        raise HTTPException(400, "Empty request body")
+    if len(body) > MAX_UPLOAD_BYTES:
+        raise HTTPException(413, f"Upload larger than {MAX_UPLOAD_BYTES} bytes")
+    return body
+
+
+def _with_temp_file(data, suffix, fn):
+    """Call fn(path) on a temporary copy of an upload"""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp.write(data)
+        path = tmp.name
+    try:
+        return fn(path)
+    finally:
+        os.unlink(path)
+
+
+class PlanRequest(BaseModel):
+    input: str
+    mode: Optional[str] = None
+
+
+class VisualsRequest(BaseModel):
+    destination: str
+    ai_images: bool = False
+    count: int = 3
+
+
+def _check_mode(mode):
+    if mode is not None and mode not in GRAPH_MODES:
+        raise HTTPException(422, f"mode must be one of {GRAPH_MODES}")
+
+
+@app.post("/v1/plan")
+async def plan(body: PlanRequest):
+    """Run the trip graph and return every agent's output"""
+    _check_mode(body.mode)
+    result = await queues["plan"].run(lambda: aplan_trip({"input": body.input}, mode=body.mode))
+    return {
+        "planner_output": result.get("planner_output"),
+        "budgeter_output": result.get("budgeter_output"),
+        "booking_output": result.get("booking_output"),
+        "itinerary": result.get("itinerary"),
+        "cache": result.get("cache"),
+        "errors": result.get("errors") or {},
+    }
+
+
+@app.post("/v1/plan/stream")
+async def plan_stream(body: PlanRequest):
+    """stream_plan_trip events as server-sent events; the queue slot is held until the graph behind the stream stops"""
+    _check_mode(body.mode)
+    queue = queues["plan"]
+    # Refuse with 429 while the response can still say so; the slot itself is claimed
+    # inside the stream so that whatever ends it also gives the slot back
+    queue.check()
+
+    async def sse():
+        started = None
+        events = None
+        pending = None
+        cancel = threading.Event()
+        try:
+            try:
+                queue.reserve()
+            except QueueFull as e:
+                yield f"data: {json.dumps({'type': 'error', 'error': 'busy', 'retry_after': e.retry_after})}\n\n"
+                return
+            started = await queue.start()
+            events = stream_plan_trip({"input": body.input}, mode=body.mode, cancel=cancel)
+            deadline = time.monotonic() + queue.timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield f"data: {json.dumps({'type': 'error', 'error': 'timeout'})}\n\n"
+                    return
+                if pending is None:
+                    pending = _blocking.submit(next, events, None)
+                try:
+                    event = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(pending)), timeout=remaining)
+                except asyncio.TimeoutError:
+                    continue
+                pending = None
+                if event is None:
+                    events = None
+                    return
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+        finally:
+            if events is not None:
+                # The client left or the stream timed out: stop the graph after its current node
+                # and keep the slot until it has, so abandoned streams cannot pile up past the limit
+                cancel.set()
+                drained = asyncio.get_running_loop().run_in_executor(_blocking, _drain, pending, events)
+                drained.add_done_callback(lambda _: queue.finish(started))
+            elif started:
+                queue.finish(started)
+
+    return StreamingResponse(sse(), media_type="text/event-stream")
+
+
+def _drain(pending, events):
+    """Wait out a cancelled stream: its in-flight next() and whatever events remain"""
+    if pending is not None:
+        wait([pending])
+    for _ in events:
+        pass
+
+
+@app.post("/v1/analyze-image")
+async def analyze(request: Request):
+    """Describe an uploaded image (raw bytes in the request body)"""
+    from utils.multimodal_input import analyze_image
+    data = await _read_upload(request)
+    result = await queues["image"].run(_blocking_call(_with_temp_file, data, ".jpg", analyze_image))
+    if result.startswith("Error"):
+        raise HTTPException(502, result)
+    return {"analysis": result}
+
+
+@app.post("/v1/transcribe")
+async def transcribe(request: Request, suffix: str = ".wav"):
+    """Transcribe an uploaded recording (raw bytes; ?suffix= gives the container format)"""
+    from utils.multimodal_input import transcribe_audio_free
+    data = await _read_upload(request)
+    if not suffix.startswith(".") or len(suffix) > 6:
+        raise HTTPException(422, "suffix must look like .mp3")
+    result = await queues["audio"].run(_blocking_call(_with_temp_file, data, suffix, transcribe_audio_free))
+    if result.startswith("Error"):
+        raise HTTPException(503 if "queue is full" in result else 502, result)
+    return {"text": result}
+
+
+def _visuals(destination, ai_images, count):
+    from utils.image_generation import (
+        IMAGE_MODELS, destination_image_jobs, generate_images_concurrently,
+        get_google_images_urls, get_sample_images_urls, get_working_image_urls
+    )
+    visuals = {
+        "destination": destination,
+        "google_urls": get_google_images_urls(destination),
+        "sample_urls": get_working_image_urls(get_sample_images_urls(destination), max_test=8),
+        "generated_images": [],
+    }
+    ensure_env()
+    if ai_images and os.getenv("HUGGINGFACE_API_KEY"):
+        images = generate_images_concurrently(destination_image_jobs(destination, count), models=IMAGE_MODELS[:3])
+        visuals["generated_images"] = [
+            {"model": image["model"], "style": image["style"], "prompt": image["prompt"],
+             "image_base64": base64.b64encode(image["image_data"]).decode("ascii")}
+            for image in images if image is not None
+        ]
+    return visuals
+
+
+@app.post("/v1/visuals")
+async def visuals(body: VisualsRequest):
+    """Image search links, reachable sample photos and optional AI images for a destination"""
+    if not 1 <= body.count <= 6:
+        raise HTTPException(422, "count must be between 1 and 6")
+    return await queues["visuals"].run(_blocking_call(_visuals, body.destination, body.ai_images, body.count))
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is serving requests"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: at least one LLM provider is configured and usable, and the plan queue has room"""
+    ensure_env()
+    configured = [name for name, key in PROVIDER_KEYS.items() if os.getenv(key)]
+    circuits = health.snapshot()
+    # A provider counts as usable unless every model tracked for it has an open circuit
+    usable = [
+        name for name in configured
+        if not (states := [c["state"] for key, c in circuits.items() if key.split("/", 1)[0] == name])
+        or any(state != OPEN for state in states)
+    ]
+    plan_queue = queues.get("plan")
+    has_room = plan_queue is not None and (plan_queue.waiting < plan_queue.max_queued)
+    ready = bool(usable) and has_room
+    body = {
+        "ready": ready,
+        "providers_configured": configured,
+        "providers_usable": usable,
+        "queues": {name: queue.status() for name, queue in queues.items()},
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    from fastapi.responses import PlainTextResponse
+    return PlainTextResponse(metrics_registry.render_prometheus(), media_type="text/plain; version=0.0.4")
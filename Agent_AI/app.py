@@ -1,17 +1,27 @@
 import streamlit as st
-from workflows.trip_graph import plan_trip
 from utils.multimodal_input import transcribe_audio_free, analyze_image
+from utils.transcription import get_transcription_worker
 from utils.image_generation import get_enhanced_destination_visuals, display_enhanced_images_streamlit, get_google_images_urls
+from utils.destinations import DESTINATIONS, country_name
+from utils.destination_extractor import extract_destination
+from utils.metrics import registry as metrics_registry, start_metrics_server
+from workflows.trip_jobs import decode_visuals, get_trip_job, submit_trip_job
+from utils.jobs import ACTIVE as JOB_ACTIVE
 import os
 from dotenv import load_dotenv
 import time
 from datetime import datetime, timedelta, date
 import tempfile
-import re
 
 # Load environment variables
 load_dotenv()
 
+# Prometheus endpoint on METRICS_PORT (started once per process)
+start_metrics_server()
+
+# How often a page with a running trip job re-reads its progress
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+
 # Page config
 st.set_page_config(
     page_title="Enhanced Travel Assistant with Smart Inputs",
@@ -21,8 +31,6 @@ st.set_page_config(
 )
 
 # Initialize session state variables
-if 'last_request_time' not in st.session_state:
-    st.session_state.last_request_time = 0
 if 'rate_limit_hit' not in st.session_state:
     st.session_state.rate_limit_hit = False
 if 'rate_limit_reset_time' not in st.session_state:
@@ -31,29 +39,8 @@ if 'trip_history' not in st.session_state:
     st.session_state.trip_history = []
 if 'destination_images' not in st.session_state:
     st.session_state.destination_images = {}
-
-# Popular destinations by country/region
-DESTINATIONS = {
-    "🇺🇸 United States": ["New York City", "Los Angeles", "Las Vegas", "Miami", "San Francisco", "Chicago", "Boston", "Washington DC"],
-    "🇬🇧 United Kingdom": ["London", "Edinburgh", "Manchester", "Bath", "Oxford", "Cambridge", "Liverpool", "Brighton"],
-    "🇫🇷 France": ["Paris", "Nice", "Lyon", "Marseille", "Bordeaux", "Strasbourg", "Toulouse", "Cannes"],
-    "🇮🇹 Italy": ["Rome", "Florence", "Venice", "Milan", "Naples", "Bologna", "Turin", "Palermo"],
-    "🇪🇸 Spain": ["Madrid", "Barcelona", "Seville", "Valencia", "Bilbao", "Granada", "Toledo", "San Sebastian"],
-    "🇩🇪 Germany": ["Berlin", "Munich", "Hamburg", "Cologne", "Frankfurt", "Dresden", "Heidelberg", "Rothenburg"],
-    "🇯🇵 Japan": ["Tokyo", "Kyoto", "Osaka", "Hiroshima", "Nara", "Hakone", "Takayama", "Nikko"],
-    "🇹🇭 Thailand": ["Bangkok", "Chiang Mai", "Phuket", "Krabi", "Koh Samui", "Pattaya", "Ayutthaya", "Sukhothai"],
-    "🇸🇬 Singapore": ["Marina Bay", "Chinatown", "Little India", "Orchard Road", "Sentosa Island"],
-    "🇦🇺 Australia": ["Sydney", "Melbourne", "Brisbane", "Perth", "Adelaide", "Gold Coast", "Cairns", "Darwin"],
-    "🇨🇦 Canada": ["Toronto", "Vancouver", "Montreal", "Quebec City", "Calgary", "Ottawa", "Banff", "Victoria"],
-    "🇧🇷 Brazil": ["Rio de Janeiro", "São Paulo", "Salvador", "Brasília", "Recife", "Fortaleza", "Manaus", "Florianópolis"],
-    "🇲🇽 Mexico": ["Mexico City", "Cancun", "Playa del Carmen", "Puerto Vallarta", "Guadalajara", "Oaxaca", "Merida", "Tulum"],
-    "🇱🇰 Sri Lanka": ["Colombo", "Kandy", "Galle", "Sigiriya", "Nuwara Eliya", "Anuradhapura", "Polonnaruwa", "Ella"],
-    "🇮🇳 India": ["Delhi", "Mumbai", "Goa", "Jaipur", "Kerala", "Agra", "Varanasi", "Rishikesh"],
-    "🇨🇳 China": ["Beijing", "Shanghai", "Xi'an", "Guilin", "Chengdu", "Hangzhou", "Suzhou", "Zhangjiajie"],
-    "🇰🇷 South Korea": ["Seoul", "Busan", "Jeju Island", "Gyeongju", "Incheon", "Daegu", "Andong", "Jeonju"],
-    "🇪🇬 Egypt": ["Cairo", "Luxor", "Aswan", "Alexandria", "Hurghada", "Sharm El Sheikh", "Dahab", "Siwa Oasis"],
-    "🇿🇦 South Africa": ["Cape Town", "Johannesburg", "Durban", "Port Elizabeth", "Stellenbosch", "Hermanus", "Knysna", "Plettenberg Bay"]
-}
+if 'finished_jobs' not in st.session_state:
+    st.session_state.finished_jobs = set()
 
 # Travel interests
 INTERESTS = [
@@ -92,7 +79,7 @@ def format_travel_input(country, destination, budget, currency, interests, start
     duration = (end_date - start_date).days + 1
     
     travel_request = f"""
-I want to plan a trip to {destination}, {country.replace('🏴 ', '').replace('🇺🇸 ', '').replace('🇬🇧 ', '').replace('🇫🇷 ', '').replace('🇮🇹 ', '').replace('🇪🇸 ', '').replace('🇩🇪 ', '').replace('🇯🇵 ', '').replace('🇹🇭 ', '').replace('🇸🇬 ', '').replace('🇦🇺 ', '').replace('🇨🇦 ', '').replace('🇧🇷 ', '').replace('🇲🇽 ', '').replace('🇱🇰 ', '').replace('🇮🇳 ', '').replace('🇨🇳 ', '').replace('🇰🇷 ', '').replace('🇪🇬 ', '').replace('🇿🇦 ', '')} for {duration} days.
+I want to plan a trip to {destination}, {country_name(country)} for {duration} days.
 
 **Travel Details:**
 - Destination: {destination}, {country}
@@ -167,6 +154,10 @@ with st.sidebar:
         for i, trip in enumerate(reversed(st.session_state.trip_history[-3:])):
             with st.expander(f"Trip {len(st.session_state.trip_history) - i}"):
                 st.write(trip[:100] + "..." if len(trip) > 100 else trip)
+    
+    # Runtime metrics for this process
+    with st.expander("📈 Metrics"):
+        st.json(metrics_registry.snapshot())
 
 # Main content
 st.title("🌍 Enhanced Travel Assistant with Smart Planning")
@@ -282,6 +273,12 @@ elif input_method == "Audio":
     st.markdown("### 🎤 Record Your Travel Request")
     st.info("Upload an audio file describing your travel plans!")
     
+    # Start loading Whisper in the background while the user picks a file
+    try:
+        get_transcription_worker().warm_up()
+    except Exception:
+        pass
+    
     audio_file = st.file_uploader(
         "Upload audio file",
         type=['mp3', 'wav', 'm4a', 'ogg'],
@@ -354,9 +351,7 @@ if input_text or selected_destination:
     
     # Extract destinations from text if not using smart form
     if not destination_for_images and input_text:
-        destinations = re.findall(r'(?:visit|go to|travel to|trip to)\s+([A-Z][a-zA-Z\s,]+?)(?:\s|,|\.|\n|$)', input_text, re.IGNORECASE)
-        if destinations:
-            destination_for_images = destinations[0].strip().strip(',').strip('.')
+        destination_for_images = extract_destination(input_text)
     
     if destination_for_images:
         st.markdown("### 🏞️ Destination Preview")
@@ -439,175 +434,204 @@ with st.expander("💡 Smart Planning Tips"):
     - Add extra 20% to your budget for unexpected expenses
     """)
 
-# Trip planning button and processing
+# Trip planning button: the plan runs as a background job, this script only submits and polls
 if st.button("🚀 Plan My Trip", type="primary", use_container_width=True):
     if not input_text.strip():
         st.warning("Please provide your travel request first!")
         st.stop()
     
-    current_time = time.time()
-    time_since_last_request = current_time - st.session_state.last_request_time
+    # Provider quotas are enforced by the shared rate limiter, which queues calls instead of refusing them.
+    # The job id lives in the URL so a refreshed page re-attaches to the same job
+    st.query_params["job"] = submit_trip_job(input_text, selected_destination, show_ai_images)
+
+job_id = st.query_params.get("job")
+job = get_trip_job(job_id) if job_id else None
+
+if job is not None and job["status"] in JOB_ACTIVE:
+    node_status = {
+        "Planner": "🗓️ Creating your personalized itinerary...",
+        "Budgeter": "💰 Working out your budget...",
+        "Booking": "🎫 Finding booking options..."
+    }
+    node_progress = {"Planner": 40, "Budgeter": 60, "Booking": 75}
+    progress = job["progress"] or {}
+    
+    finished = progress.get("finished_nodes", [])
+    st.progress(max([10] + [node_progress.get(node, 75) for node in finished]))
+    if job["status"] == "queued":
+        st.text("⏳ Waiting for a free planner...")
+    elif progress.get("stage") == "visuals":
+        st.text("🖼️ Preparing destination visuals...")
+    else:
+        st.text(node_status.get(progress.get("node"), "Working..."))
+    # Partial answers of every agent that has started (agents may run in parallel)
+    for node, text in progress.get("text", {}).items():
+        if text:
+            st.markdown(text)
+    
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
+
+elif job is not None and job["status"] == "error":
+    error = job["error"] or "Unknown error"
+    st.error(f"❌ An error occurred: {error}")
+    
+    if "rate limit" in error.lower() or "429" in error:
+        st.session_state.rate_limit_hit = True
+        st.session_state.rate_limit_reset_time = datetime.now() + timedelta(minutes=15)
+        st.warning("Rate limit reached. Please wait 15 minutes before trying again.")
+    
+    st.markdown("### 🛠️ Troubleshooting")
+    st.info("""
+    **If you're seeing errors, try:**
+    1. Wait a few minutes and try again (rate limits)
+    2. Use the Smart Form for better results
+    3. Check your API keys in the sidebar
+    4. Simplify your request
+    5. Try a different input method
+    """)
+
+elif job is not None:
+    result = job["result"]["plan"]
+    timings = job["result"]["timings"] or {}
+    job_input = job["payload"]["input"]
+    job_destination = job["payload"]["destination"]
+    
+    # Session bookkeeping happens once per job, not on every rerun that shows it
+    if job_id not in st.session_state.finished_jobs:
+        st.session_state.finished_jobs.add(job_id)
+        st.session_state.rate_limit_hit = False
+        st.session_state.rate_limit_reset_time = None
+        st.session_state.trip_history.append(job_input[:200] + "..." if len(job_input) > 200 else job_input)
+        visuals = job["result"]["visuals"]
+        if visuals and job_destination not in st.session_state.destination_images:
+            st.session_state.destination_images[job_destination] = decode_visuals(visuals)
+    
+    st.markdown("## 🎯 Your Complete Travel Plan")
     
-    min_delay = 30
-    if time_since_last_request < min_delay:
-        remaining_time = int(min_delay - time_since_last_request)
-        st.warning(f"⏳ Please wait {remaining_time} seconds to avoid rate limits.")
-        st.stop()
+    # Create enhanced tabs
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📅 Itinerary", "💰 Budget", "🎫 Booking", "🖼️ Visuals", "📱 Summary"])
     
-    try:
-        progress_container = st.container()
-        with progress_container:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            status_text.text("🗓️ Creating your personalized itinerary...")
-            progress_bar.progress(25)
-            
-            result = plan_trip({"input": input_text})
-            
-            progress_bar.progress(75)
-            status_text.text("🖼️ Preparing destination visuals...")
-            
-            # Auto-load images for selected destination
-            if selected_destination and selected_destination not in st.session_state.destination_images:
-                try:
-                    visual_data = get_enhanced_destination_visuals(
-                        selected_destination, 
-                        include_ai_generation=show_ai_images,
-                        use_streamlit_display=False  
-                    )
-                    st.session_state.destination_images[selected_destination] = visual_data
-                except:
-                    pass 
-            
-            progress_bar.progress(100)
-            status_text.text("✅ Trip planning complete!")
-            time.sleep(1)
-            progress_container.empty()
+    with tab1:
+        st.markdown("### 🗓️ Day-by-Day Itinerary")
+        if result.get('planner_output'):
+            st.markdown(result['planner_output'])
+        else:
+            st.warning("Itinerary not generated")
+            if result.get('errors', {}).get('Planner'):
+                st.caption(result['errors']['Planner'])
+    
+    with tab2:
+        st.markdown("### 💰 Budget Breakdown")
+        if result.get('budgeter_output'):
+            st.markdown(result['budgeter_output'])
+        else:
+            st.warning("Budget not generated")
+            if result.get('errors', {}).get('Budgeter'):
+                st.caption(result['errors']['Budgeter'])
+    
+    with tab3:
+        st.markdown("### 🎫 Booking Recommendations")
+        if result.get('booking_output'):
+            st.markdown(result['booking_output'])
+        else:
+            st.warning("Booking info not generated")
+            if result.get('errors', {}).get('Booking'):
+                st.caption(result['errors']['Booking'])
+    
+    with tab4:
+        st.markdown("### 🖼️ Destination Gallery")
         
-        # Update session state
-        st.session_state.last_request_time = time.time()
-        st.session_state.rate_limit_hit = False
-        st.session_state.rate_limit_reset_time = None
-        st.session_state.trip_history.append(input_text[:200] + "..." if len(input_text) > 200 else input_text)
+        # Show Google Images for selected destination
+        if job_destination:
+            google_urls = get_google_images_urls(job_destination, num_images=6)
+            if google_urls:
+                st.markdown(f"#### 🔍 {job_destination} Image Gallery")
+                cols = st.columns(3)
+                for i, img_data in enumerate(google_urls):
+                    with cols[i % 3]:
+                        st.markdown(f"""
+                        <div style="
+                            border: 1px solid #ddd; 
+                            border-radius: 8px; 
+                            padding: 12px; 
+                            text-align: center; 
+                            background: #fdfdfd; 
+                            margin-bottom: 10px;
+                        ">
+                            <h6 style="margin: 0 0 8px 0; color: #333; font-size: 13px;">{img_data['title']}</h6>
+                            <a href="{img_data['url']}" target="_blank" style="
+                                display: inline-block; 
+                                background: linear-gradient(135deg, #4285f4, #34a853); 
+                                color: white; 
+                                padding: 8px 14px; 
+                                text-decoration: none; 
+                                border-radius: 20px;
+                                font-size: 12px;
+                                font-weight: 500;
+                            ">🔗 View Images</a>
+                        </div>
+                        """, unsafe_allow_html=True)
         
-        st.markdown("## 🎯 Your Complete Travel Plan")
+        # Show loaded visual content
+        if st.session_state.destination_images:
+            for dest, visual_data in st.session_state.destination_images.items():
+                display_enhanced_images_streamlit(
+                    dest, 
+                    visual_data.get('google_urls', []), 
+                    visual_data.get('generated_images', []), 
+                    visual_data.get('sample_urls', [])
+                )
+                st.markdown("---")
+        else:
+            st.info("💡 Use the 'Load More Visual Content' button above to see additional images!")
+    
+    with tab5:
+        st.markdown("### 📋 Trip Summary")
         
-        # Create enhanced tabs
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(["📅 Itinerary", "💰 Budget", "🎫 Booking", "🖼️ Visuals", "📱 Summary"])
+        # Display trip metrics
+        col1, col2, col3 = st.columns(3)
         
-        with tab1:
-            st.markdown("### 🗓️ Day-by-Day Itinerary")
-            if result.get('planner_output'):
-                st.markdown(result['planner_output'])
+        with col1:
+            if input_method == "Smart Form" and job_destination:
+                st.metric("Destination", job_destination)
+                if 'start_date' in locals() and 'end_date' in locals():
+                    duration = (end_date - start_date).days + 1
+                    st.metric("Duration", f"{duration} days")
             else:
-                st.warning("Itinerary not generated")
+                st.metric("Input Method", input_method)
+                st.metric("Request Length", f"{len(job_input)} chars")
         
-        with tab2:
-            st.markdown("### 💰 Budget Breakdown")
-            if result.get('budgeter_output'):
-                st.markdown(result['budgeter_output'])
+        with col2:
+            if input_method == "Smart Form":
+                st.metric("Budget", f"{currency} {budget:,}" if 'budget' in locals() else "Not set")
+                st.metric("Interests", f"{len(interests)}" if 'interests' in locals() else "0")
             else:
-                st.warning("Budget not generated")
+                st.metric("APIs Available", len(available_apis))
+                st.metric("Images Loaded", len(st.session_state.destination_images))
         
-        with tab3:
-            st.markdown("### 🎫 Booking Recommendations")
-            if result.get('booking_output'):
-                st.markdown(result['booking_output'])
-            else:
-                st.warning("Booking info not generated")
+        with col3:
+            if timings.get("time_to_first_token") is not None:
+                st.metric("First Token", f"{timings['time_to_first_token']:.1f}s")
+            st.write("**Generated:**")
+            st.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            st.write("**Status:**")
+            st.success("✅ Complete")
         
-        with tab4:
-            st.markdown("### 🖼️ Destination Gallery")
-            
-            # Show Google Images for selected destination
-            if selected_destination:
-                google_urls = get_google_images_urls(selected_destination, num_images=6)
-                if google_urls:
-                    st.markdown(f"#### 🔍 {selected_destination} Image Gallery")
-                    cols = st.columns(3)
-                    for i, img_data in enumerate(google_urls):
-                        with cols[i % 3]:
-                            st.markdown(f"""
-                            <div style="
-                                border: 1px solid #ddd; 
-                                border-radius: 8px; 
-                                padding: 12px; 
-                                text-align: center; 
-                                background: #fdfdfd; 
-                                margin-bottom: 10px;
-                            ">
-                                <h6 style="margin: 0 0 8px 0; color: #333; font-size: 13px;">{img_data['title']}</h6>
-                                <a href="{img_data['url']}" target="_blank" style="
-                                    display: inline-block; 
-                                    background: linear-gradient(135deg, #4285f4, #34a853); 
-                                    color: white; 
-                                    padding: 8px 14px; 
-                                    text-decoration: none; 
-                                    border-radius: 20px;
-                                    font-size: 12px;
-                                    font-weight: 500;
-                                ">🔗 View Images</a>
-                            </div>
-                            """, unsafe_allow_html=True)
-            
-            # Show loaded visual content
-            if st.session_state.destination_images:
-                for dest, visual_data in st.session_state.destination_images.items():
-                    display_enhanced_images_streamlit(
-                        dest, 
-                        visual_data.get('google_urls', []), 
-                        visual_data.get('generated_images', []), 
-                        visual_data.get('sample_urls', [])
-                    )
-                    st.markdown("---")
-            else:
-                st.info("💡 Use the 'Load More Visual Content' button above to see additional images!")
+        # Original request
+        with st.expander("📝 Original Request"):
+            st.write(job_input[:500] + "..." if len(job_input) > 500 else job_input)
         
-        with tab5:
-            st.markdown("### 📋 Trip Summary")
-            
-            # Display trip metrics
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                if input_method == "Smart Form" and selected_destination:
-                    st.metric("Destination", selected_destination)
-                    if 'start_date' in locals() and 'end_date' in locals():
-                        duration = (end_date - start_date).days + 1
-                        st.metric("Duration", f"{duration} days")
-                else:
-                    st.metric("Input Method", input_method)
-                    st.metric("Request Length", f"{len(input_text)} chars")
-            
-            with col2:
-                if input_method == "Smart Form":
-                    st.metric("Budget", f"{currency} {budget:,}" if 'budget' in locals() else "Not set")
-                    st.metric("Interests", f"{len(interests)}" if 'interests' in locals() else "0")
-                else:
-                    st.metric("APIs Available", len(available_apis))
-                    st.metric("Images Loaded", len(st.session_state.destination_images))
-            
-            with col3:
-                st.write("**Generated:**")
-                st.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-                st.write("**Status:**")
-                st.success("✅ Complete")
-            
-            # Original request
-            with st.expander("📝 Original Request"):
-                st.write(input_text[:500] + "..." if len(input_text) > 500 else input_text)
-            
-            # Export functionality
-            st.markdown("### 📤 Export Your Plan")
-            
-            export_data = f"""
+        # Export functionality
+        st.markdown("### 📤 Export Your Plan")
+        
+        export_data = f"""
 # Travel Plan Export
 **Generated:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-**Destination:** {selected_destination if selected_destination else "Multiple destinations"}
+**Destination:** {job_destination if job_destination else "Multiple destinations"}
 
 ## Original Request
-{input_text}
+{job_input}
 
 ## Itinerary
 {result.get('planner_output', 'Not generated')}
@@ -617,33 +641,15 @@ if st.button("🚀 Plan My Trip", type="primary", use_container_width=True):
 
 ## Booking Information
 {result.get('booking_output', 'Not generated')}
-            """
-            
-            st.download_button(
-                label="📄 Download Complete Plan",
-                data=export_data,
-                file_name=f"travel_plan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                mime="text/plain",
-                use_container_width=True
-            )
-
-    except Exception as e:
-        st.error(f"❌ An error occurred: {str(e)}")
-        
-        if "rate limit" in str(e).lower() or "429" in str(e):
-            st.session_state.rate_limit_hit = True
-            st.session_state.rate_limit_reset_time = datetime.now() + timedelta(minutes=15)
-            st.warning("Rate limit reached. Please wait 15 minutes before trying again.")
+        """
         
-        st.markdown("### 🛠️ Troubleshooting")
-        st.info("""
-        **If you're seeing errors, try:**
-        1. Wait a few minutes and try again (rate limits)
-        2. Use the Smart Form for better results
-        3. Check your API keys in the sidebar
-        4. Simplify your request
-        5. Try a different input method
-        """)
+        st.download_button(
+            label="📄 Download Complete Plan",
+            data=export_data,
+            file_name=f"travel_plan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+            mime="text/plain",
+            use_container_width=True
+        )
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,68 @@
+"""Throughput of the offline cost model, batched vs one trip at a time.
+
+Run from Agent_AI/:
+
+    python -m benchmarks.bench_cost_model --trips 10000
+"""
+import argparse
+import json
+import random
+import time
+
+from agents.cost_model import TripFacts, get_cost_model
+
+DESTINATIONS = ["Kyoto, Japan", "Paris", "Bangkok", "Galle, Sri Lanka", "New York City", "Cape Town",
+                "Reykjavik, Iceland", "Cusco, Peru", "Marrakesh, Morocco", "Sydney", "Unknown Island"]
+CURRENCIES = ["USD", "EUR", "GBP", "JPY", "LKR", "INR", "AUD", "CAD"]
+
+
+def synthetic_trips(count, seed=0):
+    rng = random.Random(seed)
+    trips = []
+    for _ in range(count):
+        days = rng.randint(2, 14)
+        activities = [(rng.randint(1, days), rng.choice([0, 5, 12, 30, 60]))
+                      for _ in range(rng.randint(0, 3 * days))]
+        trips.append(TripFacts(
+            destination=rng.choice(DESTINATIONS), days=days, travelers=rng.randint(1, 5),
+            currency=rng.choice(CURRENCIES), budget=rng.choice([None, 1500, 3000, 8000]),
+            activity_costs=activities,
+        ))
+    return trips
+
+
+def run(count):
+    model = get_cost_model()
+    trips = synthetic_trips(count)
+    # Warm the gazetteer and the destination cache so both runs measure the arithmetic
+    model.estimate_batch(trips[:len(DESTINATIONS) * 5])
+
+    start = time.perf_counter()
+    batched = model.estimate_batch(trips)
+    batch_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [model.estimate(trip) for trip in trips]
+    loop_s = time.perf_counter() - start
+
+    mismatches = sum(abs(a.total - b.total) > 1e-6 * max(1.0, a.total) for a, b in zip(batched, single))
+    return {
+        "trips": count,
+        "batch_s": round(batch_s, 4),
+        "batch_us_per_trip": round(batch_s / count * 1e6, 1),
+        "one_at_a_time_s": round(loop_s, 4),
+        "one_at_a_time_us_per_trip": round(loop_s / count * 1e6, 1),
+        "speedup": round(loop_s / batch_s, 1),
+        "mismatched_totals": mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trips", type=int, default=10000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.trips), indent=2))
+
+
+if __name__ == "__main__":
+    main()
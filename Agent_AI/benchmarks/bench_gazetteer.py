@@ -0,0 +1,107 @@
+"""Gazetteer lookup time as the location catalogue grows.
+
+Run from Agent_AI/:
+
+    python -m benchmarks.bench_gazetteer --sizes 10 1000 10000 50000
+
+For each size a synthetic JSONL catalogue (cities plus the countries that
+contain them) is written to a temporary directory. The script reports the
+index build time and the per-lookup latency of the compiled Aho-Corasick
+index next to the old linear substring scan over a dict. Indexed lookups
+should stay flat; the linear scan grows with the catalogue.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import time
+
+from utils.gazetteer import Gazetteer
+
+QUERIES = [
+    "Two weeks in {city}, {country} with a mid-range budget",
+    "Family trip to {country}",
+    "Weekend in {city}",
+    "Somewhere warm with beaches and good food",
+]
+
+
+def _name(rng, words):
+    return " ".join(
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+        for _ in range(words)
+    )
+
+
+def write_catalogue(path, size, rng):
+    """size records, roughly one country per 50 cities; returns (city, country) pairs"""
+    countries = [_name(rng, rng.randint(1, 2)) for _ in range(max(1, size // 50))]
+    places = []
+    with open(path, "w") as f:
+        for country in countries:
+            f.write(json.dumps({"name": country, "kind": "country", "styles": ["scenic view"]}) + "\n")
+        for _ in range(max(0, size - len(countries))):
+            city, country = _name(rng, rng.randint(1, 3)), rng.choice(countries)
+            places.append((city, country))
+            f.write(json.dumps({"name": city, "kind": "city", "country": country, "styles": ["scenic view"]}) + "\n")
+    return places or [(countries[0], countries[0])]
+
+
+def linear_lookup(catalogue, text):
+    """The previous approach: substring test against every known name"""
+    text = text.lower()
+    for name, record in catalogue.items():
+        if name in text:
+            return record
+    return None
+
+
+def _per_call_us(fn, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            fn(query)
+    return round((time.perf_counter() - start) / (repeat * len(queries)) * 1e6, 2)
+
+
+def run(sizes, repeat):
+    rng = random.Random(0)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"locations_{size}.jsonl")
+            places = write_catalogue(path, size, rng)
+            queries = [
+                template.format(city=city, country=country)
+                for city, country in rng.sample(places, min(25, len(places)))
+                for template in QUERIES
+            ]
+            gazetteer = Gazetteer(path)
+            start = time.perf_counter()
+            gazetteer.lookup("warm up")
+            build_s = time.perf_counter() - start
+
+            with open(path) as f:
+                catalogue = {record["name"]: record for record in map(json.loads, f)}
+
+            results.append({
+                "locations": size,
+                "index_build_s": round(build_s, 3),
+                "indexed_lookup_us": _per_call_us(gazetteer.lookup, queries, repeat),
+                "linear_scan_us": _per_call_us(lambda q: linear_lookup(catalogue, q), queries, repeat),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.sizes, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Wall-clock latency of the linear vs parallel trip graph.
+
+Agents are replaced by sleep stubs so only the topology is measured. Run from Agent_AI/:
+
+    python -m benchmarks.bench_graph_modes --runs 5 --planner 1.0 --budgeter 1.5 --booking 1.5
+"""
+import argparse
+import json
+import statistics
+import time
+
+from workflows import trip_graph
+
+
+def _stub(name, seconds):
+    def run(input_text, *args, **kwargs):
+        time.sleep(seconds)
+        return f"{name} output. Total estimated budget: $1,500"
+
+    def stream(input_text, *args, **kwargs):
+        yield run(input_text)
+
+    return run, stream
+
+
+def run(runs, planner, budgeter, booking):
+    trip_graph.run_planner, trip_graph.stream_planner = _stub("Planner", planner)
+    trip_graph.run_planner_structured = lambda input_text, *args, **kwargs: None
+    trip_graph.run_budgeter, trip_graph.stream_budgeter = _stub("Budgeter", budgeter)
+    trip_graph.run_booking, trip_graph.stream_booking = _stub("Booking", booking)
+
+    results = {}
+    for mode in trip_graph.GRAPH_MODES:
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            trip_graph.plan_trip({"input": "7 days in Kyoto"}, mode=mode, use_cache=False)
+            samples.append(time.perf_counter() - start)
+        results[mode] = {
+            "mean_s": round(statistics.mean(samples), 3),
+            "min_s": round(min(samples), 3),
+            "max_s": round(max(samples), 3),
+        }
+    results["speedup"] = round(results["linear"]["mean_s"] / results["parallel"]["mean_s"], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--planner", type=float, default=1.0, help="stub Planner latency (s)")
+    parser.add_argument("--budgeter", type=float, default=1.5, help="stub Budgeter latency (s)")
+    parser.add_argument("--booking", type=float, default=1.5, help="stub Booking latency (s)")
+    args = parser.parse_args()
+    print(json.dumps(run(args.runs, args.planner, args.budgeter, args.booking), indent=2))
+
+
+if __name__ == "__main__":
+    main()
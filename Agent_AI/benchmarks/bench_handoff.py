@@ -0,0 +1,253 @@
+"""Prompt size and latency of each agent with the full-text vs the compact hand-off.
+
+"full" is the old behaviour (Budgeter reads the planner markdown, Booking reads the
+whole budget); "compact" is the structured itinerary brief. Agents are replaced by
+stubs that return realistic answers and sleep base + per-token prefill time, so the
+numbers show what the hand-off alone changes. The JSON planner is stubbed one level
+lower, at the Groq client, so its real prompt, fallback and parsing are exercised and
+the run fails if they do not yield an itinerary. Run from Agent_AI/:
+
+    python -m benchmarks.bench_handoff --runs 5 --base-ms 400 --ms-per-1k-tokens 250
+
+With --live the Budgeter and Booking prompts from both hand-offs are sent to the
+configured providers (uncached) and their real latency is reported as well.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from agents import planner
+from agents.itinerary import parse_itinerary, render_markdown
+from workflows import trip_graph
+
+REQUEST = "5 days in Kyoto for 2 people in April, temples, food markets and a day trip to Nara"
+
+PLAN_JSON = json.dumps({
+    "destination": "Kyoto, Japan", "travelers": 2, "currency": "USD",
+    "plan": [
+        {"day": 1, "title": "Arrival and Higashiyama", "activities": [
+            {"time": "14:00", "name": "Check in near Gion", "location": "Gion", "cost": None},
+            {"time": "16:00", "name": "Kiyomizu-dera", "location": "Higashiyama", "cost": 3},
+            {"time": "18:30", "name": "Sannenzaka and Ninenzaka walk", "location": "Higashiyama", "cost": 0},
+            {"time": "20:00", "name": "Kaiseki dinner", "location": "Pontocho", "cost": 60}]},
+        {"day": 2, "title": "Fushimi and markets", "activities": [
+            {"time": "07:30", "name": "Fushimi Inari torii hike", "location": "Fushimi", "cost": 0},
+            {"time": "12:00", "name": "Nishiki Market lunch", "location": "Nakagyo", "cost": 20},
+            {"time": "15:00", "name": "Nijo Castle", "location": "Nakagyo", "cost": 9},
+            {"time": "19:00", "name": "Izakaya crawl", "location": "Kiyamachi", "cost": 35}]},
+        {"day": 3, "title": "Arashiyama", "activities": [
+            {"time": "08:00", "name": "Bamboo grove", "location": "Arashiyama", "cost": 0},
+            {"time": "10:00", "name": "Tenryu-ji garden", "location": "Arashiyama", "cost": 4},
+            {"time": "13:00", "name": "Sagano scenic railway", "location": "Arashiyama", "cost": 6},
+            {"time": "16:00", "name": "Kinkaku-ji", "location": "Kita", "cost": 4}]},
+        {"day": 4, "title": "Nara day trip", "activities": [
+            {"time": "08:30", "name": "Kintetsu train to Nara", "location": "Kyoto Station", "cost": 7},
+            {"time": "10:00", "name": "Todai-ji and Nara Park", "location": "Nara", "cost": 5},
+            {"time": "14:00", "name": "Kasuga Taisha", "location": "Nara", "cost": 4},
+            {"time": "18:00", "name": "Return and ramen dinner", "location": "Kyoto Station", "cost": 12}]},
+        {"day": 5, "title": "Philosopher's Path and departure", "activities": [
+            {"time": "08:00", "name": "Philosopher's Path", "location": "Sakyo", "cost": 0},
+            {"time": "10:00", "name": "Ginkaku-ji", "location": "Sakyo", "cost": 4},
+            {"time": "13:00", "name": "Haruka express to Kansai Airport", "location": "Kyoto Station", "cost": 25}]},
+    ],
+    "tips": ["Buy an ICOCA card for buses and trains", "Temples open around 8:00; go early in April",
+             "Book kaiseki dinners a week ahead"],
+})
+
+# A typical free-form planner answer for the same request, as the old prompt produced it
+PLAN_MARKDOWN = "\n".join(
+    [
+        "# Kyoto Cherry Blossom Adventure: 5-Day Itinerary for 2",
+        "",
+        "Welcome to Kyoto! April is one of the most beautiful times of year to visit, with cherry blossoms "
+        "lining the canals and temple grounds. Below is a carefully balanced plan mixing iconic sights, "
+        "hidden gems and plenty of time for food.",
+        "",
+    ]
+    + [
+        line
+        for day in json.loads(PLAN_JSON)["plan"]
+        for line in [f"## Day {day['day']}: {day['title']}", ""]
+        + [
+            f"* **{a['time']}** - **{a['name']}** ({a['location']}): Spend a relaxed couple of hours here. "
+            f"This is one of the highlights of the area, so arrive early to beat the crowds and take your "
+            f"time to enjoy the atmosphere, the architecture and the seasonal scenery."
+            + (f" Entry costs about ${a['cost']} per person." if a["cost"] else "")
+            for a in day["activities"]
+        ]
+        + ["", "*Getting around:* Use the city buses or walk; most sights are within 20 minutes of each other.", ""]
+    ]
+    + [
+        "## Important Travel Tips",
+        "",
+        "1. **Transport:** Buy an ICOCA card for buses and trains; it also works at convenience stores.",
+        "2. **Timing:** Temples open around 8:00. In April, crowds build quickly after 9:30.",
+        "3. **Dining:** Book kaiseki dinners a week ahead, especially on weekends.",
+        "4. **Etiquette:** Remove shoes where asked and keep voices low in temple grounds.",
+        "",
+        "Enjoy your unforgettable journey through Japan's ancient capital!",
+    ]
+)
+
+BUDGET_MARKDOWN = """# Kyoto 5-Day Budget Breakdown (2 travelers)
+
+Planning a trip to Kyoto in April requires some care, since it is peak cherry blossom season and prices
+rise accordingly. Below is a detailed estimate for two people travelling in mid-range comfort.
+
+## 1. Transportation
+* **Round-trip flights:** approximately $1,400 ($700 per person) depending on your origin city.
+* **Haruka express airport transfers:** $50 for two.
+* **ICOCA card top-ups for buses and trains:** $60 over five days.
+* **Nara day trip trains:** $28 round trip for two.
+
+## 2. Accommodation
+* **Ryokan or boutique hotel near Gion:** $180 per night x 4 nights = $720.
+* Consider booking early; April rates can be 30% higher than the rest of spring.
+
+## 3. Food and Dining
+* **Breakfasts:** $15 per person per day = $150.
+* **Lunches (markets, noodles):** $20 per person per day = $200.
+* **Dinners including one kaiseki meal:** $300.
+
+## 4. Activities and Attractions
+* **Temple and castle entries:** $80 for two.
+* **Sagano scenic railway:** $12.
+
+## 5. Additional Expenses
+* **Travel insurance:** $90.
+* **Souvenirs and incidentals:** $150.
+
+## 6. Total Estimated Budget
+**Total: $3,240** for two travelers (about $1,620 per person).
+
+## 7. Money-Saving Tips
+* Eat lunch at depachika food halls for great value.
+* Visit free shrines like Fushimi Inari early in the morning.
+* Use a one-day bus pass on your busiest sightseeing day.
+"""
+
+BOOKING_ANSWER = "Flights, ryokan options near Gion and booking tips. " * 20
+
+
+def tokens(text):
+    """Same four-characters-per-token rule the rate limiter uses"""
+    return len(text or "") // 4
+
+
+class StubAgents:
+    """Swap the agents in trip_graph for recorders with a prompt-size latency model"""
+
+    def __init__(self, base_ms, ms_per_1k_tokens, structured):
+        self.base_ms = base_ms
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.structured = structured
+        self.inputs = {}
+
+    def _agent(self, node, answer):
+        def run(input_text, *args, **kwargs):
+            self.inputs[node] = input_text
+            time.sleep((self.base_ms + tokens(input_text) / 1000 * self.ms_per_1k_tokens) / 1000)
+            return answer
+
+        def stream(input_text, *args, **kwargs):
+            yield run(input_text)
+
+        return run, stream
+
+    def install(self):
+        trip_graph.run_planner, trip_graph.stream_planner = self._agent("Planner", PLAN_MARKDOWN)
+        if self.structured:
+            groq, _ = self._agent("Planner", PLAN_JSON)
+            planner.groq_chat = lambda prompt, *args, json_mode=False, **kwargs: (
+                groq(prompt) if json_mode else PLAN_MARKDOWN
+            )
+            trip_graph.run_planner_structured = lambda text, *args, **kwargs: planner.run_planner_structured(
+                text, use_cache=False
+            )
+        else:
+            trip_graph.run_planner_structured = lambda *args, **kwargs: None
+        trip_graph.run_budgeter, trip_graph.stream_budgeter = self._agent("Budgeter", BUDGET_MARKDOWN)
+        trip_graph.run_booking, trip_graph.stream_booking = self._agent("Booking", BOOKING_ANSWER)
+
+
+def full_inputs(mode):
+    """What the Budgeter and Booking read before the compact hand-off"""
+    return {"Budgeter": PLAN_MARKDOWN, "Booking": BUDGET_MARKDOWN if mode == "linear" else PLAN_MARKDOWN}
+
+
+def run(runs, base_ms, ms_per_1k_tokens, mode):
+    results = {}
+    # The JSON planner only runs with a Groq or Gemini key; the stubbed client never uses it
+    stub_key = not os.getenv("GROQ_API_KEY")
+    if stub_key:
+        os.environ["GROQ_API_KEY"] = "stub"
+    for label, structured in (("compact_json", True), ("compact_markdown", False)):
+        stub = StubAgents(base_ms, ms_per_1k_tokens, structured)
+        stub.install()
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = trip_graph.plan_trip({"input": REQUEST}, mode=mode, use_cache=False)
+            samples.append(time.perf_counter() - start)
+            if structured and not result.get("itinerary"):
+                raise SystemExit("JSON planner answer did not parse into an itinerary; "
+                                 f"errors: {result.get('errors')}")
+        results[label] = {"inputs": dict(stub.inputs), "graph_mean_s": round(statistics.mean(samples), 3)}
+
+    def modeled_ms(text):
+        return round(base_ms + tokens(text) / 1000 * ms_per_1k_tokens, 1)
+
+    report = {"mode": mode, "nodes": {}}
+    full = full_inputs(mode)
+    for node in ("Budgeter", "Booking"):
+        row = {"full": {"chars": len(full[node]), "tokens": tokens(full[node]), "modeled_ms": modeled_ms(full[node])}}
+        for label, result in results.items():
+            text = result["inputs"][node]
+            row[label] = {"chars": len(text), "tokens": tokens(text), "modeled_ms": modeled_ms(text),
+                          "token_reduction_pct": round(100 * (1 - tokens(text) / tokens(full[node])), 1)}
+        report["nodes"][node] = row
+    if stub_key:
+        del os.environ["GROQ_API_KEY"]
+    report["graph_mean_s"] = {label: result["graph_mean_s"] for label, result in results.items()}
+    report["display_markdown_chars"] = len(render_markdown(parse_itinerary(PLAN_JSON)))
+    return report, results["compact_json"]["inputs"]
+
+
+def live(inputs, runs, mode):
+    """Time the real Budgeter and Booking with both hand-offs (uses the configured API keys)"""
+    from agents.booking import run_booking
+    from agents.budgeter import run_budgeter
+
+    agents = {"Budgeter": run_budgeter, "Booking": run_booking}
+    full = full_inputs(mode)
+    report = {}
+    for node, agent in agents.items():
+        for label, text in (("full", full[node]), ("compact", inputs[node])):
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                agent(text, use_cache=False)
+                samples.append(time.perf_counter() - start)
+            report.setdefault(node, {})[label] = {"mean_s": round(statistics.mean(samples), 3),
+                                                  "min_s": round(min(samples), 3)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--base-ms", type=float, default=400, help="stub latency independent of the prompt")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=250, help="stub prompt processing time")
+    parser.add_argument("--mode", choices=trip_graph.GRAPH_MODES, default="linear")
+    parser.add_argument("--live", action="store_true", help="also time the real providers")
+    args = parser.parse_args()
+    report, inputs = run(args.runs, args.base_ms, args.ms_per_1k_tokens, args.mode)
+    if args.live:
+        report["live"] = live(inputs, args.runs, args.mode)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
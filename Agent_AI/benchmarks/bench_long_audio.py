@@ -0,0 +1,80 @@
+"""Sequential vs chunked-parallel Whisper transcription on long recordings.
+
+Pass real speech recordings (e.g. 1, 5 and 20 minute files). Run from Agent_AI/:
+
+    python -m benchmarks.bench_long_audio one_min.mp3 five_min.mp3 twenty_min.mp3 --processes 4
+
+For each file the script reports wall-clock time for one monolithic
+model.transcribe call and for the silence-chunked parallel path, the
+speedup, and how closely the two transcripts agree (word-level similarity).
+Both paths bypass the transcription cache.
+"""
+import argparse
+import difflib
+import json
+import os
+import re
+import time
+
+from utils import audio_chunking
+from utils.audio_chunking import SAMPLE_RATE, load_audio, split_on_silence
+from utils.transcription import WHISPER_MODEL, TranscriptionWorker
+
+
+def _words(text):
+    return re.findall(r"[\w']+", text.lower())
+
+
+def word_similarity(a, b):
+    """Similarity of two transcripts over normalized words (1.0 = identical)"""
+    return round(difflib.SequenceMatcher(None, _words(a), _words(b), autojunk=False).ratio(), 4)
+
+
+def run(paths, processes, model_size):
+    audio_chunking.CACHE_ENABLED = False
+    sequential = TranscriptionWorker(model_size=model_size, processes=1, idle_unload=0)
+    parallel = TranscriptionWorker(
+        model_size=model_size, processes=processes, max_pending=1024, idle_unload=0,
+        threads=max(1, (os.cpu_count() or 1) // processes)
+    )
+    # Load the models up front so only transcription time is measured
+    sequential.submit_array(load_audio(paths[0])[:SAMPLE_RATE]).result()
+    for future in [parallel.submit_array(load_audio(paths[0])[:SAMPLE_RATE]) for _ in range(processes)]:
+        future.result()
+
+    results = []
+    for path in paths:
+        audio = load_audio(path)
+        start = time.perf_counter()
+        sequential_text = sequential.submit_array(audio).result()
+        sequential_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        chunked_text = audio_chunking.transcribe_long_audio(path, worker=parallel)
+        chunked_s = time.perf_counter() - start
+
+        results.append({
+            "file": os.path.basename(path),
+            "duration_s": round(len(audio) / SAMPLE_RATE, 1),
+            "chunks": len(split_on_silence(audio)),
+            "sequential_s": round(sequential_s, 2),
+            "chunked_parallel_s": round(chunked_s, 2),
+            "speedup": round(sequential_s / chunked_s, 2),
+            "word_similarity": word_similarity(sequential_text, chunked_text),
+        })
+    sequential.shutdown()
+    parallel.shutdown()
+    return {"model": model_size, "processes": processes, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--processes", type=int, default=audio_chunking.LONG_AUDIO_PROCESSES)
+    parser.add_argument("--model", default=WHISPER_MODEL)
+    args = parser.parse_args()
+    print(json.dumps(run(args.files, args.processes, args.model), indent=2))
+
+
+if __name__ == "__main__":
+    main()
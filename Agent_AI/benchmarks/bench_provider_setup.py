@@ -0,0 +1,113 @@
+"""Per-call provider setup cost: fresh clients on every call vs the shared registry.
+
+Run from Agent_AI/:
+
+    python -m benchmarks.bench_provider_setup --calls 200
+
+HTTP calls go to a local keep-alive server, so the numbers show connection
+setup and client construction only (no TLS, which makes the real gap larger).
+Client construction for Groq/Gemini is skipped when the SDK is not installed.
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from dotenv import load_dotenv
+
+from utils import providers
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps([{"generated_text": "ok"}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _time_calls(fn, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(statistics.median(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+def _sdk_available(module):
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def run(calls):
+    os.environ.setdefault("GROQ_API_KEY", "bench-key")
+    os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+    server = _start_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/models/bench"
+    payload = {"inputs": "hello"}
+    results = {}
+
+    # HTTP: bare requests.post opens a new connection per call
+    results["http_before"] = _time_calls(lambda: requests.post(url, json=payload, timeout=5), calls)
+    providers.reset_providers()
+    session = providers.get_http_session()
+    results["http_after"] = _time_calls(lambda: session.post(url, json=payload, timeout=5), calls)
+
+    results["dotenv_before"] = _time_calls(load_dotenv, calls)
+    results["dotenv_after"] = _time_calls(providers.ensure_env, calls)
+
+    if _sdk_available("groq"):
+        from groq import Groq
+        results["groq_client_before"] = _time_calls(lambda: Groq(api_key=os.getenv("GROQ_API_KEY")), calls)
+        results["groq_client_after"] = _time_calls(providers.get_groq_client, calls)
+
+    if _sdk_available("google.generativeai"):
+        import google.generativeai as genai
+
+        def fresh_gemini():
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            return genai.GenerativeModel(providers.GEMINI_MODEL)
+
+        results["gemini_model_before"] = _time_calls(fresh_gemini, calls)
+        providers.reset_providers()
+        results["gemini_model_after"] = _time_calls(providers.get_gemini_model, calls)
+
+    server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.calls), indent=2))
+
+
+if __name__ == "__main__":
+    main()
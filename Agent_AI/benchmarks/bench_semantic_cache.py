@@ -0,0 +1,148 @@
+"""Precision/recall of the semantic request cache per threshold, and its lookup latency.
+
+PAIRS are labelled request pairs: True when one plan serves both, False when it
+should not (different interests, length, budget or place, or a preference the
+other request rules out). A pair counts as a
+predicted match when its hard filters agree and the similarity reaches the
+threshold. Latency is measured against a throwaway cache filled with
+--entries synthetic requests. Run from Agent_AI/:
+
+    python -m benchmarks.bench_semantic_cache --entries 5000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from utils.semantic_cache import (
+    SEMANTIC_BUDGET_TOLERANCE, SEMANTIC_THRESHOLD, SemanticCache, embed, request_filters, similarity
+)
+
+PAIRS = [
+    ("7 days in Kyoto, $2000, temples and food", "one week Kyoto trip, 2k budget, food + temples", True),
+    ("7 days in Kyoto, $2000, temples and food", "Kyoto for 7 days with $2000: temple visits and local food", True),
+    ("5 days in Paris for 2 people, museums and cafes", "Paris 5 days, 2 travelers, cafes and museums", True),
+    ("10 days in Bali, surfing and beaches, $3000", "Bali 10-day trip with $3,000 budget for beaches and surf", True),
+    ("3 days in Rome, history and pasta", "Rome 3 days: historical sites and pasta", True),
+    ("weekend in Barcelona, tapas and nightlife", "Barcelona weekend trip for tapas and nightlife", True),
+    ("4 days in Lisbon in May, food and viewpoints", "Lisbon, 4 days in May - viewpoints and food", True),
+    ("6 days in Tokyo, anime, shopping and sushi", "Tokyo 6 days: sushi, shopping, anime", True),
+    ("Plan a 7 day trip to Iceland, hiking and waterfalls", "one week in Iceland for waterfalls and hikes", True),
+    ("5 days in Bangkok, street food and temples, 1000 USD",
+     "Bangkok for five days, temples and street food, budget 1000 USD", True),
+    ("2 weeks in Peru, Machu Picchu and Cusco food", "14 days in Peru: Machu Picchu, food in Cusco", True),
+    ("3 days in London with kids, museums", "London 3 days, museums with kids", True),
+    ("7 days in Kyoto, $2000", "one week in Kyoto with a $2000 budget", True),
+    ("7 days in Kyoto, $2000, avoid temples, focus on food", "one week in Kyoto, $2000, no temples, just food", True),
+    ("3 days in Rome, history, no nightlife", "Rome for 3 days: historical sites, skip the nightlife", True),
+    ("7 days in Kyoto, $2000, temples and food", "7 days in Kyoto, $2000, nightlife and shopping", False),
+    ("7 days in Kyoto, $2000, temples and food", "7 days in Kyoto, $2000, hiking and nature", False),
+    ("7 days in Kyoto, $2000, temples and food", "7 days in Kyoto, $4000, temples and food", False),
+    ("7 days in Kyoto, $2000, temples and food", "5 days in Kyoto, $2000, temples and food", False),
+    ("7 days in Kyoto, $2000, temples and food", "7 days in Osaka, $2000, temples and food", False),
+    ("5 days in Paris for 2 people, museums and cafes", "5 days in Paris for 2 people, luxury shopping", False),
+    ("10 days in Bali, surfing and beaches, $3000", "10 days in Bali, yoga retreat and rice terraces, $3000", False),
+    ("3 days in Rome, history and pasta", "3 days in Rome, nightlife and clubs", False),
+    ("weekend in Barcelona, tapas and nightlife", "weekend in Barcelona, Gaudi architecture and museums", False),
+    ("4 days in Lisbon in May, food and viewpoints", "4 days in Lisbon in December, food and viewpoints", False),
+    ("6 days in Tokyo, anime, shopping and sushi", "6 days in Tokyo, hiking Mount Takao and onsen", False),
+    ("3 days in London with kids, museums", "3 days in London, pubs and live music", False),
+    ("5 days in Bangkok, street food and temples, 1000 USD", "5 days in Bangkok, beaches and diving, 1000 USD", False),
+    ("3 days in London with kids, museums", "3 days in London for 4 people, museums", False),
+    ("7 days in Kyoto, $2000", "7 days in Kyoto, $2000, skiing", False),
+    ("7 days in Kyoto, $2000, temples and food", "7 days in Kyoto, $2000, avoid temples, focus on food", False),
+    ("7 days in Kyoto, $2000, temples and food", "7 days in Kyoto, $2000, I don't like temples, food", False),
+    ("5 days in Paris, museums and cafes", "5 days in Paris, cafes, not interested in museums", False),
+    ("3 days in Rome, nightlife and food", "3 days in Rome, food, no nightlife or clubs", False),
+    ("4 days in Lisbon, food and viewpoints", "4 days in Lisbon, food and viewpoints without the crowds", False),
+]
+
+INTERESTS = ["temples", "food", "museums", "hiking", "beaches", "nightlife", "shopping", "history", "art",
+             "wine", "diving", "markets", "architecture", "photography", "cycling", "castles", "onsen"]
+PLACES = ["Kyoto", "Paris", "Rome", "Bali", "Lisbon", "Tokyo", "Bangkok", "London", "Barcelona", "Peru",
+          "Iceland", "Istanbul", "Prague", "Vienna", "Seoul", "Hanoi", "Cairo", "Sydney", "Dubai", "Oslo"]
+THRESHOLDS = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+
+
+def scored_pairs():
+    """(similarity or None when the hard filters differ, label) per pair"""
+    scored = []
+    for a, b, same in PAIRS:
+        fa, fb = request_filters(a, "linear"), request_filters(b, "linear")
+        if fa is None or fb is None:
+            raise ValueError(f"uncacheable benchmark request: {a if fa is None else b}")
+        tolerance = SEMANTIC_BUDGET_TOLERANCE * max(fa["budget"] or 0, fb["budget"] or 0)
+        budgets_match = (fa["budget"] is None) == (fb["budget"] is None) and (
+            fa["budget"] is None or abs(fa["budget"] - fb["budget"]) <= tolerance)
+        keys = ("destination", "days", "month", "travelers", "currency", "avoid")
+        if not budgets_match or any(fa[key] != fb[key] for key in keys):
+            scored.append((None, same))
+        else:
+            scored.append((similarity(embed(a, fa["destination"]), embed(b, fb["destination"])), same))
+    return scored
+
+
+def threshold_report(scored):
+    rows = []
+    for threshold in THRESHOLDS:
+        predicted = [score is not None and score >= threshold for score, _ in scored]
+        tp = sum(p and same for p, (_, same) in zip(predicted, scored))
+        fp = sum(p and not same for p, (_, same) in zip(predicted, scored))
+        fn = sum(not p and same for p, (_, same) in zip(predicted, scored))
+        rows.append({"threshold": threshold,
+                     "precision": round(tp / (tp + fp), 3) if tp + fp else 1.0,
+                     "recall": round(tp / (tp + fn), 3) if tp + fn else 1.0,
+                     "false_positives": fp})
+    return rows
+
+
+def synthetic_request(rng):
+    days = rng.choice([3, 4, 5, 7, 10])
+    interests = " and ".join(rng.sample(INTERESTS, 2))
+    return f"{days} days in {rng.choice(PLACES)}, ${rng.choice([1000, 2000, 3000])}, {interests}"
+
+
+def latency_report(entries, lookups):
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SemanticCache(path=os.path.join(tmp, "semantic.sqlite3"), max_entries=entries)
+        start = time.perf_counter()
+        for _ in range(entries):
+            cache.store(synthetic_request(rng), "linear", {"planner_output": "x"})
+        store_s = time.perf_counter() - start
+        # The first lookup loads every entry into the process' index
+        start = time.perf_counter()
+        cache.lookup(synthetic_request(rng), "linear")
+        cold_ms = (time.perf_counter() - start) * 1000
+        samples = []
+        for _ in range(lookups):
+            start = time.perf_counter()
+            cache.lookup(synthetic_request(rng), "linear")
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        stats = cache.stats()
+    return {"entries": entries, "store_ms_mean": round(store_s / entries * 1000, 3),
+            "cold_lookup_ms": round(cold_ms, 2), "lookup_ms_p50": round(samples[len(samples) // 2], 3),
+            "lookup_ms_p95": round(samples[int(len(samples) * 0.95)], 3), "synthetic_hit_rate": stats["hit_rate"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    scored = scored_pairs()
+    report = {
+        "default_threshold": SEMANTIC_THRESHOLD,
+        "pairs": [{"a": a, "b": b, "same": same, "similarity": None if score is None else round(score, 3)}
+                  for (a, b, same), (score, _) in zip(PAIRS, scored)],
+        "thresholds": threshold_report(scored),
+        "latency": latency_report(args.entries, args.lookups),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Offline load test of plan_trip, analyze_image and image generation.
+
+Starts the local provider stand-ins (benchmarks/stub_servers.py), points
+every client at them and drives the selected scenarios at a fixed
+concurrency. Run from Agent_AI/:
+
+    python -m benchmarks.load_test --scenario all --requests 60 --concurrency 8 \\
+        --latency lognormal:300:0.4 --error-429 0.02 --output results.json
+
+The JSON report holds p50/p95/p99 latency, throughput and error counts per
+scenario, plus the request and injected-error counts seen by each stand-in,
+so two runs can be diffed to spot regressions. The response cache is
+disabled so every call reaches the stand-ins.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_servers import (
+    add_stub_arguments, configs_from_args, start_stub_servers, stop_stub_servers, stub_environment
+)
+
+SCENARIOS = ("plan_trip", "analyze_image", "generate_images")
+CITIES = ["Kyoto", "Lisbon", "Cape Town", "Cusco", "Hanoi", "Reykjavík", "Marrakech", "Queenstown"]
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(name, latencies, failures, wall_seconds, extra=None):
+    latencies = sorted(latencies)
+    summary = {
+        "scenario": name,
+        "requests": len(latencies) + sum(failures.values()),
+        "ok": len(latencies),
+        "failed": failures,
+        "throughput_rps": round(len(latencies) / wall_seconds, 3) if wall_seconds else None,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "max_s": latencies[-1] if latencies else None,
+    }
+    summary.update(extra or {})
+    return summary
+
+
+def drive(call, requests, concurrency):
+    """Run call(i) for every request index on a thread pool; call returns (ok, detail)"""
+    def timed(i):
+        start = time.perf_counter()
+        try:
+            ok, detail = call(i)
+        except Exception as e:
+            ok, detail = False, type(e).__name__
+        return ok, detail, round(time.perf_counter() - start, 4)
+
+    latencies, failures, details = [], {}, []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ok, detail, seconds in pool.map(timed, range(requests)):
+            if ok:
+                latencies.append(seconds)
+                if detail is not None:
+                    details.append(detail)
+            else:
+                failures[detail] = failures.get(detail, 0) + 1
+    return latencies, failures, details, time.perf_counter() - start
+
+
+def plan_trip_scenario(graph_mode, stream):
+    from workflows.trip_graph import plan_trip, stream_plan_trip
+
+    def call(i):
+        request = {"input": f"Plan a 3 day trip to {CITIES[i % len(CITIES)]} for two people (request {i})"}
+        if stream:
+            done = None
+            for event in stream_plan_trip(request, mode=graph_mode, use_cache=False):
+                if event["type"] == "done":
+                    done = event
+            result, detail = done["result"], done["timings"]["time_to_first_token"]
+        else:
+            result, detail = plan_trip(request, mode=graph_mode, use_cache=False), None
+        if result.get("errors") or not result.get("booking_output"):
+            return False, next(iter(result.get("errors") or {"incomplete": None}))
+        return True, detail
+
+    return call
+
+
+def analyze_image_scenario(image_path):
+    from utils.multimodal_input import analyze_image
+
+    def call(i):
+        result = analyze_image(image_path, use_cache=False)
+        return (False, "analysis_error") if result.startswith("Error") else (True, None)
+
+    return call
+
+
+def generate_images_scenario(count):
+    from utils.image_generation import generate_multiple_destination_images
+
+    def call(i):
+        images = generate_multiple_destination_images(f"{CITIES[i % len(CITIES)]} {i}", count=count)
+        return (True, None) if len(images) == count else (False, "missing_images")
+
+    return call
+
+
+def _write_test_image(directory):
+    from PIL import Image
+    path = os.path.join(directory, "photo.jpg")
+    Image.new("RGB", (3000, 2000), (40, 120, 200)).save(path, quality=90)
+    return path
+
+
+def run(args):
+    servers = start_stub_servers(configs_from_args(args))
+    # Provider modules read these at import time, so they are set before any import below
+    os.environ.update(stub_environment(servers))
+    os.environ["RESPONSE_CACHE"] = "off"
+    os.environ["IMAGE_MODEL_RPM"] = str(args.image_rpm)
+    os.environ["RATE_LIMIT_DB"] = os.path.join(tempfile.mkdtemp(), "rate_limits.sqlite3")
+    for name in ("GROQ", "GEMINI", "HUGGINGFACE"):
+        os.environ[f"{name}_RPM"] = str(args.provider_rpm)
+        os.environ[f"{name}_TPM"] = "0"
+    if args.strategy:
+        os.environ["FALLBACK_STRATEGY"] = args.strategy
+
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    report = {"config": {k: v for k, v in vars(args).items() if k != "output"}, "scenarios": []}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in scenarios:
+                if name == "plan_trip":
+                    call = plan_trip_scenario(args.graph_mode, args.stream)
+                elif name == "analyze_image":
+                    call = analyze_image_scenario(_write_test_image(tmp))
+                else:
+                    call = generate_images_scenario(args.images)
+                latencies, failures, details, wall = drive(call, args.requests, args.concurrency)
+                extra = {}
+                if details:
+                    ttft = sorted(details)
+                    extra = {"ttft_p50_s": percentile(ttft, 50), "ttft_p95_s": percentile(ttft, 95)}
+                report["scenarios"].append(summarize(name, latencies, failures, wall, extra))
+    finally:
+        report["stub_servers"] = {name: dict(server.stats) for name, server in servers.items()}
+        stop_stub_servers(servers)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--graph-mode", choices=("linear", "parallel"), default="linear")
+    parser.add_argument("--stream", action="store_true", help="drive stream_plan_trip and report time to first token")
+    parser.add_argument("--strategy", help="FALLBACK_STRATEGY for the agents (sequential, hedged, race)")
+    parser.add_argument("--images", type=int, default=3, help="images per generate_images request")
+    parser.add_argument("--image-rpm", type=float, default=100000,
+                        help="per-model image token bucket; the default effectively disables it")
+    parser.add_argument("--provider-rpm", type=float, default=0,
+                        help="shared per-provider request budget for the text agents (0 = unlimited)")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Local stand-ins for the Groq, Gemini and Hugging Face HTTP APIs.
+
+Each provider gets its own threaded HTTP server with a latency
+distribution, injected 429/503 responses and streaming support, so the
+app can be load-tested without spending real quotas. Run standalone from
+Agent_AI/ to keep them up for manual testing:
+
+    python -m benchmarks.stub_servers --latency lognormal:400:0.5 --error-429 0.05
+
+and export the printed variables before starting the app.
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# 1x1 PNG returned by the text-to-image stand-in
+TINY_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+STUB_TEXT = (
+    "Day 1: Arrive and explore the old town. Day 2: Museums and local food market. "
+    "Day 3: Day trip to the coast. Estimated total budget: USD 1,450 including stay, food and transport."
+)
+# Answer to requests made in JSON mode (Groq response_format, Gemini response_mime_type)
+STUB_ITINERARY = {
+    "destination": "Old Town", "travelers": 2, "currency": "USD",
+    "plan": [
+        {"day": 1, "title": "Arrival", "activities": [
+            {"time": "15:00", "name": "Old town walk", "location": "Old Town", "cost": 0},
+            {"time": "19:00", "name": "Dinner at the square", "location": "Main Square", "cost": 30}]},
+        {"day": 2, "title": "Museums", "activities": [
+            {"time": "10:00", "name": "City museum", "location": "Museum Quarter", "cost": 15},
+            {"time": "13:00", "name": "Food market", "location": "Central Market", "cost": 20}]},
+        {"day": 3, "title": "Coast", "activities": [
+            {"time": "09:00", "name": "Day trip to the coast", "location": "Coast", "cost": 45}]},
+    ],
+    "tips": ["Buy a three-day transit pass"],
+}
+
+
+def parse_latency(spec):
+    """Latency sampler in seconds from a spec like fixed:MS, uniform:LO_MS:HI_MS or lognormal:MEDIAN_MS:SIGMA"""
+    kind, _, rest = spec.partition(":")
+    values = [float(v) for v in rest.split(":") if v]
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        mu, sigma = math.log(values[0] / 1000), values[1]
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+@dataclass
+class StubConfig:
+    latency: str = "lognormal:300:0.4"
+    error_429: float = 0.0
+    error_503: float = 0.0
+    retry_after: float = 1.0
+    estimated_time: float = 2.0
+    token_delay_ms: float = 20.0
+    # Extra latency per 1000 request-body bytes, a stand-in for prompt processing time
+    prompt_ms_per_kb: float = 0.0
+    seed: int = 0
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, config):
+        super().__init__(address, handler)
+        self.config = config
+        self.sample_latency = parse_latency(config.latency)
+        self.rng = random.Random(config.seed)
+        self.rng_lock = threading.Lock()
+        self.stats = {"requests": 0, "429": 0, "503": 0}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _draw(self):
+        server = self.server
+        with server.rng_lock:
+            server.stats["requests"] += 1
+            latency = server.sample_latency(server.rng)
+            roll = server.rng.random()
+        if roll < server.config.error_429:
+            server.stats["429"] += 1
+            return latency, 429
+        if roll < server.config.error_429 + server.config.error_503:
+            server.stats["503"] += 1
+            return latency, 503
+        return latency, 200
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, events, framing="sse"):
+        """Write events one by one, pausing token_delay_ms between them"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if framing == "sse" else "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        delay = self.server.config.token_delay_ms / 1000
+        for i, event in enumerate(events):
+            if framing == "sse":
+                data = f"data: {event if isinstance(event, str) else json.dumps(event)}\n\n"
+            else:
+                # JSON array streamed element by element
+                data = ("[" if i == 0 else ",") + json.dumps(event)
+            self._chunk(data.encode())
+            time.sleep(delay)
+        if framing != "sse":
+            self._chunk(b"]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _read_body(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.body_size = len(raw)
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(raw or b"{}")
+        return raw
+
+    def _fail(self, status):
+        config = self.server.config
+        if status == 429:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                       headers={"Retry-After": str(config.retry_after)})
+        else:
+            self._send(503, {"error": "Model is currently loading", "estimated_time": config.estimated_time})
+
+    def do_POST(self):
+        body = self._read_body()
+        latency, status = self._draw()
+        time.sleep(latency + self.body_size / 1000 * self.server.config.prompt_ms_per_kb / 1000)
+        if status != 200:
+            self._fail(status)
+            return
+        self.handle_request(urlparse(self.path), body)
+
+    def handle_request(self, url, body):
+        self._send(404, {"error": "not found"})
+
+
+def _words(text=STUB_TEXT):
+    return [word + " " for word in text.split(" ")]
+
+
+class GroqHandler(_StubHandler):
+    """POST /openai/v1/chat/completions"""
+
+    def handle_request(self, url, body):
+        if not url.path.endswith("/chat/completions"):
+            return self._send(404, {"error": "not found"})
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": body.get("model")}
+        if body.get("stream"):
+            events = [
+                {**base, "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                for word in _words()
+            ]
+            events.append({**base, "object": "chat.completion.chunk",
+                           "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            return self._send_stream(events + ["[DONE]"])
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        content = json.dumps(STUB_ITINERARY) if json_mode else STUB_TEXT
+        self._send(200, {
+            **base, "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 40, "total_tokens": 90},
+        })
+
+
+class GeminiHandler(_StubHandler):
+    """POST /v1beta/models/<model>:generateContent and :streamGenerateContent (REST transport)"""
+
+    def _candidate(self, text, url):
+        finish = 1 if "enum-encoding=int" in url.query else "STOP"
+        return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                "finishReason": finish, "index": 0}]}
+
+    def handle_request(self, url, body):
+        if url.path.endswith(":streamGenerateContent"):
+            events = [self._candidate(word, url) for word in _words()]
+            return self._send_stream(events, framing="sse" if "alt=sse" in url.query else "json")
+        if url.path.endswith(":generateContent"):
+            config = body.get("generationConfig") or body.get("generation_config") or {}
+            mime_type = config.get("responseMimeType") or config.get("response_mime_type")
+            text = json.dumps(STUB_ITINERARY) if mime_type == "application/json" else STUB_TEXT
+            return self._send(200, self._candidate(text, url))
+        self._send(404, {"error": "not found"})
+
+
+class HuggingFaceHandler(_StubHandler):
+    """POST /models/<model> for text generation, image captioning and text-to-image"""
+
+    def handle_request(self, url, body):
+        if not url.path.startswith("/models/"):
+            return self._send(404, {"error": "not found"})
+        if isinstance(body, bytes):
+            # Raw image upload: captioning
+            return self._send(200, [{"generated_text": "a scenic view of a historic city centre"}])
+        parameters = body.get("parameters", {})
+        if "num_inference_steps" in parameters or "guidance_scale" in parameters:
+            return self._send(200, TINY_PNG, content_type="image/png")
+        if body.get("stream"):
+            events = [{"token": {"text": word, "special": False}} for word in _words()]
+            return self._send_stream(events)
+        self._send(200, [{"generated_text": STUB_TEXT}])
+
+
+HANDLERS = {"groq": GroqHandler, "gemini": GeminiHandler, "huggingface": HuggingFaceHandler}
+
+
+def start_stub_servers(configs=None, host="127.0.0.1"):
+    """Start one stand-in per provider on free ports; returns {provider: server}"""
+    configs = configs or {}
+    servers = {}
+    for name, handler in HANDLERS.items():
+        server = _StubServer((host, 0), handler, configs.get(name, StubConfig()))
+        threading.Thread(target=server.serve_forever, name=f"stub-{name}", daemon=True).start()
+        servers[name] = server
+    return servers
+
+
+def stub_environment(servers):
+    """Environment variables that point the provider clients at the stand-ins"""
+    def base(name):
+        host, port = servers[name].server_address[:2]
+        return f"http://{host}:{port}"
+
+    return {
+        "GROQ_API_KEY": "stub",
+        "GEMINI_API_KEY": "stub",
+        "HUGGINGFACE_API_KEY": "stub",
+        "GROQ_BASE_URL": base("groq"),
+        "GEMINI_API_ENDPOINT": base("gemini"),
+        "HF_INFERENCE_URL": f"{base('huggingface')}/models",
+    }
+
+
+def stop_stub_servers(servers):
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+
+def add_stub_arguments(parser):
+    parser.add_argument("--latency", default=StubConfig.latency,
+                        help="fixed:MS, uniform:LO:HI or lognormal:MEDIAN_MS:SIGMA (all providers)")
+    parser.add_argument("--groq-latency", help="override --latency for Groq")
+    parser.add_argument("--gemini-latency", help="override --latency for Gemini")
+    parser.add_argument("--hf-latency", help="override --latency for Hugging Face")
+    parser.add_argument("--error-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--error-503", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--token-delay-ms", type=float, default=StubConfig.token_delay_ms)
+    parser.add_argument("--prompt-ms-per-kb", type=float, default=StubConfig.prompt_ms_per_kb,
+                        help="extra latency per KB of request body (prompt processing)")
+
+
+def configs_from_args(args):
+    overrides = {"groq": args.groq_latency, "gemini": args.gemini_latency, "huggingface": args.hf_latency}
+    return {
+        name: StubConfig(
+            latency=overrides[name] or args.latency,
+            error_429=args.error_429,
+            error_503=args.error_503,
+            token_delay_ms=args.token_delay_ms,
+            prompt_ms_per_kb=args.prompt_ms_per_kb,
+            seed=i,
+        )
+        for i, name in enumerate(HANDLERS)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    servers = start_stub_servers(configs_from_args(args))
+    for name, value in stub_environment(servers).items():
+        print(f"export {name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop_stub_servers(servers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import pytest
+
+from utils.trip_request import parse_days, parse_travelers
+
+
+@pytest.mark.parametrize("text, days", [
+    ("7 days in Kyoto", 7),
+    ("a 10-day trip to Bali", 10),
+    ("one week in Iceland", 7),
+    ("a week in Rome", 7),
+    ("6 nights in Lisbon", 7),
+    ("weekend in Barcelona", 2),
+])
+def test_parse_days(text, days):
+    assert parse_days(text) == days
+
+
+@pytest.mark.parametrize("text", [
+    "I want extra days in Rome",
+    "often days are too short",
+    "someone nights out in Berlin",
+])
+def test_parse_days_ignores_number_words_inside_words(text):
+    assert parse_days(text) is None
+
+
+@pytest.mark.parametrize("text, travelers", [
+    ("Paris for 2 people", 2),
+    ("family of four in London", 4),
+    ("honeymoon in Bali", 2),
+    ("Rome with someone special", None),
+    ("party of tenants", None),
+])
+def test_parse_travelers(text, travelers):
+    assert parse_travelers(text) == travelers
@@ -0,0 +1,129 @@
+import os
+import threading
+import numpy as np
+from utils.cache import CACHE_ENABLED, file_digest, get_cache, make_key
+from utils.transcription import WHISPER_MODEL, TranscriptionWorker
+
+SAMPLE_RATE = 16000
+
+# Long-audio mode settings
+LONG_AUDIO_SECONDS = float(os.getenv("LONG_AUDIO_SECONDS", "120"))
+LONG_AUDIO_PROCESSES = int(os.getenv("LONG_AUDIO_PROCESSES", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+# Whisper decodes 30 s windows, so chunks aim just below that
+CHUNK_TARGET_SECONDS = 25.0
+CHUNK_MAX_SECONDS = 30.0
+MIN_SILENCE_MS = 300
+FRAME_MS = 30
+
+
+def load_audio(path):
+    """Decode any ffmpeg-readable file to 16 kHz mono float32"""
+    import whisper
+    return whisper.load_audio(path, sr=SAMPLE_RATE)
+
+
+def audio_duration(path):
+    """Duration in seconds, from the header when soundfile can read it"""
+    try:
+        import soundfile
+        return soundfile.info(path).duration
+    except Exception:
+        return len(load_audio(path)) / SAMPLE_RATE
+
+
+def frame_energy_db(audio, frame_ms=FRAME_MS, sample_rate=SAMPLE_RATE):
+    """RMS energy per frame in dBFS"""
+    frame = int(sample_rate * frame_ms / 1000)
+    usable = len(audio) - len(audio) % frame
+    if usable == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:usable].reshape(-1, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def find_silences(audio, frame_ms=FRAME_MS, min_silence_ms=MIN_SILENCE_MS, threshold_db=None,
+                  sample_rate=SAMPLE_RATE):
+    """(start, end) sample ranges of silence, using an energy threshold relative to the loud frames"""
+    energy = frame_energy_db(audio, frame_ms, sample_rate)
+    if energy.size == 0:
+        return []
+    if threshold_db is None:
+        # Just above the noise floor, but always well below the loud (speech) frames
+        loud, floor = np.percentile(energy, 95), np.percentile(energy, 5)
+        threshold_db = max(loud - 40.0, min(loud - 15.0, floor + 6.0))
+    silent = np.concatenate(([False], energy < threshold_db, [False]))
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = (ends - starts) * frame_ms >= min_silence_ms
+    frame = int(sample_rate * frame_ms / 1000)
+    return [(int(s) * frame, int(e) * frame) for s, e in zip(starts[keep], ends[keep])]
+
+
+def split_on_silence(audio, target_seconds=CHUNK_TARGET_SECONDS, max_seconds=CHUNK_MAX_SECONDS,
+                     sample_rate=SAMPLE_RATE):
+    """Chunk boundaries (start, end) cut in the middle of silences, never longer than max_seconds"""
+    total = len(audio)
+    max_len = int(max_seconds * sample_rate)
+    if total <= max_len:
+        return [(0, total)]
+    target = int(target_seconds * sample_rate)
+    cut_points = np.array([(s + e) // 2 for s, e in find_silences(audio, sample_rate=sample_rate)], dtype=np.int64)
+
+    chunks = []
+    start = 0
+    while total - start > max_len:
+        window = cut_points[(cut_points > start + target // 2) & (cut_points <= start + max_len)]
+        if window.size:
+            # Silence closest to the target length
+            end = int(window[np.argmin(np.abs(window - (start + target)))])
+        else:
+            end = start + max_len
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, total))
+    return chunks
+
+
+_long_worker = None
+_long_worker_lock = threading.Lock()
+
+
+def get_long_audio_worker():
+    """Multi-process worker for chunked transcription (one resident model per process)"""
+    global _long_worker
+    if _long_worker is None:
+        with _long_worker_lock:
+            if _long_worker is None:
+                _long_worker = TranscriptionWorker(
+                    processes=LONG_AUDIO_PROCESSES,
+                    max_pending=1024,
+                    threads=max(1, (os.cpu_count() or 1) // LONG_AUDIO_PROCESSES),
+                )
+    return _long_worker
+
+
+def transcribe_long_audio(path, worker=None):
+    """Split at silences, transcribe the chunks in parallel and join the text in order"""
+    key = make_key(file_digest(path), WHISPER_MODEL, "chunked")
+    if CACHE_ENABLED:
+        cached = get_cache().get("transcription", key)
+        if cached is not None:
+            return cached
+
+    worker = worker or get_long_audio_worker()
+    audio = load_audio(path)
+    futures = []
+    try:
+        for start, end in split_on_silence(audio):
+            futures.append(worker.submit_array(audio[start:end]))
+        text = " ".join(part for part in (f.result().strip() for f in futures) if part)
+    except BaseException:
+        # A full queue or a failed chunk ends the job; chunks still waiting give their slots back
+        for future in futures:
+            future.cancel()
+        raise
+
+    if CACHE_ENABLED:
+        get_cache().set("transcription", key, text)
+    return text
@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Local cache directory shared by every Streamlit worker on the host
+CACHE_DIR = os.getenv(
+    "TRAVEL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+)
+CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "on").lower() not in ("0", "off", "false")
+CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def normalize_prompt(text):
+    """Collapse whitespace so cosmetic differences share one cache entry"""
+    return " ".join((text or "").split())
+
+
+def make_key(*parts):
+    """Stable hash of JSON-serialisable key parts"""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def file_digest(path):
+    """sha256 of a file's contents, for content-addressed keys"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed LRU/TTL cache, safe to share between processes on one host"""
+
+    def __init__(self, path=None, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.path = path or os.path.join(CACHE_DIR, "responses.sqlite3")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connect(self):
+        # sqlite3 connections must not cross threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, conn, namespace, column):
+        conn.execute(
+            f"INSERT INTO stats (namespace, {column}) VALUES (?, 1) "
+            f"ON CONFLICT(namespace) DO UPDATE SET {column} = {column} + 1",
+            (namespace,)
+        )
+
+    def get(self, namespace, key):
+        """Cached value or None; expired entries count as misses"""
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, created_at FROM entries WHERE namespace = ? AND key = ?",
+            (namespace, key)
+        ).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            self._count(conn, namespace, "misses")
+            return None
+        conn.execute(
+            "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+            (now, namespace, key)
+        )
+        self._count(conn, namespace, "hits")
+        return json.loads(row[0])
+
+    def set(self, namespace, key, value):
+        conn = self._connect()
+        encoded = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, encoded, len(encoded), now, now)
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for namespace, key, size in conn.execute(
+            "SELECT namespace, key, size FROM entries ORDER BY accessed_at ASC"
+        ):
+            victims.append((namespace, key))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+
+    def delete(self, namespace, key):
+        self._connect().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace=None):
+        conn = self._connect()
+        if namespace is None:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM stats")
+        else:
+            conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            conn.execute("DELETE FROM stats WHERE namespace = ?", (namespace,))
+
+    def stats(self):
+        """Hit/miss counters and stored entries per namespace"""
+        conn = self._connect()
+        result = {}
+        for namespace, hits, misses in conn.execute("SELECT namespace, hits, misses FROM stats"):
+            total = hits + misses
+            result[namespace] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+            }
+        for namespace, entries, size in conn.execute(
+            "SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace"
+        ):
+            result.setdefault(namespace, {"hits": 0, "misses": 0, "hit_rate": 0.0})
+            result[namespace].update({"entries": entries, "bytes": size})
+        return result
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide ResponseCache instance"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = ResponseCache()
+    return _default_cache
+
+
+def _is_cacheable(value):
+    return value is not None
+
+
+def cached_call(namespace, key, fn, use_cache=True):
+    """Return the cached value for key or compute it with fn(); errors are never stored"""
+    if not (use_cache and CACHE_ENABLED):
+        return fn()
+    cache = get_cache()
+    value = cache.get(namespace, key)
+    if value is not None:
+        return value
+    value = fn()
+    if _is_cacheable(value):
+        cache.set(namespace, key, value)
+    return value
+
+
+async def acached_call(namespace, key, fn, use_cache=True):
+    """Async cached_call; fn returns an awaitable"""
+    if not (use_cache and CACHE_ENABLED):
+        return await fn()
+    cache = get_cache()
+    # SQLite reads and writes block, so they run off the event loop
+    value = await asyncio.to_thread(cache.get, namespace, key)
+    if value is not None:
+        return value
+    value = await fn()
+    if _is_cacheable(value):
+        await asyncio.to_thread(cache.set, namespace, key, value)
+    return value
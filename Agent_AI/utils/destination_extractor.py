@@ -0,0 +1,103 @@
+import os
+import re
+import threading
+from functools import lru_cache
+from utils.destinations import destination_records
+from utils.gazetteer import DATA_DIR, Gazetteer
+
+PLACES_PATH = os.getenv("PLACES_PATH", os.path.join(DATA_DIR, "places.jsonl"))
+
+# Place names that are also everyday words only count when written capitalised
+AMBIGUOUS_NAMES = {
+    "nice", "bath", "ella", "victoria", "darwin", "reading", "split", "male", "sur", "sal",
+    "bled", "pai", "flores", "granada", "nadi", "us", "america", "georgia", "jordan", "chad",
+    "turkey", "china", "mobile", "orange", "hue", "leh"
+}
+
+# Words right before a place that say it is where the traveller wants to go
+_STRONG_CUES = {"to", "visit", "visiting", "explore", "exploring", "see", "seeing", "tour", "touring"}
+_WEAK_CUES = {"in", "around", "across", "at", "of"}
+_ORIGIN_CUES = {"from", "leaving", "departing", "live", "living", "based", "home"}
+_PREVIOUS_WORD = re.compile(r"([A-Za-z]+)[^A-Za-z]*$")
+
+
+def _cue_score(text, start):
+    found = _PREVIOUS_WORD.search(text, max(0, start - 24), start)
+    word = found.group(1).lower() if found else ""
+    if word in _STRONG_CUES:
+        return 2
+    if word in _WEAK_CUES:
+        return 1
+    if word in _ORIGIN_CUES:
+        return -1
+    return 0
+
+
+class DestinationExtractor:
+    """Finds destination names in free text with the gazetteer index over Smart Form and offline places"""
+
+    def __init__(self, path=PLACES_PATH, extra_records=None):
+        self.gazetteer = Gazetteer(path, destination_records() if extra_records is None else extra_records)
+
+    def find(self, text):
+        """Accepted place mentions in text order, as (match, record) pairs"""
+        found = []
+        for match in self.gazetteer.find_all(text):
+            surface = text[match.start:match.end]
+            if surface.lower() in AMBIGUOUS_NAMES and not surface[0].isupper():
+                continue
+            found.append((match, self.gazetteer.record(match)))
+        # Keep only the longest of overlapping mentions ("New York City" over "York")
+        found.sort(key=lambda item: (item[0].start, -(item[0].end - item[0].start)))
+        kept = []
+        for match, record in found:
+            if kept and match.start < kept[-1][0].end:
+                last = kept[-1][0]
+                # Same name for several places (Lagos, Nigeria / Lagos, Portugal) stays for extract to decide
+                if (match.start, match.end) != (last.start, last.end):
+                    continue
+            kept.append((match, record))
+        return kept
+
+    def extract(self, text):
+        """Best destination record in text, or None.
+
+        Prefers places introduced as destinations ("trip to X"), then the
+        most specific kind (city over country), a city whose country is also
+        mentioned, and finally the longest and earliest name.
+        """
+        found = self.find(text)
+        if not found:
+            return None
+        countries = {record["name"] for _, record in found if record.get("kind") == "country"}
+
+        def score(item):
+            match, record = item
+            in_named_country = record.get("country") in countries
+            return (_cue_score(text, match.start), match.rank, in_named_country,
+                    match.end - match.start, -match.start)
+
+        return max(found, key=score)[1]
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_destination_extractor():
+    """Process-wide DestinationExtractor"""
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = DestinationExtractor()
+    return _extractor
+
+
+@lru_cache(maxsize=512)
+def extract_destination(text):
+    """Canonical name of the destination mentioned in text, or None"""
+    if not text or not text.strip():
+        return None
+    record = get_destination_extractor().extract(text)
+    return record["name"] if record else None
@@ -0,0 +1,37 @@
+# Popular destinations by country/region
+DESTINATIONS = {
+    "🇺🇸 United States": ["New York City", "Los Angeles", "Las Vegas", "Miami", "San Francisco", "Chicago", "Boston", "Washington DC"],
+    "🇬🇧 United Kingdom": ["London", "Edinburgh", "Manchester", "Bath", "Oxford", "Cambridge", "Liverpool", "Brighton"],
+    "🇫🇷 France": ["Paris", "Nice", "Lyon", "Marseille", "Bordeaux", "Strasbourg", "Toulouse", "Cannes"],
+    "🇮🇹 Italy": ["Rome", "Florence", "Venice", "Milan", "Naples", "Bologna", "Turin", "Palermo"],
+    "🇪🇸 Spain": ["Madrid", "Barcelona", "Seville", "Valencia", "Bilbao", "Granada", "Toledo", "San Sebastian"],
+    "🇩🇪 Germany": ["Berlin", "Munich", "Hamburg", "Cologne", "Frankfurt", "Dresden", "Heidelberg", "Rothenburg"],
+    "🇯🇵 Japan": ["Tokyo", "Kyoto", "Osaka", "Hiroshima", "Nara", "Hakone", "Takayama", "Nikko"],
+    "🇹🇭 Thailand": ["Bangkok", "Chiang Mai", "Phuket", "Krabi", "Koh Samui", "Pattaya", "Ayutthaya", "Sukhothai"],
+    "🇸🇬 Singapore": ["Marina Bay", "Chinatown", "Little India", "Orchard Road", "Sentosa Island"],
+    "🇦🇺 Australia": ["Sydney", "Melbourne", "Brisbane", "Perth", "Adelaide", "Gold Coast", "Cairns", "Darwin"],
+    "🇨🇦 Canada": ["Toronto", "Vancouver", "Montreal", "Quebec City", "Calgary", "Ottawa", "Banff", "Victoria"],
+    "🇧🇷 Brazil": ["Rio de Janeiro", "São Paulo", "Salvador", "Brasília", "Recife", "Fortaleza", "Manaus", "Florianópolis"],
+    "🇲🇽 Mexico": ["Mexico City", "Cancun", "Playa del Carmen", "Puerto Vallarta", "Guadalajara", "Oaxaca", "Merida", "Tulum"],
+    "🇱🇰 Sri Lanka": ["Colombo", "Kandy", "Galle", "Sigiriya", "Nuwara Eliya", "Anuradhapura", "Polonnaruwa", "Ella"],
+    "🇮🇳 India": ["Delhi", "Mumbai", "Goa", "Jaipur", "Kerala", "Agra", "Varanasi", "Rishikesh"],
+    "🇨🇳 China": ["Beijing", "Shanghai", "Xi'an", "Guilin", "Chengdu", "Hangzhou", "Suzhou", "Zhangjiajie"],
+    "🇰🇷 South Korea": ["Seoul", "Busan", "Jeju Island", "Gyeongju", "Incheon", "Daegu", "Andong", "Jeonju"],
+    "🇪🇬 Egypt": ["Cairo", "Luxor", "Aswan", "Alexandria", "Hurghada", "Sharm El Sheikh", "Dahab", "Siwa Oasis"],
+    "🇿🇦 South Africa": ["Cape Town", "Johannesburg", "Durban", "Port Elizabeth", "Stellenbosch", "Hermanus", "Knysna", "Plettenberg Bay"]
+}
+
+
+def country_name(label):
+    """Country label without its flag emoji ("🇯🇵 Japan" becomes "Japan")"""
+    return "".join(ch for ch in label if not 0x1F1E6 <= ord(ch) <= 0x1F1FF and ch != "🏴").strip()
+
+
+def destination_records():
+    """Gazetteer records for every country and destination offered in the Smart Form"""
+    records = []
+    for label, cities in DESTINATIONS.items():
+        country = country_name(label)
+        records.append({"name": country, "kind": "country"})
+        records.extend({"name": city, "kind": "city", "country": country} for city in cities)
+    return records
@@ -0,0 +1,121 @@
+"""Typed provider errors shared by the agents, health tracker and retry logic."""
+
+
+class ProviderError(Exception):
+    """A provider call failed; kind is one of ERROR_KINDS"""
+
+    kind = "unknown"
+
+    def __init__(self, message, provider=None, model=None, status=None, retry_after=None):
+        super().__init__(message)
+        self.provider = provider
+        self.model = model
+        self.status = status
+        self.retry_after = retry_after
+
+    def __str__(self):
+        prefix = f"{self.provider}: " if self.provider else ""
+        return f"{prefix}{super().__str__()}"
+
+
+class RateLimitError(ProviderError):
+    kind = "rate_limit"
+
+
+class AuthenticationError(ProviderError):
+    kind = "auth"
+
+
+class ProviderTimeoutError(ProviderError):
+    kind = "timeout"
+
+
+class ServerError(ProviderError):
+    kind = "server"
+
+
+class ClientError(ProviderError):
+    kind = "client"
+
+
+class CircuitOpenError(ProviderError):
+    kind = "circuit_open"
+
+
+class AllProvidersFailedError(ProviderError):
+    """Every configured provider failed or was skipped"""
+
+    kind = "exhausted"
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class NoProvidersConfiguredError(AllProvidersFailedError):
+    kind = "not_configured"
+
+
+ERROR_KINDS = ("rate_limit", "auth", "timeout", "server", "client", "circuit_open", "unknown")
+
+
+def error_for_status(status, message, provider=None, model=None, retry_after=None):
+    """ProviderError subclass matching an HTTP status code"""
+    if status == 429:
+        cls = RateLimitError
+    elif status in (401, 403):
+        cls = AuthenticationError
+    elif status in (408, 504):
+        cls = ProviderTimeoutError
+    elif status is not None and status >= 500:
+        cls = ServerError
+    elif status is not None and status >= 400:
+        cls = ClientError
+    else:
+        cls = ProviderError
+    return cls(message, provider=provider, model=model, status=status, retry_after=retry_after)
+
+
+def _status_of(exc):
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def _retry_after_of(exc):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_exception(exc, provider=None, model=None):
+    """Map any SDK/HTTP exception to a typed ProviderError"""
+    if isinstance(exc, ProviderError):
+        if exc.provider is None:
+            exc.provider, exc.model = provider, model
+        return exc
+
+    message = str(exc) or exc.__class__.__name__
+    status = _status_of(exc)
+    retry_after = _retry_after_of(exc)
+    if status is not None:
+        return error_for_status(status, message, provider, model, retry_after)
+
+    name = exc.__class__.__name__.lower()
+    lowered = message.lower()
+    if "timeout" in name or "timed out" in lowered or "deadline" in name:
+        return ProviderTimeoutError(message, provider=provider, model=model)
+    if "ratelimit" in name or "resourceexhausted" in name or "quota" in lowered or "rate limit" in lowered:
+        return RateLimitError(message, provider=provider, model=model, retry_after=retry_after)
+    if "permission" in name or "unauthenticated" in name or "api key" in lowered:
+        return AuthenticationError(message, provider=provider, model=model)
+    if "unavailable" in name or "internalservererror" in name or "connection" in name:
+        return ServerError(message, provider=provider, model=model)
+    return ProviderError(message, provider=provider, model=model)
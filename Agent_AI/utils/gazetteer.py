@@ -0,0 +1,180 @@
+import json
+import mmap
+import os
+import threading
+import unicodedata
+from collections import deque, namedtuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+LOCATION_STYLES_PATH = os.getenv("LOCATION_STYLES_PATH", os.path.join(DATA_DIR, "location_styles.jsonl"))
+
+# More specific places win over the regions that contain them
+KIND_RANK = {"landmark": 4, "city": 3, "region": 2, "country": 1}
+
+Match = namedtuple("Match", "start end name kind rank offset")
+
+
+_ASCII_SPACE = str.maketrans("\t\n\r\x0b\x0c", "     ")
+
+
+def _fold_char(ch):
+    if ch.isspace():
+        return " "
+    # Drop accents so "São Paulo" and "Sao Paulo" match the same entry
+    base = "".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c)).lower()
+    return base if len(base) == 1 else ch.lower() if len(ch.lower()) == 1 else ch
+
+
+def normalize_place(text):
+    """Lower-case, strip accents and blank out whitespace, one output character per input character"""
+    text = text or ""
+    if text.isascii():
+        return text.lower().translate(_ASCII_SPACE)
+    return "".join(_fold_char(ch) for ch in text)
+
+
+def _is_boundary(text, index):
+    return index < 0 or index >= len(text) or not text[index].isalnum()
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every pattern occurrence"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+    def add(self, pattern, value):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), value))
+
+    def build(self):
+        """Compute failure links breadth-first; call once after all patterns are added"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                if self._out[self._fail[nxt]]:
+                    self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter(self, text):
+        """Yield (start, end, value) for every occurrence"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in out[node]:
+                yield i - length + 1, i + 1, value
+
+    def __len__(self):
+        return len(self._goto)
+
+
+class Gazetteer:
+    """Place names from a JSONL data file, matched with a compiled Aho-Corasick index.
+
+    The file is memory-mapped; the index keeps only byte offsets and each
+    record is parsed when it is actually returned. extra_records are
+    in-memory records indexed alongside the file.
+    """
+
+    def __init__(self, path=LOCATION_STYLES_PATH, extra_records=()):
+        self.path = path
+        self.extra_records = list(extra_records)
+        self._lock = threading.Lock()
+        self._index = None
+        self._mmap = None
+        self._records = {}
+
+    def _add_record(self, index, record, offset):
+        kind = record.get("kind", "city")
+        for name in [record["name"], *record.get("aliases", [])]:
+            pattern = normalize_place(name).strip()
+            if pattern:
+                index.add(pattern, (record["name"], kind, KIND_RANK.get(kind, 0), offset))
+
+    def _load(self):
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            index = AhoCorasick()
+            with open(self.path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            offset = 0
+            size = len(data)
+            while offset < size:
+                end = data.find(b"\n", offset)
+                end = size if end == -1 else end
+                line = data[offset:end].strip()
+                if line:
+                    self._add_record(index, json.loads(line), offset)
+                offset = end + 1
+            for i, record in enumerate(self.extra_records):
+                # Negative offsets point at in-memory records
+                self._records[-1 - i] = record
+                self._add_record(index, record, -1 - i)
+            index.build()
+            self._mmap = data
+            self._index = index
+            return index
+
+    def find_all(self, text):
+        """Every whole-word place name in text, as Match tuples with positions in text"""
+        normalized = normalize_place(text)
+        matches = []
+        for start, end, (name, kind, rank, offset) in self._load().iter(normalized):
+            if _is_boundary(normalized, start - 1) and _is_boundary(normalized, end):
+                matches.append(Match(start, end, name, kind, rank, offset))
+        return matches
+
+    def best_match(self, text):
+        """Most specific match: highest kind rank, then the longest name, then the earliest"""
+        matches = self.find_all(text)
+        if not matches:
+            return None
+        return max(matches, key=lambda m: (m.rank, m.end - m.start, -m.start))
+
+    def record(self, match):
+        """Full data record for a match, parsed from the mapped file on first use"""
+        record = self._records.get(match.offset)
+        if record is None:
+            end = self._mmap.find(b"\n", match.offset)
+            record = json.loads(self._mmap[match.offset:end if end != -1 else len(self._mmap)])
+            self._records[match.offset] = record
+        return record
+
+    def lookup(self, text):
+        """Record of the most specific place mentioned in text, or None"""
+        match = self.best_match(text)
+        return self.record(match) if match else None
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Process-wide Gazetteer over the bundled location styles"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
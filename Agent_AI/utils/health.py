@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from collections import deque
+from utils.errors import CircuitOpenError
+
+# Consecutive failures that open a circuit, and how long it stays open per error kind (seconds)
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+OPEN_SECONDS = {
+    "auth": 900.0,
+    "rate_limit": 60.0,
+    "timeout": 30.0,
+    "server": 30.0,
+    "default": 30.0,
+}
+# Errors that say the provider is unusable right now, so one is enough to open the circuit
+IMMEDIATE_OPEN = ("auth", "rate_limit")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open single probe -> closed"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD):
+        self.failure_threshold = failure_threshold
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+        self.probe_in_flight = False
+
+    def allow(self, now):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now >= self.opened_until:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def on_success(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def on_failure(self, error, now):
+        kind = getattr(error, "kind", "default")
+        if kind == "client":
+            # A bad request says nothing about the provider's health
+            self.probe_in_flight = False
+            return
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or kind in IMMEDIATE_OPEN or self.consecutive_failures >= self.failure_threshold:
+            open_for = OPEN_SECONDS.get(kind, OPEN_SECONDS["default"])
+            retry_after = getattr(error, "retry_after", None)
+            if retry_after:
+                open_for = max(open_for, retry_after)
+            self.state = OPEN
+            self.opened_until = now + open_for
+        self.probe_in_flight = False
+
+
+class ProviderHealth:
+    """Success, latency and error-class tracking per provider/model, with circuit breakers"""
+
+    def __init__(self, window=100):
+        self._lock = threading.Lock()
+        self._window = window
+        self._breakers = {}
+        self._stats = {}
+
+    def _entry(self, provider, model):
+        key = (provider, model)
+        if key not in self._stats:
+            self._breakers[key] = CircuitBreaker()
+            self._stats[key] = {
+                "successes": 0,
+                "failures": 0,
+                "errors": {},
+                "latencies": deque(maxlen=self._window),
+                "last_error": None,
+            }
+        return self._breakers[key], self._stats[key]
+
+    def check(self, provider, model):
+        """Raise CircuitOpenError if the provider should be skipped right now"""
+        with self._lock:
+            breaker, _ = self._entry(provider, model)
+            if breaker.allow(time.monotonic()):
+                return
+            retry_in = max(0.0, breaker.opened_until - time.monotonic())
+        raise CircuitOpenError(
+            f"circuit open, skipping for {retry_in:.0f}s", provider=provider, model=model, retry_after=retry_in
+        )
+
+    def record_success(self, provider, model, latency):
+        with self._lock:
+            breaker, stats = self._entry(provider, model)
+            breaker.on_success()
+            stats["successes"] += 1
+            stats["latencies"].append(latency)
+
+    def record_failure(self, provider, model, error):
+        with self._lock:
+            breaker, stats = self._entry(provider, model)
+            breaker.on_failure(error, time.monotonic())
+            stats["failures"] += 1
+            kind = getattr(error, "kind", "unknown")
+            stats["errors"][kind] = stats["errors"].get(kind, 0) + 1
+            stats["last_error"] = str(error)
+
+    def release(self, provider, model):
+        """Give back a half-open probe slot when the call was cancelled before finishing"""
+        with self._lock:
+            breaker, _ = self._entry(provider, model)
+            breaker.probe_in_flight = False
+
+    def latency_percentile(self, provider, pct):
+        """Latency percentile over all models of a provider, None without history"""
+        with self._lock:
+            samples = sorted(
+                latency
+                for (name, _), stats in self._stats.items() if name == provider
+                for latency in stats["latencies"]
+            )
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self):
+        """JSON-friendly view of every tracked provider/model"""
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for (provider, model), stats in self._stats.items():
+                breaker = self._breakers[(provider, model)]
+                latencies = sorted(stats["latencies"])
+                result[f"{provider}/{model}"] = {
+                    "state": breaker.state,
+                    "open_for_seconds": round(max(0.0, breaker.opened_until - now), 1) if breaker.state == OPEN else 0,
+                    "successes": stats["successes"],
+                    "failures": stats["failures"],
+                    "errors": dict(stats["errors"]),
+                    "p50_latency": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                    "last_error": stats["last_error"],
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+            self._stats.clear()
+
+
+health = ProviderHealth()
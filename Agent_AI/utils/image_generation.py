@@ -1,107 +1,42 @@
 import os
-import requests
+import threading
 import time
-from dotenv import load_dotenv
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from urllib.parse import quote
 import random
-import base64
+import hashlib
 import streamlit as st
+from utils.cache import CACHE_ENABLED, get_cache, make_key
+from utils.errors import classify_exception
+from utils.gazetteer import get_gazetteer
+from utils.image_store import get_image_store, image_key
+from utils.metrics import IMAGE_GENERATION, IMAGE_GENERATION_LATENCY
+from utils.providers import get_http_session, hf_error, hf_headers, hf_model_url
+from utils.rate_limit import get_rate_limit
+from utils.retry import MEDIA_RETRY_POLICY, Deadline
 
-# Location-specific image prompts and styles
-LOCATION_STYLES = {
-    # Asian destinations
-    "tokyo": {
-        "styles": ["cherry blossoms, modern skyline", "neon lights, bustling streets", "traditional temples", "mount fuji view"],
-        "time_of_day": ["golden hour", "blue hour", "night photography"],
-        "specific_features": ["Shibuya crossing", "traditional architecture", "zen gardens", "bullet trains"]
-    },
-    "kyoto": {
-        "styles": ["traditional temples", "bamboo forests", "geisha districts", "zen gardens"],
-        "time_of_day": ["golden hour", "morning mist", "sunset"],
-        "specific_features": ["torii gates", "pagodas", "traditional wooden houses", "stone lanterns"]
-    },
-    "bangkok": {
-        "styles": ["golden temples", "floating markets", "tuk-tuks", "street food scenes"],
-        "time_of_day": ["golden hour", "tropical sunset", "vibrant day"],
-        "specific_features": ["wat temples", "long-tail boats", "street markets", "thai architecture"]
-    },
-    
-    # European destinations
-    "paris": {
-        "styles": ["eiffel tower", "cobblestone streets", "cafe culture", "seine river"],
-        "time_of_day": ["golden hour", "blue hour", "romantic evening"],
-        "specific_features": ["haussmanian architecture", "art nouveau", "bridge reflections", "bistros"]
-    },
-    "rome": {
-        "styles": ["ancient ruins", "cobblestone streets", "renaissance architecture", "fountain squares"],
-        "time_of_day": ["golden hour", "warm afternoon light", "dramatic sunset"],
-        "specific_features": ["colosseum", "roman columns", "vatican architecture", "piazzas"]
-    },
-    "london": {
-        "styles": ["victorian architecture", "red buses", "royal palaces", "thames river"],
-        "time_of_day": ["moody overcast", "golden hour", "dramatic clouds"],
-        "specific_features": ["big ben", "telephone boxes", "georgian squares", "bridges"]
-    },
-    
-    # American destinations
-    "new york": {
-        "styles": ["towering skyscrapers", "urban canyons", "central park", "brooklyn bridge"],
-        "time_of_day": ["golden hour", "blue hour", "night cityscape"],
-        "specific_features": ["manhattan skyline", "yellow taxis", "fire escapes", "street art"]
-    },
-    "san francisco": {
-        "styles": ["golden gate bridge", "rolling hills", "victorian houses", "cable cars"],
-        "time_of_day": ["golden hour", "foggy morning", "sunset"],
-        "specific_features": ["painted ladies", "steep streets", "bay views", "pier 39"]
-    },
-    
-    # Tropical/Beach destinations
-    "bali": {
-        "styles": ["rice terraces", "hindu temples", "tropical beaches", "jungle waterfalls"],
-        "time_of_day": ["golden hour", "tropical sunset", "misty morning"],
-        "specific_features": ["pura temples", "traditional gates", "volcanic mountains", "palm trees"]
-    },
-    "maldives": {
-        "styles": ["overwater bungalows", "crystal clear lagoons", "coral reefs", "pristine beaches"],
-        "time_of_day": ["golden hour", "turquoise day", "romantic sunset"],
-        "specific_features": ["stilted villas", "infinity pools", "seaplanes", "beach swings"]
-    }
+# Used when the gazetteer knows nothing about a destination
+GENERIC_LOCATION_STYLE = {
+    "styles": ["beautiful landscape", "travel destination", "scenic view"],
+    "time_of_day": ["golden hour", "scenic lighting"],
+    "specific_features": ["landmarks", "local culture", "natural beauty"]
 }
 
 def get_location_keywords(destination):
     """Extract location-specific keywords and style preferences"""
-    dest_lower = destination.lower()
-    
-    # Direct match from predefined styles
-    for location, styles in LOCATION_STYLES.items():
-        if location in dest_lower:
-            return styles
-    
-    # Country/region based matching
-    region_keywords = {
-        "japan": {"styles": ["traditional temples", "cherry blossoms", "zen gardens"], "time_of_day": ["golden hour"]},
-        "thailand": {"styles": ["golden temples", "tropical", "floating markets"], "time_of_day": ["golden hour"]},
-        "france": {"styles": ["elegant architecture", "cafes", "romantic"], "time_of_day": ["golden hour"]},
-        "italy": {"styles": ["renaissance architecture", "piazzas", "ancient ruins"], "time_of_day": ["warm light"]},
-        "usa": {"styles": ["modern cityscape", "diverse landscapes"], "time_of_day": ["golden hour"]},
-        "uk": {"styles": ["victorian architecture", "countryside"], "time_of_day": ["dramatic lighting"]},
-        "indonesia": {"styles": ["tropical paradise", "temples", "rice terraces"], "time_of_day": ["tropical sunset"]},
-        "sri lanka": {"styles": ["ancient temples", "tea plantations", "tropical beaches"], "time_of_day": ["golden hour"]},
-    }
-    
-    for country, styles in region_keywords.items():
-        if country in dest_lower:
-            return styles
-    
-    # Generic travel styles
-    return {
-        "styles": ["beautiful landscape", "travel destination", "scenic view"],
-        "time_of_day": ["golden hour", "scenic lighting"],
-        "specific_features": ["landmarks", "local culture", "natural beauty"]
-    }
+    # Most specific place mentioned (city over country), from data/location_styles.jsonl
+    record = get_gazetteer().lookup(destination)
+    return record if record else GENERIC_LOCATION_STYLE
+
+def destination_seed(destination, salt=""):
+    """Stable 31-bit seed for a destination, the same in every process and session"""
+    normalized = " ".join(destination.lower().split())
+    digest = hashlib.sha256(f"{normalized}|{salt}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") & 0x7FFFFFFF
 
-def generate_location_specific_prompts(destination, num_prompts=4):
-    """Generate location-specific prompts for image generation"""
+def generate_location_specific_prompts(destination, num_prompts=4, seed=None):
+    """Generate location-specific prompts for image generation; the same seed gives the same prompts"""
+    rng = random.Random(destination_seed(destination) if seed is None else seed)
     location_data = get_location_keywords(destination)
     
     prompts = []
@@ -135,19 +70,19 @@ def generate_location_specific_prompts(destination, num_prompts=4):
         
         # Add location-specific style
         if styles:
-            base_elements.append(random.choice(styles))
+            base_elements.append(rng.choice(styles))
         
         # Add time/lighting
         if times:
-            base_elements.append(random.choice(times))
+            base_elements.append(rng.choice(times))
         
         # Add specific features occasionally
-        if features and random.random() > 0.5:
-            base_elements.append(random.choice(features))
+        if features and rng.random() > 0.5:
+            base_elements.append(rng.choice(features))
         
         # Add quality and style
-        base_elements.append(random.choice(quality_terms))
-        base_elements.append(random.choice(photographic_styles))
+        base_elements.append(rng.choice(quality_terms))
+        base_elements.append(rng.choice(photographic_styles))
         
         # Additional enhancement terms
         enhancement_terms = [
@@ -155,7 +90,7 @@ def generate_location_specific_prompts(destination, num_prompts=4):
             "professional composition", "travel magazine quality",
             "breathtaking view", "iconic perspective"
         ]
-        base_elements.append(random.choice(enhancement_terms))
+        base_elements.append(rng.choice(enhancement_terms))
         
         # Combine into prompt
         prompt = ", ".join(base_elements)
@@ -171,122 +106,233 @@ def generate_location_specific_prompts(destination, num_prompts=4):
     
     return prompts
 
-def generate_image_huggingface_enhanced(destination, style_preference="scenic"):
-    """Enhanced image generation with location-specific prompts"""
-    load_dotenv()
-    
-    # Enhanced model list with better quality models
-    models = [
-        "stabilityai/stable-diffusion-2-1",
-        "runwayml/stable-diffusion-v1-5", 
-        "dreamlike-art/dreamlike-diffusion-1.0",
-        "prompthero/openjourney-v4",
-        "wavymulder/Analog-Diffusion"
-    ]
-    
-    headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY')}"}
-    
-    # Generate location-specific prompts
-    prompt_data = generate_location_specific_prompts(destination, 1)[0]
-    
+# Text-to-image models in order of preference
+IMAGE_MODELS = [
+    "stabilityai/stable-diffusion-2-1",
+    "runwayml/stable-diffusion-v1-5", 
+    "dreamlike-art/dreamlike-diffusion-1.0",
+    "prompthero/openjourney-v4",
+    "wavymulder/Analog-Diffusion"
+]
+
+# Concurrency settings for the generation engine
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "4"))
+IMAGE_PARALLEL_MODELS = int(os.getenv("IMAGE_PARALLEL_MODELS", "2"))
+# Per-model request budget on the free Inference API, shared by every process on the host
+IMAGE_MODEL_RPM = float(os.getenv("IMAGE_MODEL_RPM", "6"))
+
+_image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-gen")
+
+# Sample image liveness probing
+URL_PROBE_TIMEOUT = float(os.getenv("URL_PROBE_TIMEOUT", "3"))
+URL_PROBE_DEADLINE = float(os.getenv("URL_PROBE_DEADLINE", "4"))
+URL_LIVENESS_TTL = float(os.getenv("URL_LIVENESS_TTL", "3600"))
+
+_probe_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="url-probe")
+
+
+class _AttemptCancelled(Exception):
+    pass
+
+
+def _model_bucket(model):
+    return get_rate_limit(f"hf-image:{model}", IMAGE_MODEL_RPM)
+
+
+def _record_image_attempt(model, outcome, start):
+    IMAGE_GENERATION.inc(model=model, outcome=outcome)
+    IMAGE_GENERATION_LATENCY.observe(time.perf_counter() - start, model=model, outcome=outcome)
+
+
+def _request_image(model, payload, cancel, timeout, deadline=None):
+    """One generation attempt; waits for the model's token bucket instead of sleeping blindly"""
+    deadline = deadline or Deadline(MEDIA_RETRY_POLICY.deadline)
+    bucket = _model_bucket(model)
+    if not bucket.acquire(timeout=deadline.remaining(), cancel=cancel):
+        IMAGE_GENERATION.inc(model=model, outcome="cancelled")
+        raise _AttemptCancelled()
+    start = time.perf_counter()
+    try:
+        response = get_http_session().post(
+            hf_model_url(model), headers=hf_headers(), json=payload, timeout=deadline.timeout(timeout)
+        )
+    except Exception as e:
+        _record_image_attempt(model, classify_exception(e, "huggingface", model).kind, start)
+        raise
+    if response.status_code == 200:
+        _record_image_attempt(model, "ok", start)
+        return response.content
+    error = hf_error(response, model)
+    _record_image_attempt(model, error.kind, start)
+    if response.status_code in (429, 503):
+        # Rate limited or loading: stop scheduling the model until HF says it should be ready
+        bucket.pause(min(error.retry_after or 10.0, 60.0))
+    raise error
+
+
+def _image_payload(model, prompt_data, parameters):
+    payload = {"inputs": prompt_data["positive"], "parameters": dict(parameters)}
+    # Add negative prompt if model supports it
+    if "stable-diffusion" in model:
+        payload["parameters"]["negative_prompt"] = prompt_data["negative"]
+    return payload
+
+
+def _stored_image(models, prompt_data, parameters):
+    """Previously generated image for this prompt and seed, preferring earlier models"""
+    store = get_image_store()
     for model in models:
+        payload = _image_payload(model, prompt_data, parameters)
         try:
-            API_URL = f"https://api-inference.huggingface.co/models/{model}"
-            
-            payload = {
-                "inputs": prompt_data["positive"],
-                "parameters": {
-                    "num_inference_steps": 25,  
-                    "guidance_scale": 8.0,     
-                    "width": 768,
-                    "height": 512,
-                    "seed": random.randint(0, 2147483647)
-                }
+            image_data = store.get(image_key(model, payload["inputs"], parameters.get("seed"), payload["parameters"]))
+        except Exception:
+            return None
+        if image_data is not None:
+            return {
+                "image_data": image_data,
+                "prompt": prompt_data["positive"],
+                "style": prompt_data["style_focus"],
+                "model": model
             }
-            
-            # Add negative prompt if model supports it
-            if "stable-diffusion" in model:
-                payload["parameters"]["negative_prompt"] = prompt_data["negative"]
-            
-            response = requests.post(API_URL, headers=headers, json=payload, timeout=60)
-            
-            if response.status_code == 200:
-                return {
-                    "image_data": response.content,
-                    "prompt_used": prompt_data["positive"],
-                    "style_focus": prompt_data["style_focus"],
-                    "model_used": model
-                }
-            elif response.status_code == 503:
-                time.sleep(15)  
+    return None
+
+
+def generate_images_concurrently(jobs, models=None, parallel_models=IMAGE_PARALLEL_MODELS, timeout=45,
+                                 on_result=None, use_store=CACHE_ENABLED):
+    """Generate one image per job on a bounded worker pool.
+
+    jobs is a list of (prompt_data, parameters). Each prompt is tried on up to
+    parallel_models models at once; a failed attempt moves on to the next
+    model and the first success cancels the remaining attempts for that
+    prompt. on_result(index, image) is called from the caller's thread.
+    Images already in the on-disk store are returned without a request.
+    The whole batch shares one deadline (MEDIA_RETRY_POLICY); an auth error
+    stops every prompt, any other failure moves that prompt to its next model.
+    Returns a list aligned with jobs holding image dicts or None.
+    """
+    models = models or IMAGE_MODELS
+    results = [None] * len(jobs)
+    cancels = [threading.Event() for _ in jobs]
+    next_model = [0] * len(jobs)
+    futures = {}
+    deadline = Deadline(MEDIA_RETRY_POLICY.deadline)
+
+    def launch(index):
+        if next_model[index] >= len(models) or deadline.expired():
+            return
+        model = models[next_model[index]]
+        next_model[index] += 1
+        payload = _image_payload(model, *jobs[index])
+        future = _image_executor.submit(_request_image, model, payload, cancels[index], timeout, deadline)
+        futures[future] = (index, model)
+
+    for index, (prompt_data, parameters) in enumerate(jobs):
+        stored = _stored_image(models, prompt_data, parameters) if use_store else None
+        if stored is not None:
+            IMAGE_GENERATION.inc(model=stored["model"], outcome="stored")
+            results[index] = stored
+            if on_result:
+                on_result(index, stored)
+            continue
+        for _ in range(parallel_models):
+            launch(index)
+
+    while futures:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            index, model = futures.pop(future)
+            if results[index] is not None:
                 continue
-            else:
+            try:
+                image_data = future.result()
+            except _AttemptCancelled:
                 continue
-                
-        except Exception as e:
-            st.warning(f"Model {model} failed: {str(e)}")
-            continue
+            except Exception as e:
+                if classify_exception(e, "huggingface", model).kind == "auth":
+                    for cancel in cancels:
+                        cancel.set()
+                if not cancels[index].is_set():
+                    launch(index)
+                continue
+            prompt_data, parameters = jobs[index]
+            if use_store:
+                payload = _image_payload(model, prompt_data, parameters)
+                try:
+                    get_image_store().put(
+                        image_key(model, payload["inputs"], parameters.get("seed"), payload["parameters"]),
+                        model, image_data
+                    )
+                except Exception:
+                    pass
+            results[index] = {
+                "image_data": image_data,
+                "prompt": prompt_data["positive"],
+                "style": prompt_data["style_focus"],
+                "model": model
+            }
+            # Redundant attempts for this prompt are no longer needed
+            cancels[index].set()
+            for other, (other_index, _) in list(futures.items()):
+                if other_index == index and other.cancel():
+                    futures.pop(other)
+            if on_result:
+                on_result(index, results[index])
+    return results
+
+
+def generate_image_huggingface_enhanced(destination, style_preference="scenic"):
+    """Enhanced image generation with location-specific prompts"""
+    # Generate location-specific prompts
+    prompt_data = generate_location_specific_prompts(destination, 1)[0]
+    parameters = {
+        "num_inference_steps": 25,  
+        "guidance_scale": 8.0,     
+        "width": 768,
+        "height": 512,
+        "seed": destination_seed(destination, style_preference)
+    }
     
-    return None
+    image = generate_images_concurrently([(prompt_data, parameters)], timeout=60)[0]
+    if image is None:
+        return None
+    return {
+        "image_data": image["image_data"],
+        "prompt_used": image["prompt"],
+        "style_focus": image["style"],
+        "model_used": image["model"]
+    }
+
+def destination_image_jobs(destination, count=3):
+    """(prompt, parameters) jobs for count different views of a destination"""
+    # Get multiple prompt variations
+    prompt_variations = generate_location_specific_prompts(destination, count)
+    return [
+        (prompt_data, {
+            "num_inference_steps": 20,
+            "guidance_scale": 7.5 + (i * 0.5), 
+            "seed": destination_seed(destination, i)
+        })
+        for i, prompt_data in enumerate(prompt_variations)
+    ]
 
 def generate_multiple_destination_images(destination, count=3, style_preferences=None):
-    """Generate multiple images for a destination with different styles"""
+    """Generate multiple images for a destination with different styles, concurrently"""
     if not style_preferences:
         style_preferences = ["scenic", "cultural", "architectural"]
     
-    generated_images = []
+    jobs = destination_image_jobs(destination, count)
     
-    # Get multiple prompt variations
-    prompt_variations = generate_location_specific_prompts(destination, count)
+    status = st.empty()
+    status.info(f"🎨 Generating {count} images in parallel...")
+    finished = []
     
-    for i, prompt_data in enumerate(prompt_variations):
-        st.info(f"🎨 Generating image {i+1}/{count}: {prompt_data['style_focus']}")
-        
-        load_dotenv()
-        headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY')}"}
-        
-        # Try different models for variety
-        models = [
-            "stabilityai/stable-diffusion-2-1",
-            "runwayml/stable-diffusion-v1-5",
-            "dreamlike-art/dreamlike-diffusion-1.0"
-        ]
-        
-        for model in models:
-            try:
-                API_URL = f"https://api-inference.huggingface.co/models/{model}"
-                
-                payload = {
-                    "inputs": prompt_data["positive"],
-                    "parameters": {
-                        "num_inference_steps": 20,
-                        "guidance_scale": 7.5 + (i * 0.5), 
-                        "seed": random.randint(0, 2147483647)
-                    }
-                }
-                
-                response = requests.post(API_URL, headers=headers, json=payload, timeout=45)
-                
-                if response.status_code == 200:
-                    generated_images.append({
-                        "image_data": response.content,
-                        "prompt": prompt_data["positive"],
-                        "style": prompt_data["style_focus"],
-                        "model": model
-                    })
-                    break
-                elif response.status_code == 503:
-                    time.sleep(10)
-                    continue
-                    
-            except Exception as e:
-                continue
-        
-        # Add delay between generations
-        if i < count - 1:
-            time.sleep(3)
+    def on_result(index, image):
+        finished.append(index)
+        status.info(f"🎨 Generated {len(finished)}/{count}: {image['style']}")
     
-    return generated_images
+    results = generate_images_concurrently(jobs, models=IMAGE_MODELS[:3], on_result=on_result)
+    status.empty()
+    return [image for image in results if image is not None]
 
 def display_enhanced_images_streamlit(destination, google_urls, generated_images=None, sample_urls=None):
     """Enhanced display with better organization and metadata"""
@@ -383,7 +429,7 @@ def get_sample_images_urls(destination):
     
     # Picsum with destination-based seeds
     picsum_urls = [
-        f"https://picsum.photos/800/600?random={hash(destination + str(i)) % 1000}"
+        f"https://picsum.photos/800/600?random={destination_seed(destination, f'picsum{i}') % 1000}"
         for i in range(4)
     ]
     
@@ -429,23 +475,56 @@ def get_google_images_urls(destination, num_images=6):
 def test_image_url(url, timeout=5):
     """Test if an image URL is accessible"""
     try:
-        response = requests.head(url, timeout=timeout, allow_redirects=True)
+        response = get_http_session().head(url, timeout=timeout, allow_redirects=True)
         return response.status_code == 200
-    except:
+    except Exception:
         return False
 
-def get_working_image_urls(urls, max_test=4):
-    """Filter URLs to only return working image URLs"""
-    working_urls = []
-    
-    for i, url in enumerate(urls[:max_test]):
+def _liveness_key(url):
+    return make_key("url_liveness", url)
+
+def _cached_liveness(url):
+    """Last probe result for url if it is younger than URL_LIVENESS_TTL"""
+    if not CACHE_ENABLED:
+        return None
+    try:
+        entry = get_cache().get("url_liveness", _liveness_key(url))
+    except Exception:
+        return None
+    if entry is None or time.time() - entry["checked_at"] > URL_LIVENESS_TTL:
+        return None
+    return entry["ok"]
+
+def _probe_url(url, timeout):
+    ok = test_image_url(url, timeout)
+    if CACHE_ENABLED:
         try:
-            if test_image_url(url):
-                working_urls.append(url)
-            if len(working_urls) >= 4:
-                break
-        except:
-            continue
+            get_cache().set("url_liveness", _liveness_key(url), {"ok": ok, "checked_at": time.time()})
+        except Exception:
+            pass
+    return ok
+
+def get_working_image_urls(urls, max_test=4, deadline=URL_PROBE_DEADLINE, timeout=URL_PROBE_TIMEOUT):
+    """Filter URLs to only return working image URLs, probing uncached ones concurrently"""
+    candidates = urls[:max_test]
+    alive = {}
+    pending = {}
+    for url in candidates:
+        cached = _cached_liveness(url)
+        if cached is None:
+            pending[_probe_executor.submit(_probe_url, url, timeout)] = url
+        else:
+            alive[url] = cached
+    
+    if pending:
+        # Whatever has not answered by the deadline is treated as unavailable for this render
+        done, not_done = wait(pending, timeout=deadline)
+        for future in done:
+            alive[pending[future]] = future.result()
+        for future in not_done:
+            future.cancel()
+    
+    working_urls = [url for url in candidates if alive.get(url)][:4]
     
     if not working_urls:
         working_urls = [
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from utils.cache import CACHE_DIR, make_key
+
+# Generated images live next to the response cache, bounded by total bytes
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", os.path.join(CACHE_DIR, "images"))
+IMAGE_STORE_MAX_BYTES = int(os.getenv("IMAGE_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    model TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_accessed ON images (accessed_at);
+CREATE INDEX IF NOT EXISTS images_digest ON images (digest);
+"""
+
+# Bytes on disk: a blob shared by several keys is counted once
+_BLOB_BYTES = "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM images)"
+
+
+def image_key(model, prompt, seed, params):
+    """Key of one generation request; identical requests produce identical images"""
+    params = {k: v for k, v in (params or {}).items() if k != "seed"}
+    return make_key("image", model, prompt, seed, params)
+
+
+class ImageStore:
+    """Content-addressed image files with a SQLite index and LRU eviction by size"""
+
+    def __init__(self, root=IMAGE_STORE_DIR, max_bytes=IMAGE_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def get(self, key):
+        """Image bytes stored for key, or None"""
+        conn = self._connect()
+        row = conn.execute("SELECT digest FROM images WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._blob_path(row[0]), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            conn.execute("DELETE FROM images WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE images SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return data
+
+    def put(self, key, model, data):
+        """Store image bytes under key; the file name is the sha256 of the content"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO images (key, digest, model, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, digest, model, len(data), now, now)
+            )
+            orphans = self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for orphan in orphans:
+            try:
+                os.remove(self._blob_path(orphan))
+            except FileNotFoundError:
+                pass
+        return digest
+
+    def _evict(self, conn):
+        """Drop least recently used entries until the distinct blobs fit the size limit; returns
+        digests no longer referenced"""
+        total = conn.execute(_BLOB_BYTES).fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+        excess = total - self.max_bytes
+        # Several keys can share one blob, which only frees space once its last key goes
+        references = dict(conn.execute("SELECT digest, COUNT(*) FROM images GROUP BY digest"))
+        victims, orphans = [], set()
+        for key, digest, size in conn.execute("SELECT key, digest, size FROM images ORDER BY accessed_at ASC"):
+            victims.append((key,))
+            references[digest] -= 1
+            if references[digest] == 0:
+                orphans.add(digest)
+                excess -= size
+                if excess <= 0:
+                    break
+        conn.executemany("DELETE FROM images WHERE key = ?", victims)
+        return orphans
+
+    def stats(self):
+        conn = self._connect()
+        entries = conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+        size = conn.execute(_BLOB_BYTES).fetchone()[0]
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """Process-wide ImageStore"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ImageStore()
+    return _store
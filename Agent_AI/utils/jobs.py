@@ -0,0 +1,196 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.cache import CACHE_DIR
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Finished jobs are kept this long so a refreshed page can still pick up its result
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(24 * 3600)))
+# Partial results are written at most this often per job
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "0.3"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "error"
+ACTIVE = (QUEUED, RUNNING)
+
+# Tells this process apart from an earlier one that had the same pid, e.g. before a container restart
+_BOOT_ID = uuid.uuid4().hex
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    owner_pid INTEGER NOT NULL,
+    owner_boot TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at);
+"""
+
+_handlers = {}
+
+
+def register_job_handler(kind, fn):
+    """fn(payload, report) runs a job of this kind; report(progress_dict) publishes partial results"""
+    _handlers[kind] = fn
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """SQLite table of jobs and their progress, shared by every process on the host"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "jobs.sqlite3")
+        self._local = threading.local()
+
+    def _connect(self):
+        # sqlite3 connections must not cross threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            if "owner_boot" not in [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]:
+                try:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN owner_boot TEXT")
+                except sqlite3.OperationalError:
+                    pass  # another process added it first
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, kind, payload):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, kind, status, payload, owner_pid, owner_boot, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(payload, ensure_ascii=False), os.getpid(), _BOOT_ID, now, now)
+        )
+        return job_id
+
+    def update(self, job_id, **fields):
+        """Set status, progress, result or error; dict values are stored as JSON"""
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        values = [json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v for v in fields.values()]
+        self._connect().execute(
+            f"UPDATE jobs SET {columns}, updated_at = ? WHERE id = ?", (*values, time.time(), job_id)
+        )
+
+    def get(self, job_id):
+        """Job as a dict, or None for unknown ids"""
+        row = self._connect().execute(
+            "SELECT id, kind, status, payload, progress, result, error, owner_pid, created_at, updated_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("id", "kind", "status", "payload", "progress", "result", "error", "owner_pid",
+                        "created_at", "updated_at"), row))
+        for name in ("payload", "progress", "result"):
+            job[name] = json.loads(job[name]) if job[name] else None
+        return job
+
+    def claim_orphans(self):
+        """Take over unfinished jobs whose owning process has died; returns their ids"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT id, owner_pid, owner_boot FROM jobs WHERE status IN ({','.join('?' * len(ACTIVE))})",
+                ACTIVE
+            ).fetchall()
+            me = os.getpid()
+            # Our own pid under another boot id belonged to a process that is gone
+            orphans = [job_id for job_id, pid, boot in rows
+                       if (pid, boot) != (me, _BOOT_ID) and (pid == me or not _pid_alive(pid))]
+            conn.executemany(
+                "UPDATE jobs SET status = ?, owner_pid = ?, owner_boot = ?, updated_at = ? WHERE id = ?",
+                [(QUEUED, me, _BOOT_ID, time.time(), job_id) for job_id in orphans]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return orphans
+
+    def prune(self, retention=JOB_RETENTION):
+        self._connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, time.time() - retention)
+        )
+
+
+class JobQueue:
+    """Runs jobs on a pool of background threads and records every state change in a JobStore"""
+
+    def __init__(self, store=None, workers=JOB_WORKERS):
+        self.store = store or JobStore()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job-worker")
+        self.store.prune()
+        # Jobs left behind by a crashed or restarted server are picked up again
+        for job_id in self.store.claim_orphans():
+            self._executor.submit(self._run, job_id)
+
+    def submit(self, kind, payload):
+        if kind not in _handlers:
+            raise ValueError(f"No job handler registered for '{kind}'")
+        job_id = self.store.create(kind, payload)
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _run(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in ACTIVE:
+            return
+        self.store.update(job_id, status=RUNNING)
+        last_write = [0.0]
+
+        def report(progress, force=False):
+            now = time.monotonic()
+            if force or now - last_write[0] >= JOB_PROGRESS_INTERVAL:
+                last_write[0] = now
+                self.store.update(job_id, progress=progress)
+
+        try:
+            result = _handlers[job["kind"]](job["payload"], report)
+            self.store.update(job_id, status=DONE, result=result)
+        except Exception as e:
+            self.store.update(job_id, status=FAILED, error=str(e))
+
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide JobQueue instance"""
+    global _default_queue
+    if _default_queue is None:
+        with _default_lock:
+            if _default_queue is None:
+                _default_queue = JobQueue()
+    return _default_queue
@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local metrics endpoint; "0" or "off" disables it
+METRICS_PORT = os.getenv("METRICS_PORT", "9108")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _series(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self._series()]
+
+    def snapshot(self):
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in self._series()]
+
+
+class Histogram(Counter):
+    """Bucketed distribution (count, sum and cumulative buckets) per label combination"""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"counts": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["count"] += 1
+            series["sum"] += value
+
+    def _series(self):
+        with self._lock:
+            return [(key, {"counts": list(s["counts"]), "count": s["count"], "sum": s["sum"]})
+                    for key, s in self._values.items()]
+
+    def render(self):
+        lines = []
+        for key, series in self._series():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+    def snapshot(self):
+        return [
+            {
+                "labels": dict(zip(self.labelnames, key)),
+                "count": series["count"],
+                "sum": round(series["sum"], 4),
+                "mean": round(series["sum"] / series["count"], 4) if series["count"] else None,
+            }
+            for key, series in self._series()
+        ]
+
+
+class MetricsRegistry:
+    """Named metrics of one process, exportable as Prometheus text or JSON"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render_prometheus(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON-serialisable view of every metric with at least one sample"""
+        return {
+            metric.name: {"type": metric.type, "series": series}
+            for metric in list(self._metrics.values())
+            if (series := metric.snapshot())
+        }
+
+
+registry = MetricsRegistry()
+
+# Provider calls made by the agents (outcome is "ok" or the error kind)
+PROVIDER_REQUESTS = registry.counter(
+    "travel_provider_requests_total", "LLM provider calls by outcome", ("provider", "model", "outcome"))
+PROVIDER_LATENCY = registry.histogram(
+    "travel_provider_request_seconds", "LLM provider call latency", ("provider", "model", "outcome"))
+PROVIDER_RETRIES = registry.counter(
+    "travel_provider_retries_total", "Retries against the same provider", ("provider", "model"))
+FALLBACKS = registry.counter(
+    "travel_fallbacks_total", "Answers that came from a provider other than the first choice", ("provider",))
+
+# Trip graph nodes
+NODE_LATENCY = registry.histogram(
+    "travel_graph_node_seconds", "Trip graph node duration", ("node", "outcome"))
+PROMPT_CHARS = registry.histogram(
+    "travel_agent_prompt_chars", "Agent input size in characters", ("node",), SIZE_BUCKETS)
+RESPONSE_CHARS = registry.histogram(
+    "travel_agent_response_chars", "Agent output size in characters", ("node",), SIZE_BUCKETS)
+# How the planner's hand-off was built: "json", "invalid_json" (fell back to markdown) or "markdown"
+PLANNER_HANDOFF = registry.counter(
+    "travel_planner_handoff_total", "Planner hand-offs by source", ("source",))
+# Where budgets came from: "llm", "local" (cost model only), "hybrid" (LLM narrating computed figures)
+BUDGET_SOURCE = registry.counter(
+    "travel_budget_source_total", "Budgets by how they were produced", ("source",))
+
+# Semantic request cache (outcome is "hit", "miss" or "uncacheable")
+SEMANTIC_CACHE_LOOKUPS = registry.counter(
+    "travel_semantic_cache_lookups_total", "Semantic cache lookups by outcome", ("outcome",))
+SEMANTIC_SIMILARITY = registry.histogram(
+    "travel_semantic_cache_similarity", "Best similarity among filter-matching entries", (),
+    (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0))
+
+# Multimodal input
+IMAGE_ANALYSIS_LATENCY = registry.histogram(
+    "travel_image_analysis_seconds", "Image analysis duration", ("provider", "outcome"))
+TRANSCRIPTION_LATENCY = registry.histogram(
+    "travel_transcription_seconds", "Audio transcription duration", ("mode", "outcome"))
+
+# Image generation
+IMAGE_GENERATION = registry.counter(
+    "travel_image_generation_total", "Text-to-image attempts by model and outcome", ("model", "outcome"))
+IMAGE_GENERATION_LATENCY = registry.histogram(
+    "travel_image_generation_seconds", "Text-to-image request latency", ("model", "outcome"))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = registry.render_prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Serve /metrics (Prometheus) and /metrics.json once per process; None when disabled or the port is taken"""
+    global _server
+    if str(port).lower() in ("0", "off", "false", ""):
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            except OSError:
+                # Another worker on this host already serves the port
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
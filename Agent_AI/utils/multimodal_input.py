@@ -1,38 +1,74 @@
+import importlib.util
 import os
-from dotenv import load_dotenv
+import time
+from utils.cache import CACHE_ENABLED, file_digest, get_cache, make_key
+from utils.metrics import IMAGE_ANALYSIS_LATENCY, TRANSCRIPTION_LATENCY
+from utils.transcription import TranscriptionQueueFull, get_transcription_worker
+from utils.providers import GEMINI_VISION_MODEL, get_gemini_model, get_http_session, hf_error, hf_headers, hf_model_url
+from utils.retry import MEDIA_RETRY_POLICY
 
-def transcribe_audio_free(audio_file_path):
+HF_CAPTION_MODEL = "nlpconnect/vit-gpt2-image-captioning"
+# Longest edge sent to each vision provider; larger uploads only add latency
+GEMINI_IMAGE_MAX_SIDE = int(os.getenv("GEMINI_IMAGE_MAX_SIDE", "1024"))
+HF_IMAGE_MAX_SIDE = int(os.getenv("HF_IMAGE_MAX_SIDE", "384"))
+
+def transcribe_audio_free(audio_file_path, long_audio=None):
     """
     Free audio transcription using OpenAI Whisper (runs locally)
-    No API key required!
+    No API key required! The model stays loaded in a background worker process.
+    Recordings longer than LONG_AUDIO_SECONDS (or long_audio=True) are split at
+    silences and transcribed in parallel.
     """
+    if importlib.util.find_spec("whisper") is None:
+        return "Error: Please install whisper with: pip install openai-whisper"
+    start = time.perf_counter()
+    mode = "single"
     try:
-        import whisper
-        
-        # Load the model
-        model = whisper.load_model("base")  
+        from utils.audio_chunking import LONG_AUDIO_SECONDS, audio_duration, transcribe_long_audio
         
-        # Transcribe the audio
-        result = model.transcribe(audio_file_path)
-        return result['text']
-    except ImportError:
-        return "Error: Please install whisper with: pip install openai-whisper"
+        if long_audio is None:
+            long_audio = audio_duration(audio_file_path) > LONG_AUDIO_SECONDS
+        if long_audio:
+            mode = "chunked"
+            text = transcribe_long_audio(audio_file_path)
+        else:
+            text = get_transcription_worker().transcribe(audio_file_path)
+        TRANSCRIPTION_LATENCY.observe(time.perf_counter() - start, mode=mode, outcome="ok")
+        return text
+    except TranscriptionQueueFull as e:
+        TRANSCRIPTION_LATENCY.observe(time.perf_counter() - start, mode=mode, outcome="queue_full")
+        return f"Error: {str(e)}"
     except Exception as e:
+        TRANSCRIPTION_LATENCY.observe(time.perf_counter() - start, mode=mode, outcome="error")
         return f"Error transcribing audio: {str(e)}"
 
+def downscale_image(image_path, max_side, quality=85):
+    """JPEG bytes no larger than max_side on the long edge.
+
+    JPEGs are decoded in draft mode, so libjpeg scales them down by a power of
+    two while decoding instead of materialising the full-resolution bitmap.
+    """
+    from PIL import Image, ImageOps
+    import io
+    
+    with Image.open(image_path) as image:
+        if image.format == "JPEG":
+            image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return buffer.getvalue()
+
 def analyze_image_gemini(image_path):
     """Analyze image using Google Gemini Vision (Free tier)"""
-    load_dotenv()
-    
     try:
-        import google.generativeai as genai
-        from PIL import Image
-        
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel('gemini-pro-vision')
+        model = get_gemini_model(GEMINI_VISION_MODEL)
         
-        # Load and prepare image
-        image = Image.open(image_path)
+        # Upload a downscaled JPEG instead of the original file
+        image = {"mime_type": "image/jpeg", "data": downscale_image(image_path, GEMINI_IMAGE_MAX_SIDE)}
         
         prompt = """Analyze this travel-related image and provide:
         1. What you see in the image
@@ -41,32 +77,31 @@ def analyze_image_gemini(image_path):
         4. Estimated costs if it's a tourist attraction
         """
         
-        response = model.generate_content([prompt, image])
-        return response.text
+        return MEDIA_RETRY_POLICY.call(
+            lambda timeout: model.generate_content(
+                [prompt, image], request_options={"timeout": timeout}
+            ).text, "gemini", GEMINI_VISION_MODEL
+        )
     except Exception as e:
         return f"Error analyzing image: {str(e)}"
 
 def analyze_image_huggingface(image_path):
     """Analyze image using Hugging Face Vision models (Free)"""
-    load_dotenv()
-    
     try:
-        import requests
-        from PIL import Image
-        import io
-        
-        # Convert image to bytes
-        image = Image.open(image_path)
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='JPEG')
-        img_byte_arr = img_byte_arr.getvalue()
+        # The captioning model works at 224px, so a small JPEG carries all it can use
+        img_byte_arr = downscale_image(image_path, HF_IMAGE_MAX_SIDE)
         
         # Use Hugging Face Image-to-Text model
-        API_URL = "https://api-inference.huggingface.co/models/nlpconnect/vit-gpt2-image-captioning"
-        headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY')}"}
+        API_URL = hf_model_url(HF_CAPTION_MODEL)
+        
+        def attempt(timeout):
+            response = get_http_session().post(API_URL, headers=hf_headers(), data=img_byte_arr, timeout=timeout)
+            if response.status_code != 200:
+                raise hf_error(response, HF_CAPTION_MODEL)
+            return response.json()
         
-        response = requests.post(API_URL, headers=headers, data=img_byte_arr)
-        result = response.json()
+        # A cold captioning model answers 503 with estimated_time; the policy waits that out within its deadline
+        result = MEDIA_RETRY_POLICY.call(attempt, "huggingface", HF_CAPTION_MODEL)
         
         if isinstance(result, list) and len(result) > 0:
             caption = result[0].get('generated_text', 'Unable to analyze image')
@@ -77,19 +112,44 @@ def analyze_image_huggingface(image_path):
     except Exception as e:
         return f"Error analyzing image: {str(e)}"
 
-def analyze_image(image_path):
-    """Try multiple free image analysis APIs"""
-    
+def _timed_analysis(provider, analyze, image_path):
+    start = time.perf_counter()
+    result = analyze(image_path)
+    outcome = "error" if result.startswith("Error") else "ok"
+    IMAGE_ANALYSIS_LATENCY.observe(time.perf_counter() - start, provider=provider, outcome=outcome)
+    return result
+
+def _analyze_image_uncached(image_path):
     # Try Gemini
     if os.getenv("GEMINI_API_KEY"):
-        result = analyze_image_gemini(image_path)
+        result = _timed_analysis("gemini", analyze_image_gemini, image_path)
         if not result.startswith("Error"):
             return result
     
     # Try Hugging 
     if os.getenv("HUGGINGFACE_API_KEY"):
-        result = analyze_image_huggingface(image_path)
+        result = _timed_analysis("huggingface", analyze_image_huggingface, image_path)
         if not result.startswith("Error"):
             return result
     
-    return "Error: No valid API keys found for image analysis. Please set GEMINI_API_KEY or HUGGINGFACE_API_KEY."
\ No newline at end of file
+    return "Error: No valid API keys found for image analysis. Please set GEMINI_API_KEY or HUGGINGFACE_API_KEY."
+
+def analyze_image(image_path, use_cache=True):
+    """Try multiple free image analysis APIs; the same photo is only analyzed once"""
+    if not (use_cache and CACHE_ENABLED):
+        return _analyze_image_uncached(image_path)
+    
+    chain = []
+    if os.getenv("GEMINI_API_KEY"):
+        chain.append(("gemini", GEMINI_VISION_MODEL, GEMINI_IMAGE_MAX_SIDE))
+    if os.getenv("HUGGINGFACE_API_KEY"):
+        chain.append(("huggingface", HF_CAPTION_MODEL, HF_IMAGE_MAX_SIDE))
+    key = make_key(file_digest(image_path), chain)
+    
+    cached = get_cache().get("image_analysis", key)
+    if cached is not None:
+        return cached
+    result = _analyze_image_uncached(image_path)
+    if not result.startswith("Error"):
+        get_cache().set("image_analysis", key, result)
+    return result
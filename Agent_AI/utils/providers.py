@@ -0,0 +1,317 @@
+import asyncio
+import json
+import os
+import threading
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from utils.errors import error_for_status
+from utils.metrics import PROVIDER_RETRIES
+from utils.retry import TEXT_RETRY_POLICY, server_hint
+
+# Default models used by the agents
+GROQ_MODEL = "llama3-8b-8192"
+GEMINI_MODEL = "gemini-pro"
+GEMINI_VISION_MODEL = "gemini-pro-vision"
+HF_TEXT_MODEL = "microsoft/DialoGPT-medium"
+# Endpoint overrides, e.g. to point every provider at the local benchmark stand-ins
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT") or None
+HF_INFERENCE_URL = os.getenv("HF_INFERENCE_URL", "https://api-inference.huggingface.co/models")
+HF_TEXT_PARAMETERS = {
+    "max_length": 1000,
+    "temperature": 0.7,
+    "do_sample": True
+}
+
+# Network settings shared by every provider client
+REQUEST_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", "60"))
+POOL_CONNECTIONS = 8
+POOL_MAXSIZE = 32
+
+_lock = threading.RLock()
+_env_loaded = False
+_http_session = None
+_groq_clients = {}
+_gemini_api_key = None
+_gemini_models = {}
+# Async clients own connections bound to one event loop, so they are cached per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def ensure_env():
+    """Load the .env file once per process"""
+    global _env_loaded
+    if not _env_loaded:
+        with _lock:
+            if not _env_loaded:
+                load_dotenv()
+                _env_loaded = True
+
+
+def get_http_session():
+    """Shared requests session with a keep-alive connection pool"""
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+
+def get_groq_client():
+    """Long-lived Groq client (reuses its own HTTP connection pool)"""
+    ensure_env()
+    api_key = os.getenv("GROQ_API_KEY")
+    client = _groq_clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _groq_clients.get(api_key)
+            if client is None:
+                from groq import Groq
+                client = Groq(api_key=api_key, timeout=REQUEST_TIMEOUT, base_url=GROQ_BASE_URL)
+                _groq_clients[api_key] = client
+    return client
+
+
+def get_gemini_model(model_name=GEMINI_MODEL):
+    """Cached Gemini model handle; genai.configure runs only when the key changes"""
+    global _gemini_api_key
+    ensure_env()
+    api_key = os.getenv("GEMINI_API_KEY")
+    model = _gemini_models.get(model_name) if api_key == _gemini_api_key else None
+    if model is None:
+        with _lock:
+            import google.generativeai as genai
+            if api_key != _gemini_api_key:
+                if GEMINI_API_ENDPOINT:
+                    genai.configure(api_key=api_key, transport="rest",
+                                    client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+                else:
+                    genai.configure(api_key=api_key)
+                _gemini_api_key = api_key
+                _gemini_models.clear()
+            model = _gemini_models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                _gemini_models[model_name] = model
+    return model
+
+
+def _loop_clients():
+    loop = asyncio.get_running_loop()
+    return _async_clients.setdefault(loop, {})
+
+
+def get_async_http_client():
+    """Shared httpx.AsyncClient for the running event loop"""
+    clients = _loop_clients()
+    client = clients.get("http")
+    if client is None:
+        import httpx
+        limits = httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_CONNECTIONS)
+        client = httpx.AsyncClient(limits=limits, timeout=REQUEST_TIMEOUT)
+        clients["http"] = client
+    return client
+
+
+def get_async_groq_client():
+    """AsyncGroq client for the running event loop"""
+    ensure_env()
+    api_key = os.getenv("GROQ_API_KEY")
+    clients = _loop_clients()
+    client = clients.get(("groq", api_key))
+    if client is None:
+        from groq import AsyncGroq
+        client = AsyncGroq(api_key=api_key, timeout=REQUEST_TIMEOUT, base_url=GROQ_BASE_URL)
+        clients[("groq", api_key)] = client
+    return client
+
+
+def hf_model_url(model):
+    """Inference endpoint for a Hugging Face model"""
+    return f"{HF_INFERENCE_URL}/{model}"
+
+
+def hf_headers():
+    """Authorization headers for the Hugging Face Inference API"""
+    ensure_env()
+    return {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY')}"}
+
+
+def reset_providers():
+    """Drop every cached client (used by benchmarks and after key rotation)"""
+    global _env_loaded, _http_session, _gemini_api_key
+    with _lock:
+        if _http_session is not None:
+            _http_session.close()
+        _http_session = None
+        _groq_clients.clear()
+        _gemini_models.clear()
+        _gemini_api_key = None
+        _async_clients.clear()
+        _env_loaded = False
+
+
+def _count_retry(provider, model):
+    return lambda error, delay: PROVIDER_RETRIES.inc(provider=provider, model=model)
+
+
+def _groq_options(json_mode):
+    return {"response_format": {"type": "json_object"}} if json_mode else {}
+
+
+def _gemini_options(json_mode, timeout):
+    options = {"request_options": {"timeout": timeout}}
+    if json_mode:
+        options["generation_config"] = {"response_mime_type": "application/json"}
+    return options
+
+
+def groq_chat(prompt, model=GROQ_MODEL, deadline=None, json_mode=False):
+    """Single-turn chat completion on Groq; json_mode constrains the answer to a JSON object"""
+    def attempt(timeout):
+        chat_completion = get_groq_client().chat.completions.create(
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            model=model,
+            timeout=timeout,
+            **_groq_options(json_mode),
+        )
+        return chat_completion.choices[0].message.content
+    return TEXT_RETRY_POLICY.call(attempt, "groq", model, deadline, _count_retry("groq", model))
+
+
+def gemini_generate(contents, model_name=GEMINI_MODEL, deadline=None, json_mode=False):
+    """Generate content with a cached Gemini model; json_mode asks for an application/json answer"""
+    def attempt(timeout):
+        return get_gemini_model(model_name).generate_content(contents, **_gemini_options(json_mode, timeout)).text
+    return TEXT_RETRY_POLICY.call(attempt, "gemini", model_name, deadline, _count_retry("gemini", model_name))
+
+
+def _hf_text_payload(prompt):
+    return {
+        "inputs": prompt,
+        "parameters": dict(HF_TEXT_PARAMETERS)
+    }
+
+
+def hf_error(response, model):
+    """Typed error for a failed Inference API response, carrying the server's wait hint"""
+    return error_for_status(
+        response.status_code,
+        f"API request failed with status {response.status_code}: {response.text}",
+        provider="huggingface", model=model, retry_after=server_hint(response)
+    )
+
+
+def _hf_text_result(response, model):
+    if response.status_code != 200:
+        raise hf_error(response, model)
+    result = response.json()
+    if isinstance(result, list) and len(result) > 0:
+        return result[0].get('generated_text', 'No response generated')
+    return str(result)
+
+
+def huggingface_generate(prompt, model=HF_TEXT_MODEL, deadline=None):
+    """Text generation on the Hugging Face Inference API over the pooled session"""
+    payload = _hf_text_payload(prompt)
+
+    def attempt(timeout):
+        response = get_http_session().post(hf_model_url(model), headers=hf_headers(), json=payload, timeout=timeout)
+        return _hf_text_result(response, model)
+    return TEXT_RETRY_POLICY.call(attempt, "huggingface", model, deadline, _count_retry("huggingface", model))
+
+
+def groq_chat_stream(prompt, model=GROQ_MODEL, timeout=REQUEST_TIMEOUT):
+    """Yield Groq completion text as it is generated; timeout bounds each network read"""
+    stream = get_groq_client().chat.completions.create(
+        messages=[
+            {"role": "user", "content": prompt}
+        ],
+        model=model,
+        stream=True,
+        timeout=timeout,
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def gemini_generate_stream(contents, model_name=GEMINI_MODEL, timeout=REQUEST_TIMEOUT):
+    """Yield Gemini output chunk by chunk; timeout bounds the whole request"""
+    options = _gemini_options(False, timeout)
+    for chunk in get_gemini_model(model_name).generate_content(contents, stream=True, **options):
+        if chunk.text:
+            yield chunk.text
+
+
+def huggingface_generate_stream(prompt, model=HF_TEXT_MODEL, timeout=REQUEST_TIMEOUT):
+    """Yield tokens from Hugging Face server-sent events when the model supports it"""
+    payload = _hf_text_payload(prompt)
+    payload["stream"] = True
+    response = get_http_session().post(
+        hf_model_url(model), headers=hf_headers(), json=payload, timeout=timeout, stream=True
+    )
+    with response:
+        if response.status_code != 200:
+            raise hf_error(response, model)
+        if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+            # Model does not stream; fall back to the complete answer in one chunk
+            result = response.json()
+            if isinstance(result, list) and len(result) > 0:
+                yield result[0].get('generated_text', 'No response generated')
+            else:
+                yield str(result)
+            return
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            event = json.loads(line[len("data:"):].strip())
+            token = event.get("token", {})
+            if token.get("text") and not token.get("special"):
+                yield token["text"]
+
+
+async def agroq_chat(prompt, model=GROQ_MODEL, deadline=None, json_mode=False):
+    """Async single-turn chat completion on Groq"""
+    async def attempt(timeout):
+        chat_completion = await get_async_groq_client().chat.completions.create(
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            model=model,
+            timeout=timeout,
+            **_groq_options(json_mode),
+        )
+        return chat_completion.choices[0].message.content
+    return await TEXT_RETRY_POLICY.acall(attempt, "groq", model, deadline, _count_retry("groq", model))
+
+
+async def agemini_generate(contents, model_name=GEMINI_MODEL, deadline=None, json_mode=False):
+    """Async content generation with a cached Gemini model"""
+    async def attempt(timeout):
+        response = await get_gemini_model(model_name).generate_content_async(
+            contents, **_gemini_options(json_mode, timeout)
+        )
+        return response.text
+    return await TEXT_RETRY_POLICY.acall(attempt, "gemini", model_name, deadline, _count_retry("gemini", model_name))
+
+
+async def ahuggingface_generate(prompt, model=HF_TEXT_MODEL, deadline=None):
+    """Async text generation on the Hugging Face Inference API"""
+    payload = _hf_text_payload(prompt)
+
+    async def attempt(timeout):
+        response = await get_async_http_client().post(
+            hf_model_url(model), headers=hf_headers(), json=payload, timeout=timeout
+        )
+        return _hf_text_result(response, model)
+    return await TEXT_RETRY_POLICY.acall(attempt, "huggingface", model, deadline, _count_retry("huggingface", model))
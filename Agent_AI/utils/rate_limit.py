@@ -0,0 +1,347 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from utils.cache import CACHE_DIR
+
+
+class TokenBucket:
+    """In-process token bucket: `rate` tokens per second, bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now < self._paused_until:
+            self._updated = now
+            return
+        start = max(self._updated, self._paused_until)
+        self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens=1):
+        """Seconds until `tokens` could be taken"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            pause = max(0.0, self._paused_until - now)
+            missing = max(0.0, tokens - self._tokens)
+            return pause + (missing / self.rate if self.rate > 0 else float("inf"))
+
+    def acquire(self, tokens=1, timeout=None, cancel=None):
+        """Block until tokens are available; False on timeout or when the cancel event is set"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if cancel is not None and cancel.is_set():
+                return False
+            if self.try_acquire(tokens):
+                return True
+            wait = self.wait_time(tokens)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            wait = min(max(wait, 0.01), 0.5)
+            if cancel is not None:
+                cancel.wait(wait)
+            else:
+                time.sleep(wait)
+
+    async def aacquire(self, tokens=1, timeout=None):
+        """acquire for coroutines: waits with asyncio.sleep instead of blocking the loop"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire(tokens):
+            wait = self.wait_time(tokens)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            await asyncio.sleep(min(max(wait, 0.01), 0.5))
+        return True
+
+    def pause(self, seconds):
+        """Empty the bucket and stop refilling for a while (e.g. the model is loading)"""
+        with self._lock:
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(name, rate, capacity):
+    """Named process-wide bucket, created on first use"""
+    bucket = _buckets.get(name)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.setdefault(name, TokenBucket(rate, capacity))
+    return bucket
+
+
+# Budgets shared by every process on the host live here
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", os.path.join(CACHE_DIR, "rate_limits.sqlite3"))
+# Seconds of traffic a full bucket may release at once
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "5"))
+# A waiter that stops polling this long (its process died) loses its place in line
+_TICKET_STALE_SECONDS = 10.0
+_HEAD_POLL_SECONDS = 0.5
+_QUEUE_POLL_SECONDS = 0.05
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    heartbeat REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tickets_key ON tickets (key, id);
+CREATE TABLE IF NOT EXISTS pauses (
+    key TEXT PRIMARY KEY,
+    until REAL NOT NULL
+);
+"""
+
+
+class RateLimitStore:
+    """SQLite token buckets plus a first-come-first-served waiting line per key"""
+
+    def __init__(self, path=RATE_LIMIT_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        # sqlite3 connections must not cross threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, time.time())
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _missing_seconds(conn, now, demands):
+        """Seconds until every bucket holds its demand (0 when they already do), plus their refilled levels"""
+        wait, levels = 0.0, []
+        for name, amount, rate, capacity in demands:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            levels.append(tokens)
+            if tokens < amount:
+                wait = max(wait, (amount - tokens) / rate)
+        return wait, levels
+
+    @staticmethod
+    def _paused_seconds(conn, now, key):
+        row = conn.execute("SELECT until FROM pauses WHERE key = ?", (key,)).fetchone()
+        return max(0.0, row[0] - now) if row else 0.0
+
+    @staticmethod
+    def _take(conn, now, demands, levels):
+        conn.executemany(
+            "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+            [(name, level - amount, now) for (name, amount, _, _), level in zip(demands, levels)]
+        )
+
+    def try_take(self, key, demands):
+        """Take the demands at once if nobody is queued for key; otherwise (False, wait) without queueing"""
+        def attempt(conn, now):
+            queued = conn.execute(
+                "SELECT 1 FROM tickets WHERE key = ? AND heartbeat >= ? LIMIT 1", (key, now - _TICKET_STALE_SECONDS)
+            ).fetchone()
+            wait, levels = self._missing_seconds(conn, now, demands)
+            wait = max(wait, self._paused_seconds(conn, now, key))
+            if queued is None and wait <= 0:
+                self._take(conn, now, demands, levels)
+                return True, 0.0
+            return False, wait
+        return self._transaction(attempt)
+
+    def enqueue(self, key):
+        return self._transaction(lambda conn, now: conn.execute(
+            "INSERT INTO tickets (key, heartbeat) VALUES (?, ?)", (key, now)
+        ).lastrowid)
+
+    def take_in_turn(self, ticket, key, demands):
+        """Serve ticket if it is first in line and the budget allows; returns seconds to wait (0 when served)"""
+        def attempt(conn, now):
+            conn.execute("UPDATE tickets SET heartbeat = ? WHERE id = ?", (now, ticket))
+            conn.execute("DELETE FROM tickets WHERE heartbeat < ?", (now - _TICKET_STALE_SECONDS,))
+            head = conn.execute("SELECT MIN(id) FROM tickets WHERE key = ?", (key,)).fetchone()[0]
+            if head != ticket:
+                return _QUEUE_POLL_SECONDS
+            wait, levels = self._missing_seconds(conn, now, demands)
+            wait = max(wait, self._paused_seconds(conn, now, key))
+            if wait > 0:
+                return wait
+            self._take(conn, now, demands, levels)
+            conn.execute("DELETE FROM tickets WHERE id = ?", (ticket,))
+            return 0.0
+        return self._transaction(attempt)
+
+    def leave(self, ticket):
+        self._connect().execute("DELETE FROM tickets WHERE id = ?", (ticket,))
+
+    def paused_seconds(self, key):
+        """Seconds left on a pause of key (0 when it is not paused); a plain read, no write lock"""
+        return self._paused_seconds(self._connect(), time.time(), key)
+
+    def pause(self, key, seconds):
+        """Serve nobody on key for `seconds`, whatever its budgets (an extended pause is never shortened)"""
+        def apply(conn, now):
+            conn.execute(
+                "INSERT INTO pauses (key, until) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET until = MAX(until, excluded.until)", (key, now + seconds)
+            )
+        self._transaction(apply)
+
+
+class SharedRateLimit:
+    """Requests-per-minute and tokens-per-minute budgets for one key (e.g. "groq:llama3-8b-8192").
+
+    The buckets live in a RateLimitStore, so every thread and worker process
+    on the host draws from the same budget, and callers that have to wait are
+    served strictly in arrival order instead of being rejected. A limit of 0
+    disables that bucket; a pause holds the key back even when both are 0.
+    """
+
+    def __init__(self, key, rpm=0, tpm=0, store=None, burst_seconds=RATE_LIMIT_BURST_SECONDS):
+        self.key = key
+        self.rpm = rpm
+        self.tpm = tpm
+        self.store = store or get_rate_limit_store()
+        self.burst_seconds = burst_seconds
+
+    def _demands(self, tokens):
+        demands = []
+        for suffix, per_minute, amount in (("requests", self.rpm, 1), ("tokens", self.tpm, tokens)):
+            if per_minute > 0 and amount > 0:
+                capacity = max(1.0, per_minute * self.burst_seconds / 60.0)
+                # A single oversized request is let through once the bucket is full rather than never
+                demands.append((f"{self.key}:{suffix}", min(amount, capacity), per_minute / 60.0, capacity))
+        return demands
+
+    def acquire(self, tokens=0, timeout=None, cancel=None):
+        """Wait in line for one request of `tokens` tokens; False on timeout or when cancel is set"""
+        demands = self._demands(tokens)
+        if not demands and self.store.paused_seconds(self.key) <= 0:
+            return True
+        served, _ = self.store.try_take(self.key, demands)
+        if served:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = self.store.enqueue(self.key)
+        try:
+            while True:
+                wait = self.store.take_in_turn(ticket, self.key, demands)
+                if wait <= 0:
+                    ticket = None
+                    return True
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                wait = min(wait, _HEAD_POLL_SECONDS)
+                if cancel is not None:
+                    if cancel.wait(wait):
+                        return False
+                else:
+                    time.sleep(wait)
+        finally:
+            if ticket is not None:
+                self.store.leave(ticket)
+
+    async def aacquire(self, tokens=0, timeout=None):
+        """acquire for coroutines: waits with asyncio.sleep, and the SQLite steps (which may
+        block on a busy database) run in a worker thread, so the event loop is never held up"""
+        demands = self._demands(tokens)
+        if not demands and await asyncio.to_thread(self.store.paused_seconds, self.key) <= 0:
+            return True
+        served, _ = await asyncio.to_thread(self.store.try_take, self.key, demands)
+        if served:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = await asyncio.to_thread(self.store.enqueue, self.key)
+        try:
+            while True:
+                wait = await asyncio.to_thread(self.store.take_in_turn, ticket, self.key, demands)
+                if wait <= 0:
+                    ticket = None
+                    return True
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                await asyncio.sleep(min(wait, _HEAD_POLL_SECONDS))
+        finally:
+            if ticket is not None:
+                await asyncio.to_thread(self.store.leave, ticket)
+
+    def pause(self, seconds):
+        """Stop serving this key for a while (e.g. the model is loading or the provider said 429)"""
+        self.store.pause(self.key, seconds)
+
+
+_default_store = None
+_store_lock = threading.Lock()
+_limits = {}
+
+
+def get_rate_limit_store():
+    """Process-wide RateLimitStore on RATE_LIMIT_DB"""
+    global _default_store
+    if _default_store is None:
+        with _store_lock:
+            if _default_store is None:
+                _default_store = RateLimitStore()
+    return _default_store
+
+
+def get_rate_limit(key, rpm=0, tpm=0):
+    """SharedRateLimit for key with the given budgets, reused across calls"""
+    limit = _limits.get((key, rpm, tpm))
+    if limit is None:
+        with _buckets_lock:
+            limit = _limits.setdefault((key, rpm, tpm), SharedRateLimit(key, rpm, tpm))
+    return limit
@@ -1,4 +1,154 @@
+import asyncio
+import contextlib
+import contextvars
+import os
 import random
+import time
+
+from utils.errors import ProviderTimeoutError, classify_exception
+
+# Total time one request may spend on a provider, across every retry
+RETRY_DEADLINE = float(os.getenv("RETRY_DEADLINE", "60"))
+# Server hints longer than this are not waited out; the caller falls back instead
+RETRY_MAX_HINT = float(os.getenv("RETRY_MAX_HINT", "30"))
+# Upper bound for a single attempt (same setting as the provider clients' timeout)
+ATTEMPT_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", "60"))
+
+# Transient error kinds worth another attempt at the same provider. Unclassified errors
+# (missing SDK, malformed response) fail fast so the fallback chain can move on
+RETRYABLE_KINDS = ("server", "timeout", "rate_limit")
+
 
 def get_retry_delay(attempt, base_delay=5, max_delay=60):
     return min(base_delay * (2 ** attempt) + random.uniform(0, 1), max_delay)
+
+
+class Deadline:
+    """Absolute time budget shared by every attempt of one request"""
+
+    def __init__(self, seconds=RETRY_DEADLINE):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap):
+        """Per-attempt timeout: the cap, or less when the budget is nearly spent"""
+        return max(0.001, min(cap, self.remaining()))
+
+
+# Deadline of the request being served, shared by every provider call made on its behalf
+_active_deadline = contextvars.ContextVar("active_deadline", default=None)
+
+
+@contextlib.contextmanager
+def deadline_scope(deadline):
+    """Make deadline the default for every RetryPolicy call in this thread or task"""
+    token = _active_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _active_deadline.reset(token)
+
+
+def server_hint(response):
+    """Seconds the server asked us to wait: Retry-After, or HF's estimated_time while a model loads"""
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        pass
+    if response.status_code == 503:
+        try:
+            return float(response.json().get("estimated_time"))
+        except Exception:
+            return None
+    return None
+
+
+class RetryPolicy:
+    """Which errors to retry, how long to wait between attempts and when to give up.
+
+    Delays use decorrelated jitter (each delay is drawn between base_delay and
+    three times the previous one, capped at max_delay), so many workers
+    retrying the same provider spread out instead of hitting it in lockstep.
+    A server hint (Retry-After, HF estimated_time) replaces the jittered
+    delay; a hint beyond max_hint, or a wait that would overrun the deadline, ends the
+    retries at once so the caller can fall back to another provider.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=20.0,
+                 retry_kinds=RETRYABLE_KINDS, max_hint=RETRY_MAX_HINT,
+                 deadline=RETRY_DEADLINE, attempt_timeout=ATTEMPT_TIMEOUT):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_kinds = retry_kinds
+        self.max_hint = max_hint
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+
+    def next_delay(self, error, attempt, previous_delay, deadline):
+        """Seconds to sleep before the next attempt, or None to stop retrying"""
+        if error.kind not in self.retry_kinds or attempt + 1 >= self.max_attempts:
+            return None
+        hint = error.retry_after
+        if hint is not None and hint > self.max_hint:
+            return None
+        if hint is not None:
+            # The server knows best; a little jitter keeps waiting workers from returning together
+            delay = hint + random.uniform(0, self.base_delay)
+        else:
+            delay = min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3)))
+        if delay >= deadline.remaining():
+            return None
+        return delay
+
+    def call(self, fn, provider=None, model=None, deadline=None, on_retry=None):
+        """Run fn(timeout) until it succeeds or the policy gives up; raises the typed ProviderError.
+
+        Without a deadline the one from deadline_scope is used, else a fresh one.
+        """
+        deadline = deadline or _active_deadline.get() or Deadline(self.deadline)
+        delay = self.base_delay
+        for attempt in range(self.max_attempts):
+            if deadline.expired():
+                raise ProviderTimeoutError("Request deadline exceeded", provider=provider, model=model)
+            try:
+                return fn(deadline.timeout(self.attempt_timeout))
+            except Exception as e:
+                error = classify_exception(e, provider, model)
+                delay = self.next_delay(error, attempt, delay, deadline)
+                if delay is None:
+                    raise error from e
+                if on_retry:
+                    on_retry(error, delay)
+                time.sleep(delay)
+
+    async def acall(self, fn, provider=None, model=None, deadline=None, on_retry=None):
+        """call for coroutines: fn(timeout) returns an awaitable"""
+        deadline = deadline or _active_deadline.get() or Deadline(self.deadline)
+        delay = self.base_delay
+        for attempt in range(self.max_attempts):
+            if deadline.expired():
+                raise ProviderTimeoutError("Request deadline exceeded", provider=provider, model=model)
+            try:
+                return await fn(deadline.timeout(self.attempt_timeout))
+            except Exception as e:
+                error = classify_exception(e, provider, model)
+                delay = self.next_delay(error, attempt, delay, deadline)
+                if delay is None:
+                    raise error from e
+                if on_retry:
+                    on_retry(error, delay)
+                await asyncio.sleep(delay)
+
+
+# Text agents: a couple of quick retries, then let the fallback chain take over
+TEXT_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=10.0, max_hint=10.0)
+# Vision and image models are slower and often cold, so they may wait out a model load
+MEDIA_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=20.0, deadline=90.0)
@@ -0,0 +1,381 @@
+"""Reuse plans for near-duplicate trip requests.
+
+"7 days in Kyoto, $2000, temples and food" and "one week Kyoto trip, 2k
+budget, food + temples" never share an exact cache key. Here a request is
+reduced to hard filters (destination, length, month, party size, currency,
+budget band, graph mode) plus a hashed character n-gram vector of its
+remaining words. Things the request asks to avoid ("no temples", "skip the
+nightlife") are a hard filter of their own, so "avoid temples, focus on food"
+never reuses the plan for "temples and food". A stored plan is reused when
+every filter matches and the cosine similarity of the vectors reaches the
+threshold.
+
+Off unless SEMANTIC_CACHE=on: reusing another traveller's plan is a product
+decision, and the threshold should be checked against real traffic first.
+
+Entries live in SQLite next to the response cache so every process on the
+host shares them; each process keeps a NumPy copy of the vectors and filters
+and only reads rows added since its last lookup.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from utils.cache import CACHE_DIR, CACHE_ENABLED
+from utils.destination_extractor import extract_destination
+from utils.gazetteer import normalize_place
+from utils.metrics import SEMANTIC_CACHE_LOOKUPS, SEMANTIC_SIMILARITY
+from utils.trip_request import (
+    DEFAULT_CURRENCY, MONTHS, NUMBER_WORDS, parse_budget, parse_days, parse_month, parse_travelers
+)
+
+SEMANTIC_CACHE_ENABLED = CACHE_ENABLED and os.getenv("SEMANTIC_CACHE", "off").lower() in ("1", "on", "true")
+# Cosine similarity at which a stored plan is reused (see benchmarks/bench_semantic_cache.py)
+SEMANTIC_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.6"))
+# Stated budgets this close (as a fraction of the larger one) count as the same budget band
+SEMANTIC_BUDGET_TOLERANCE = float(os.getenv("SEMANTIC_BUDGET_TOLERANCE", "0.15"))
+SEMANTIC_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", str(7 * 24 * 3600)))
+SEMANTIC_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+EMBEDDING_DIM = 2048
+NGRAM_SIZES = (3, 4, 5)
+
+# Words that say nothing about what kind of trip is wanted, including the Smart Form's boilerplate.
+# Numbers, months and the destination are covered by the hard filters instead
+STOPWORDS = frozenset("""
+a an and or the to of in on at for with from by into about around as is are be it its this that
+i im me my we our us you your want wanna would like love looking plan planning go going visit visiting
+trip trips travel traveling travelling vacation holiday holidays tour days day week weeks nights night
+weekend budget total people person persons travelers travellers adults per k usd eur gbp jpy aud cad lkr
+inr dollars euros pounds yen rupees please create comprehensive including daily itinerary breakdown
+booking recommendations details destination duration interests additional requirements specified
+no some also just more than too much very really interested fan big
+""".split()) | frozenset(NUMBER_WORDS) | frozenset(MONTHS) | frozenset(m[:3] for m in MONTHS)
+
+_WORD = re.compile(r"[a-z]+")
+# A negation cue and the rest of its clause: everything in it is something the traveller does not want
+_NEGATED = re.compile(
+    r"\b(?:avoid(?:ing)?|no|not|without|skip(?:ping)?|except|excluding|hate|dislike|don'?t|never)\b"
+    r"(.*?)(?=[,;.!?:()]|\b(?:but|focus|instead|rather|prefer|just|only)\b|$)"
+)
+# Hard filters and their column in a semantic_entries row as _sync selects it
+_FILTERS = {"destination": 1, "days": 2, "month": 3, "travelers": 4, "currency": 5, "mode": 7, "avoid": 11}
+_CODED = ("destination", "currency", "mode", "avoid")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS semantic_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    destination TEXT NOT NULL,
+    days INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    travelers INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    budget REAL,
+    mode TEXT NOT NULL,
+    request TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    avoid TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS semantic_stats (
+    outcome TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _words(text):
+    """Descriptive words of normalized text, with a plural s dropped"""
+    for word in _WORD.findall(text):
+        if word in STOPWORDS:
+            continue
+        yield word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+def _split_negated(text, destination=None):
+    """(normalized text without negated clauses, sorted words of those clauses)"""
+    normalized = normalize_place(text)
+    if destination:
+        normalized = normalized.replace(normalize_place(destination), " ")
+    avoided = set()
+    for match in _NEGATED.finditer(normalized):
+        avoided.update(_words(match.group(1)))
+    return _NEGATED.sub(" ", normalized), sorted(avoided)
+
+
+def request_filters(text, mode):
+    """Hard-filter values for a request, or None when its destination or length is unknown"""
+    destination = extract_destination(text)
+    days = parse_days(text)
+    if not destination or not days:
+        return None
+    amount, currency = parse_budget(text)
+    _, avoided = _split_negated(text, destination)
+    return {
+        "destination": destination.lower(),
+        "days": days,
+        "month": parse_month(text) or 0,
+        "travelers": parse_travelers(text) or 1,
+        "currency": currency or DEFAULT_CURRENCY,
+        "budget": amount,
+        "mode": mode,
+        "avoid": " ".join(avoided),
+    }
+
+
+def _features(text, destination=None):
+    wanted, _ = _split_negated(text, destination)
+    for word in _words(wanted):
+        yield "w:" + word
+        padded = f"<{word}>"
+        for size in NGRAM_SIZES:
+            for i in range(len(padded) - size + 1):
+                yield padded[i:i + size]
+
+
+def embed(text, destination=None, dim=EMBEDDING_DIM):
+    """Unit-length hashed n-gram vector of the request's descriptive words outside negated
+    clauses (all zeros if it has none)"""
+    hashes = np.array([zlib.crc32(f.encode("utf-8")) for f in _features(text, destination)], dtype=np.int64)
+    if hashes.size == 0:
+        return np.zeros(dim, dtype=np.float32)
+    # Low bits pick the bucket, bit 31 the sign, so collisions cancel out instead of piling up
+    signs = np.where(hashes >> 31, -1.0, 1.0)
+    vector = np.bincount(hashes % dim, weights=signs, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def similarity(a, b):
+    """Cosine similarity of two embed() vectors; two requests with no descriptive words are identical"""
+    if not a.any() and not b.any():
+        return 1.0
+    return float(a @ b)
+
+
+class _Index:
+    """In-memory columns of every entry this process has seen"""
+
+    def __init__(self, dim):
+        self.last_id = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.empty = np.zeros(0, dtype=bool)
+        self.budget = np.zeros(0)
+        self.created = np.zeros(0)
+        self.columns = {name: np.zeros(0, dtype=np.int64) for name in _FILTERS}
+        # String filter values are compared as integer codes
+        self.codes = {}
+
+    def code(self, value):
+        return self.codes.setdefault(value, len(self.codes))
+
+    def append(self, rows, dim):
+        self.ids = np.concatenate([self.ids, [row[0] for row in rows]])
+        vectors = np.frombuffer(b"".join(row[9] for row in rows), dtype=np.float32).reshape(len(rows), dim)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.empty = np.concatenate([self.empty, ~vectors.any(axis=1)])
+        self.budget = np.concatenate([self.budget, [np.nan if row[6] is None else row[6] for row in rows]])
+        self.created = np.concatenate([self.created, [row[10] for row in rows]])
+        for name, column in _FILTERS.items():
+            values = [row[column] for row in rows]
+            if name in _CODED:
+                values = [self.code(value) for value in values]
+            self.columns[name] = np.concatenate([self.columns[name], values])
+        self.last_id = int(self.ids[-1])
+
+
+class SemanticCache:
+    """Similarity lookup of earlier plans, shared through SQLite by every process on the host"""
+
+    def __init__(self, path=None, threshold=SEMANTIC_THRESHOLD, ttl=SEMANTIC_TTL,
+                 max_entries=SEMANTIC_MAX_ENTRIES, budget_tolerance=SEMANTIC_BUDGET_TOLERANCE,
+                 dim=EMBEDDING_DIM):
+        self.path = path or os.path.join(CACHE_DIR, "semantic.sqlite3")
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.budget_tolerance = budget_tolerance
+        self.dim = dim
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._index = _Index(dim)
+
+    def _connect(self):
+        # sqlite3 connections must not cross threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            if not self._has_avoid(conn):
+                # Entries from before the avoid filter embedded negated words too; they cannot be compared.
+                # Checked again under the write lock so a table another process just rebuilt survives
+                conn.execute("BEGIN IMMEDIATE")
+                if not self._has_avoid(conn):
+                    conn.execute("DROP TABLE semantic_entries")
+                conn.execute("COMMIT")
+                conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _has_avoid(conn):
+        return "avoid" in {row[1] for row in conn.execute("PRAGMA table_info(semantic_entries)")}
+
+    def _sync(self, conn):
+        """Pull entries other processes added since the last lookup"""
+        rows = conn.execute(
+            "SELECT id, destination, days, month, travelers, currency, budget, mode, request, vector, created_at, "
+            "avoid FROM semantic_entries WHERE id > ? ORDER BY id", (self._index.last_id,)
+        ).fetchall()
+        if rows:
+            self._index.append(rows, self.dim)
+
+    def _count(self, conn, outcome):
+        SEMANTIC_CACHE_LOOKUPS.inc(outcome=outcome)
+        conn.execute(
+            "INSERT INTO semantic_stats (outcome, count) VALUES (?, 1) "
+            "ON CONFLICT(outcome) DO UPDATE SET count = count + 1", (outcome,)
+        )
+
+    def _candidates(self, filters):
+        index = self._index
+        mask = index.created >= time.time() - self.ttl
+        for name in _FILTERS:
+            value = filters[name]
+            if name in _CODED:
+                value = index.codes.get(value, -1)
+            mask &= index.columns[name] == value
+        if filters["budget"] is None:
+            mask &= np.isnan(index.budget)
+        else:
+            budget = filters["budget"]
+            with np.errstate(invalid="ignore"):
+                mask &= np.abs(index.budget - budget) <= self.budget_tolerance * np.maximum(index.budget, budget)
+        return np.flatnonzero(mask)
+
+    def lookup(self, text, mode):
+        """(result, match) for the closest earlier plan above the threshold, or None.
+
+        match holds the similarity, the earlier request and its entry id.
+        """
+        filters = request_filters(text, mode)
+        conn = self._connect()
+        if filters is None:
+            self._count(conn, "uncacheable")
+            return None
+        query = embed(text, filters["destination"], self.dim)
+        with self._lock:
+            self._sync(conn)
+            candidates = self._candidates(filters)
+            if candidates.size == 0:
+                best_id, score = None, None
+            else:
+                index = self._index
+                if query.any():
+                    scores = index.vectors[candidates] @ query
+                else:
+                    scores = index.empty[candidates].astype(np.float32)
+                best = int(np.argmax(scores))
+                best_id, score = int(index.ids[candidates[best]]), float(scores[best])
+        if score is not None:
+            SEMANTIC_SIMILARITY.observe(score)
+        if score is None or score < self.threshold:
+            self._count(conn, "miss")
+            return None
+        row = conn.execute("SELECT request, result FROM semantic_entries WHERE id = ?", (best_id,)).fetchone()
+        if row is None:
+            # Evicted by another process; start the local index over on the next lookup
+            with self._lock:
+                self._index = _Index(self.dim)
+            self._count(conn, "miss")
+            return None
+        self._count(conn, "hit")
+        return json.loads(row[1]), {"similarity": round(score, 3), "matched_request": row[0], "entry_id": best_id}
+
+    def store(self, text, mode, result):
+        """Remember a finished plan; requests without a known destination and length are skipped"""
+        filters = request_filters(text, mode)
+        if filters is None:
+            return False
+        vector = embed(text, filters["destination"], self.dim)
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO semantic_entries (destination, days, month, travelers, currency, budget, mode, "
+                "request, vector, result, created_at, avoid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (filters["destination"], filters["days"], filters["month"], filters["travelers"],
+                 filters["currency"], filters["budget"], mode, text, vector.tobytes(),
+                 json.dumps(result, ensure_ascii=False), now, filters["avoid"])
+            )
+            conn.execute("DELETE FROM semantic_entries WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM semantic_entries WHERE id <= "
+                "(SELECT id FROM semantic_entries ORDER BY id DESC LIMIT 1 OFFSET ?)", (self.max_entries,)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM semantic_entries")
+        conn.execute("DELETE FROM semantic_stats")
+        with self._lock:
+            self._index = _Index(self.dim)
+
+    def stats(self):
+        """Lookup outcomes, hit rate over cacheable lookups and the number of stored plans"""
+        conn = self._connect()
+        counts = dict(conn.execute("SELECT outcome, count FROM semantic_stats").fetchall())
+        hits, misses = counts.get("hit", 0), counts.get("miss", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "uncacheable": counts.get("uncacheable", 0),
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "entries": conn.execute("SELECT COUNT(*) FROM semantic_entries").fetchone()[0],
+            "threshold": self.threshold,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Process-wide SemanticCache instance"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = SemanticCache()
+    return _default_cache
+
+
+def adapt_result(result, text, match):
+    """An earlier plan re-addressed to the new request, with a note saying where it came from"""
+    adapted = dict(result)
+    adapted["input"] = text
+    adapted["errors"] = {}
+    adapted["cache"] = match
+    if adapted.get("planner_output"):
+        adapted["planner_output"] = (
+            f"> ♻️ Reused the plan for a very similar request ({match['similarity']:.0%} match): "
+            f"*{' '.join(match['matched_request'].split())[:160]}*\n\n{adapted['planner_output']}"
+        )
+    return adapted
@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils.cache import CACHE_ENABLED, file_digest, get_cache, make_key
+
+# Worker settings
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_PROCESSES = int(os.getenv("WHISPER_PROCESSES", "1"))
+WHISPER_MAX_PENDING = int(os.getenv("WHISPER_MAX_PENDING", "4"))
+WHISPER_IDLE_UNLOAD = float(os.getenv("WHISPER_IDLE_UNLOAD", "600"))
+
+# Set inside each worker process by _load_model
+_model = None
+
+
+def _load_model(model_size, threads=None):
+    global _model
+    import whisper
+    if threads:
+        # Keep several worker processes from oversubscribing the CPU cores
+        import torch
+        torch.set_num_threads(threads)
+    _model = whisper.load_model(model_size)
+
+
+def _transcribe(audio):
+    """Runs in the worker process; audio is a file path or a 16 kHz float32 array"""
+    return _model.transcribe(audio)["text"]
+
+
+def _ping():
+    return True
+
+
+class TranscriptionQueueFull(Exception):
+    """Too many transcriptions are already waiting for the worker"""
+
+
+class TranscriptionWorker:
+    """Whisper kept resident in a separate process, unloaded again after an idle period"""
+
+    def __init__(self, model_size=WHISPER_MODEL, processes=WHISPER_PROCESSES,
+                 max_pending=WHISPER_MAX_PENDING, idle_unload=WHISPER_IDLE_UNLOAD, threads=None):
+        self.model_size = model_size
+        self.processes = processes
+        self.threads = threads
+        self.idle_unload = idle_unload
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._in_flight = 0
+        self._last_used = time.monotonic()
+        self._watcher = None
+
+    def _ensure_pool(self):
+        """The pool, started if needed; call with self._lock held"""
+        if self._pool is None:
+            # spawn keeps torch out of a forked copy of the Streamlit process
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_model,
+                initargs=(self.model_size, self.threads),
+            )
+            if self.idle_unload and self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch_idle, name="whisper-idle", daemon=True)
+                self._watcher.start()
+        return self._pool
+
+    def _watch_idle(self):
+        while True:
+            time.sleep(min(30.0, self.idle_unload))
+            with self._lock:
+                idle = self._in_flight == 0 and time.monotonic() - self._last_used > self.idle_unload
+                if self._pool is not None and idle:
+                    # Shutting the pool down frees the model with its process
+                    self._pool.shutdown(wait=False)
+                    self._pool = None
+
+    def _done(self, key, future):
+        with self._lock:
+            self._in_flight -= 1
+            self._last_used = time.monotonic()
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                # A crashed worker (e.g. out of memory) gets a fresh pool on the next submit
+                self._pool = None
+        self._slots.release()
+        if key is not None and CACHE_ENABLED and not future.cancelled() and future.exception() is None:
+            get_cache().set("transcription", key, future.result())
+
+    def submit_array(self, audio, cache_key=None):
+        """Queue a decoded 16 kHz mono array; raises TranscriptionQueueFull when the queue is full"""
+        return self._submit(audio, cache_key)
+
+    def submit(self, audio_path):
+        """Queue an audio file; identical content is answered from the cache immediately"""
+        key = make_key(file_digest(audio_path), self.model_size)
+        if CACHE_ENABLED:
+            cached = get_cache().get("transcription", key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+        return self._submit(audio_path, key)
+
+    def _submit(self, audio, key):
+        if not self._slots.acquire(blocking=False):
+            raise TranscriptionQueueFull("Transcription queue is full, please try again shortly")
+        counted = False
+        try:
+            # One lock hold, so the idle watcher cannot shut the pool down between
+            # handing it out and counting this job as in flight
+            with self._lock:
+                pool = self._ensure_pool()
+                self._in_flight += 1
+                self._last_used = time.monotonic()
+                counted = True
+            future = pool.submit(_transcribe, audio)
+        except Exception:
+            if counted:
+                with self._lock:
+                    self._in_flight -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    def transcribe(self, audio_path, timeout=None):
+        return self.submit(audio_path).result(timeout=timeout)
+
+    def warm_up(self):
+        """Start the worker and load the model in the background"""
+        if self._pool is None:
+            with self._lock:
+                pool = self._ensure_pool()
+                self._last_used = time.monotonic()
+            pool.submit(_ping)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_transcription_worker():
+    """Process-wide TranscriptionWorker"""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = TranscriptionWorker()
+    return _worker
@@ -0,0 +1,124 @@
+"""Facts pulled from a free-text trip request: length, party size, budget and travel style."""
+import os
+import re
+
+# Currency assumed for amounts given without one ("2k budget")
+DEFAULT_CURRENCY = os.getenv("BUDGET_CURRENCY", "USD")
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fourteen": 14, "fifteen": 15,
+    "twenty": 20, "thirty": 30,
+}
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "₹": "INR"}
+# ISO codes taken as a currency when the caller does not pass its own set
+CURRENCY_CODES = frozenset(
+    "AED ARS AUD BRL CAD CHF CLP CNY COP CZK DKK EGP EUR GBP HKD HUF IDR INR ISK JPY KES KRW LKR MAD MXN "
+    "MYR NOK NPR NZD PEN PHP PLN SEK SGD THB TRY TWD USD VND ZAR".split()
+)
+CURRENCY_WORDS = {"dollars": "USD", "bucks": "USD", "euros": "EUR", "pounds": "GBP", "yen": "JPY", "rupees": "INR"}
+TIER_WORDS = {
+    "budget": ("backpack", "hostel", "cheap", "shoestring", "low budget", "low-cost", "budget travel"),
+    "luxury": ("luxury", "luxurious", "five-star", "5-star", "premium", "high-end"),
+}
+
+MONTHS = ("january", "february", "march", "april", "may", "june", "july", "august", "september",
+          "october", "november", "december")
+
+# Anchored so number words inside other words ("extra", "often", "someone") do not count
+_COUNT = r"\b(\d+|" + "|".join(NUMBER_WORDS) + r")"
+_DAYS = re.compile(_COUNT + r"[\s-]*(days?|nights?|weeks?)\b", re.IGNORECASE)
+_WEEKEND = re.compile(r"\bweekend\b", re.IGNORECASE)
+_TRAVELERS = re.compile(_COUNT + r"\s+(?:people|persons|travell?ers|adults|guests|friends|of us)\b", re.IGNORECASE)
+_FAMILY = re.compile(r"\b(?:family|group|party) of " + _COUNT + r"\b", re.IGNORECASE)
+_COUPLE = re.compile(r"\b(?:couple|honeymoon|my (?:wife|husband|partner|girlfriend|boyfriend))\b", re.IGNORECASE)
+_SOLO = re.compile(r"\b(?:solo|alone|by myself)\b", re.IGNORECASE)
+# "May" only counts when capitalised ("in May", not "I may go"); the rest in any case
+_MONTH = re.compile(r"\b(?:(" + "|".join(m for m in MONTHS if m != "may") + r")|(May))\b"
+                    r"|\b(Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)\b", re.IGNORECASE)
+_AMOUNT = r"(\d[\d,]*(?:\.\d+)?)\s?(k\b)?"
+_MONEY_BEFORE = re.compile(r"([$€£¥₹]|\b[A-Z]{3}\b)\s?" + _AMOUNT)
+_MONEY_AFTER = re.compile(_AMOUNT + r"\s?([A-Z]{3}\b|dollars|bucks|euros|pounds|yen|rupees)", re.IGNORECASE)
+_BARE_BUDGET = re.compile(r"budget(?: of| is|:)?\s*(?:about|around|roughly|~)?\s*" + _AMOUNT
+                          + r"|" + _AMOUNT + r"\s*budget", re.IGNORECASE)
+
+
+def _count(word):
+    word = word.lower()
+    return int(word) if word.isdigit() else NUMBER_WORDS.get(word)
+
+
+def _money(amount, thousands):
+    value = float(amount.replace(",", ""))
+    return value * 1000 if thousands else value
+
+
+def parse_days(text):
+    """Trip length in days ("7 days", "one week", "6 nights"), or None"""
+    match = _DAYS.search(text or "")
+    if match:
+        count, unit = _count(match.group(1)), match.group(2).lower()
+        if unit.startswith("week"):
+            return count * 7
+        return count + 1 if unit.startswith("night") else count
+    return 2 if _WEEKEND.search(text or "") else None
+
+
+def parse_travelers(text):
+    """Party size ("for 2 people", "family of four", "honeymoon"), or None"""
+    text = text or ""
+    match = _TRAVELERS.search(text) or _FAMILY.search(text)
+    if match:
+        return _count(match.group(1))
+    if _COUPLE.search(text):
+        return 2
+    return 1 if _SOLO.search(text) else None
+
+
+def parse_budget(text, currencies=None):
+    """(amount, ISO currency or None) of the stated budget, or (None, None).
+
+    currencies is the set of codes accepted after or before an amount (CURRENCY_CODES
+    by default) so that words like "day" in "7 day trip" are not mistaken for one.
+    """
+    text = text or ""
+    currencies = CURRENCY_CODES if currencies is None else currencies
+
+    def known(code):
+        return code in currencies
+
+    for match in _MONEY_BEFORE.finditer(text):
+        code = CURRENCY_SYMBOLS.get(match.group(1), match.group(1))
+        if known(code):
+            return _money(match.group(2), match.group(3)), code
+    for match in _MONEY_AFTER.finditer(text):
+        word = match.group(3)
+        code = CURRENCY_WORDS.get(word.lower(), word.upper())
+        if known(code):
+            return _money(match.group(1), match.group(2)), code
+    match = _BARE_BUDGET.search(text)
+    if match:
+        amount, thousands = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+        return _money(amount, thousands), None
+    return None, None
+
+
+def parse_month(text):
+    """Month of travel (1-12) from the first month named in the request, or None"""
+    for match in _MONTH.finditer(text or ""):
+        if match.group(1):
+            return MONTHS.index(match.group(1).lower()) + 1
+        if match.group(2) == "May":
+            return 5
+        if match.group(3) and match.group(3)[0].isupper():
+            return [m[:3] for m in MONTHS].index(match.group(3)[:3].lower()) + 1
+    return None
+
+
+def parse_tier(text):
+    """"budget" or "luxury" when the request asks for that style of travel, else None"""
+    lowered = (text or "").lower()
+    for tier, words in TIER_WORDS.items():
+        if any(word in lowered for word in words):
+            return tier
+    return None
@@ -0,0 +1,223 @@
+"""Plan trips in bulk from a JSONL file without the Streamlit app.
+
+Each input line is a JSON object with an "input" request text and an
+optional "id". Run from Agent_AI/:
+
+    python -m workflows.batch_planner requests.jsonl plans.jsonl --concurrency 8 --rpm groq=30
+
+--budgeter-mode local costs every plan with the offline cost model instead
+of a third LLM call per request.
+
+Results are appended to the output file one line per request as soon as
+they finish, so the output doubles as the checkpoint: running the same
+command again skips every id that already has a successful result and
+retries the ones that failed. A throughput and error summary is printed
+to stderr at the end (and every --progress-every requests).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from agents.fallback import PROVIDER_KEYS, set_provider_rpm, set_provider_tpm
+from utils.cache import make_key, normalize_prompt
+from utils.providers import ensure_env
+from workflows.trip_graph import (
+    BUDGETER_MODE, BUDGETER_MODES, GRAPH_MODES, DEFAULT_GRAPH_MODE, aplan_trip, set_budgeter_mode
+)
+
+OUTPUT_KEYS = ("planner_output", "budgeter_output", "booking_output", "itinerary")
+
+
+def request_id(request):
+    """The request's own id, or a stable hash of its text so ids survive reruns"""
+    if request.get("id") is not None:
+        return str(request["id"])
+    return make_key(normalize_prompt(request["input"]))[:16]
+
+
+def completed_ids(output_path):
+    """Ids that already have a successful result in the output file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run; that request is simply redone
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+            else:
+                done.discard(record.get("id"))
+    return done
+
+
+def read_requests(input_path):
+    """Yield (line number, request dict) lazily; malformed lines are reported and skipped"""
+    with open(input_path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"line {number}: invalid JSON ({e})", file=sys.stderr)
+                continue
+            if not isinstance(request, dict) or not request.get("input"):
+                print(f"line {number}: missing \"input\"", file=sys.stderr)
+                continue
+            yield number, request
+
+
+class BatchStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self.latencies = []
+        self.errors = {}
+
+    def record(self, record):
+        if record["status"] == "ok":
+            self.ok += 1
+            self.latencies.append(record["seconds"])
+        else:
+            self.failed += 1
+            for node in record.get("errors") or {"exception": None}:
+                self.errors[node] = self.errors.get(node, 0) + 1
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        latencies = sorted(self.latencies)
+        finished = self.ok + self.failed
+
+        def pct(q):
+            return latencies[min(len(latencies) - 1, int(q / 100 * len(latencies)))] if latencies else None
+
+        return {
+            "finished": finished,
+            "ok": self.ok,
+            "failed": self.failed,
+            "skipped_already_done": self.skipped,
+            "elapsed_s": round(elapsed, 1),
+            "plans_per_minute": round(finished / elapsed * 60, 2) if elapsed else None,
+            "latency_p50_s": pct(50),
+            "latency_p95_s": pct(95),
+            "errors_by_node": self.errors,
+        }
+
+
+async def plan_one(request, mode):
+    start = time.perf_counter()
+    try:
+        result = await aplan_trip({"input": request["input"]}, mode=mode)
+        errors = result.get("errors") or {}
+    except Exception as e:
+        result, errors = {}, {"exception": f"{type(e).__name__}: {e}"}
+    record = {
+        "id": request_id(request),
+        "status": "ok" if result.get("booking_output") and not errors else "error",
+        **{key: result.get(key) for key in OUTPUT_KEYS},
+        "errors": errors,
+        "seconds": round(time.perf_counter() - start, 3),
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    if "meta" in request:
+        record["meta"] = request["meta"]
+    return record
+
+
+async def run_batch(input_path, output_path, concurrency=4, mode=None, limit=None, progress_every=50):
+    """Plan every pending request with at most `concurrency` in flight; returns the summary"""
+    done = completed_ids(output_path)
+    stats = BatchStats()
+    slots = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(task):
+            slots.release()
+            tasks.discard(task)
+            record = task.result()
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            stats.record(record)
+            if progress_every and (stats.ok + stats.failed) % progress_every == 0:
+                print(json.dumps(stats.summary()), file=sys.stderr)
+
+        submitted = 0
+        for _, request in read_requests(input_path):
+            rid = request_id(request)
+            if rid in done:
+                stats.skipped += 1
+                continue
+            if limit is not None and submitted >= limit:
+                break
+            # Requests are read only as fast as slots free up, so huge files stream through
+            await slots.acquire()
+            done.add(rid)
+            task = asyncio.ensure_future(plan_one(request, mode))
+            task.add_done_callback(write)
+            tasks.add(task)
+            submitted += 1
+        if tasks:
+            await asyncio.wait(set(tasks))
+        os.fsync(out.fileno())
+    return stats.summary()
+
+
+def provider_limit_arg(value):
+    """argparse type for PROVIDER=PER_MINUTE; returns (provider, limit)"""
+    name, _, limit = value.partition("=")
+    try:
+        if name in PROVIDER_KEYS:
+            return name, float(limit)
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"expected provider=per_minute with provider one of "
+                                     f"{', '.join(PROVIDER_KEYS)}, got '{value}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of {\"id\": ..., \"input\": ...} requests")
+    parser.add_argument("output", help="JSONL results file; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--mode", choices=GRAPH_MODES, default=DEFAULT_GRAPH_MODE)
+    parser.add_argument("--rpm", action="append", type=provider_limit_arg, default=[], metavar="PROVIDER=RPM",
+                        help="per-provider request budget, e.g. --rpm groq=30 (repeatable)")
+    parser.add_argument("--tpm", action="append", type=provider_limit_arg, default=[], metavar="PROVIDER=TPM",
+                        help="per-provider token budget, e.g. --tpm groq=30000 (repeatable)")
+    parser.add_argument("--budgeter-mode", choices=BUDGETER_MODES, default=BUDGETER_MODE,
+                        help="local costs budgets offline; hybrid has the LLM narrate computed figures")
+    parser.add_argument("--limit", type=int, help="plan at most this many pending requests")
+    parser.add_argument("--progress-every", type=int, default=50)
+    args = parser.parse_args()
+
+    ensure_env()
+    set_budgeter_mode(args.budgeter_mode)
+    for name, rpm in args.rpm:
+        set_provider_rpm(name, rpm)
+    for name, tpm in args.tpm:
+        set_provider_tpm(name, tpm)
+    try:
+        summary = asyncio.run(run_batch(
+            args.input, args.output, args.concurrency, args.mode, args.limit, args.progress_every
+        ))
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    sys.exit(0 if summary["failed"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,421 @@
+import asyncio
+import os
+import queue
+import re
+import threading
+import time
 from langgraph.graph import StateGraph
-from agents.planner import run_planner
-from agents.budgeter import run_budgeter
-from agents.booking import run_booking
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from agents.planner import (
+    run_planner, arun_planner, stream_planner, run_planner_structured, arun_planner_structured
+)
+from agents.cost_model import budget_facts, get_cost_model, render_budget, trip_facts
+from agents.itinerary import (
+    brief, brief_from_markdown, budget_brief, headline, itinerary_from_state, parse_itinerary, render_markdown,
+    summary
+)
+from agents.budgeter import run_budgeter, arun_budgeter, stream_budgeter
+from agents.booking import run_booking, arun_booking, stream_booking
+from utils.errors import ProviderError
+from utils.semantic_cache import SEMANTIC_CACHE_ENABLED, adapt_result, get_semantic_cache
+from utils.metrics import BUDGET_SOURCE, NODE_LATENCY, PLANNER_HANDOFF, PROMPT_CHARS, RESPONSE_CHARS
 from typing import TypedDict, Annotated
 
+def _merge_errors(left, right):
+    return {**(left or {}), **(right or {})}
+
 # Define the state schema
 class TripState(TypedDict):
     input: str
     planner_output: str | None
     budgeter_output: str | None
     booking_output: str | None
+    # Structured plan (Itinerary.to_dict()) when the planner answered in JSON mode
+    itinerary: dict | None
+    # Compact hand-offs read by the downstream agents; the *_output fields are for display
+    planner_brief: str | None
+    budget_brief: str | None
+    # Node name -> error message for nodes that produced no output
+    errors: Annotated[dict, _merge_errors]
+
+# Graph modes:
+#   linear   - Planner -> Budgeter -> Booking (booking sees the budget text)
+#   parallel - Planner fans out to Budgeter and Booking, a Reconcile join merges them
+GRAPH_MODES = ("linear", "parallel")
+DEFAULT_GRAPH_MODE = os.getenv("TRIP_GRAPH_MODE", "linear")
+# Budgeter modes:
+#   llm    - the budgeter agent works out every figure
+#   local  - the offline cost model (agents/cost_model.py) answers without a provider call
+#   hybrid - the cost model computes the figures and the agent only narrates them
+BUDGETER_MODES = ("llm", "local", "hybrid")
+BUDGETER_MODE = os.getenv("BUDGETER_MODE", "llm")
+# Ask the planner for a JSON itinerary first ("0" always uses the markdown planner)
+STRUCTURED_PLANNER = os.getenv("STRUCTURED_PLANNER", "1") != "0"
+
+_BUDGET_TOTAL = re.compile(
+    r"total[^\n]*?((?:[$€£¥₹]|USD|EUR|GBP|JPY|AUD|CAD|LKR|INR|Rs\.?)\s?[\d,]+(?:\.\d+)?(?:\s?(?:-|to)\s?[$€£¥₹]?[\d,]+(?:\.\d+)?)?)",
+    re.IGNORECASE
+)
+
+def _run_agent(node, run, stream, input_text, config):
+    """Run an agent, streaming its tokens to the "emit" callback when one is configured"""
+    emit = (config or {}).get("configurable", {}).get("emit")
+    if emit is None:
+        return run(input_text)
+    emit({"type": "node_start", "node": node})
+    chunks = []
+    for chunk in stream(input_text):
+        chunks.append(chunk)
+        emit({"type": "token", "node": node, "text": chunk})
+    return "".join(chunks)
+
+def _skipped(node, output_key):
+    return {output_key: None, "errors": {node: "Skipped because the previous step produced no output"}}
+
+def _observe_node(node, input_text, output, start):
+    outcome = "ok" if output else "error"
+    NODE_LATENCY.observe(time.perf_counter() - start, node=node, outcome=outcome)
+    PROMPT_CHARS.observe(len(input_text), node=node)
+    if output:
+        RESPONSE_CHARS.observe(len(output), node=node)
+
+def _agent_update(node, output_key, run, stream, input_text, config):
+    """State update for one agent node; provider failures are recorded instead of raised"""
+    if not input_text:
+        NODE_LATENCY.observe(0.0, node=node, outcome="skipped")
+        return _skipped(node, output_key)
+    start = time.perf_counter()
+    try:
+        output = _run_agent(node, run, stream, input_text, config)
+    except ProviderError as e:
+        _observe_node(node, input_text, None, start)
+        return {output_key: None, "errors": {node: str(e)}}
+    _observe_node(node, input_text, output, start)
+    return {output_key: output}
+
+async def _aagent_update(node, output_key, arun, input_text):
+    if not input_text:
+        NODE_LATENCY.observe(0.0, node=node, outcome="skipped")
+        return _skipped(node, output_key)
+    start = time.perf_counter()
+    try:
+        output = await arun(input_text)
+    except ProviderError as e:
+        _observe_node(node, input_text, None, start)
+        return {output_key: None, "errors": {node: str(e)}}
+    _observe_node(node, input_text, output, start)
+    return {output_key: output}
+
+def _structured_update(text):
+    """Planner update from a JSON-mode answer, or None when it is missing or does not validate"""
+    if text is None:
+        return None
+    itinerary = parse_itinerary(text)
+    if itinerary is None:
+        PLANNER_HANDOFF.inc(source="invalid_json")
+        return None
+    PLANNER_HANDOFF.inc(source="json")
+    return {"planner_output": render_markdown(itinerary), "itinerary": itinerary.to_dict(),
+            "planner_brief": brief(itinerary)}
+
+def _markdown_update(update):
+    if update.get("planner_output"):
+        PLANNER_HANDOFF.inc(source="markdown")
+        update["planner_brief"] = brief_from_markdown(update["planner_output"])
+    return update
+
+def _planner_handoff(state):
+    return state.get("planner_brief") or state["planner_output"]
+
+def _trip_context(state):
+    """The request plus where and how long: booking picks flights and stays, not activities"""
+    if not state["planner_output"]:
+        return None
+    if state.get("itinerary"):
+        trip = summary(itinerary_from_state(state["itinerary"]))
+    else:
+        trip = headline(state["planner_output"])
+    return f"Request: {state['input']}\n{trip}"
+
+def _booking_handoff(state):
+    """Trip context plus the budget's priced lines for the linear booking step"""
+    if not state["budgeter_output"]:
+        return None
+    return f"{_trip_context(state)}\n\nBudget:\n{state.get('budget_brief') or state['budgeter_output']}"
+
+def _with_budget_brief(update):
+    if update.get("budgeter_output"):
+        update["budget_brief"] = budget_brief(update["budgeter_output"], extract_budget_total(update["budgeter_output"]))
+    return update
+
+def _budget_source(state):
+    """Budgeter input, plus the finished budget when the cost model replaces the agent"""
+    handoff = _planner_handoff(state)
+    if BUDGETER_MODE == "llm" or not handoff:
+        BUDGET_SOURCE.inc(source="llm")
+        return handoff, None
+    itinerary = itinerary_from_state(state["itinerary"]) if state.get("itinerary") else None
+    facts = trip_facts(state["input"], itinerary, destination=headline(state["planner_output"]))
+    if facts is None:
+        # Unknown trip length: nothing to compute, so the agent does the whole budget
+        BUDGET_SOURCE.inc(source="llm")
+        return handoff, None
+    estimate = get_cost_model().estimate(facts)
+    BUDGET_SOURCE.inc(source=BUDGETER_MODE)
+    if BUDGETER_MODE == "local":
+        return handoff, render_budget(estimate)
+    return f"{handoff}\n\n{budget_facts(estimate)}", None
+
+# Nodes return only the keys they update so parallel branches never collide
+def planner_node(state: TripState, config: RunnableConfig = None):
+    # Half a JSON object is no use to a reader, so a streamed run plans the itinerary first
+    # and emits its rendered markdown in one piece
+    emit = (config or {}).get("configurable", {}).get("emit")
+    if STRUCTURED_PLANNER and state["input"]:
+        start = time.perf_counter()
+        if emit:
+            emit({"type": "node_start", "node": "Planner"})
+        try:
+            update = _structured_update(run_planner_structured(state["input"]))
+        except ProviderError:
+            update = None
+        if update:
+            _observe_node("Planner", state["input"], update["planner_output"], start)
+            if emit:
+                emit({"type": "token", "node": "Planner", "text": update["planner_output"]})
+            return update
+    return _markdown_update(
+        _agent_update("Planner", "planner_output", run_planner, stream_planner, state["input"], config)
+    )
+
+def budgeter_node(state: TripState, config: RunnableConfig = None):
+    handoff, local = _budget_source(state)
+    if local is not None:
+        run, stream = (lambda _: local), (lambda _: iter([local]))
+    else:
+        run, stream = run_budgeter, stream_budgeter
+    return _with_budget_brief(_agent_update("Budgeter", "budgeter_output", run, stream, handoff, config))
+
+def booking_node(state: TripState, config: RunnableConfig = None):
+    return _agent_update("Booking", "booking_output", run_booking, stream_booking, _booking_handoff(state), config)
 
-# Create state graph with schema
-builder = StateGraph(state_schema=TripState)
+def booking_from_plan_node(state: TripState, config: RunnableConfig = None):
+    return _agent_update("Booking", "booking_output", run_booking, stream_booking, _trip_context(state), config)
 
-# Add nodes with state updates
-def planner_node(state: TripState):
-    state["planner_output"] = run_planner(state["input"])
-    return state
+def extract_budget_total(budget_text):
+    """Best-effort total amount from the budgeter's answer, e.g. "$1,850" """
+    if not budget_text:
+        return None
+    matches = _BUDGET_TOTAL.findall(budget_text)
+    return matches[-1].strip() if matches else None
 
-def budgeter_node(state: TripState):
-    state["budgeter_output"] = run_budgeter(state["planner_output"])
-    return state
+def reconcile_node(state: TripState):
+    """Join for the parallel mode: pass the budget total to the booking advice as a constraint"""
+    booking = state.get("booking_output")
+    total = extract_budget_total(state.get("budgeter_output"))
+    if not booking or not total:
+        return {}
+    return {"booking_output": f"> 💰 **Budget constraint:** the budget breakdown totals about **{total}**. "
+                              f"Prefer the options below that keep the trip within it.\n\n{booking}"}
 
-def booking_node(state: TripState):
-    state["booking_output"] = run_booking(state["budgeter_output"])
-    return state
+# Async counterparts used by graph.ainvoke
+async def aplanner_node(state: TripState):
+    if STRUCTURED_PLANNER and state["input"]:
+        start = time.perf_counter()
+        try:
+            update = _structured_update(await arun_planner_structured(state["input"]))
+        except ProviderError:
+            update = None
+        if update:
+            _observe_node("Planner", state["input"], update["planner_output"], start)
+            return update
+    return _markdown_update(await _aagent_update("Planner", "planner_output", arun_planner, state["input"]))
 
-builder.add_node("Planner", planner_node)
-builder.add_node("Budgeter", budgeter_node)
-builder.add_node("Booking", booking_node)
+async def abudgeter_node(state: TripState):
+    handoff, local = _budget_source(state)
+    arun = arun_budgeter
+    if local is not None:
+        async def arun(_):
+            return local
+    return _with_budget_brief(await _aagent_update("Budgeter", "budgeter_output", arun, handoff))
 
-builder.add_edge("Planner", "Budgeter")
-builder.add_edge("Budgeter", "Booking")
+async def abooking_node(state: TripState):
+    return await _aagent_update("Booking", "booking_output", arun_booking, _booking_handoff(state))
 
-builder.set_entry_point("Planner")
-graph = builder.compile()
+async def abooking_from_plan_node(state: TripState):
+    return await _aagent_update("Booking", "booking_output", arun_booking, _trip_context(state))
 
-def plan_trip(input_data: dict):
-    initial_state = {"input": input_data["input"], 
-                    "planner_output": None,
-                    "budgeter_output": None,
-                    "booking_output": None}
-    result = graph.invoke(initial_state)
+def build_graph(mode="linear"):
+    """Compile the trip graph for one of GRAPH_MODES"""
+    if mode not in GRAPH_MODES:
+        raise ValueError(f"Unknown graph mode '{mode}', expected one of {GRAPH_MODES}")
+    builder = StateGraph(state_schema=TripState)
+    builder.add_node("Planner", RunnableLambda(planner_node, afunc=aplanner_node))
+    builder.add_node("Budgeter", RunnableLambda(budgeter_node, afunc=abudgeter_node))
+    builder.set_entry_point("Planner")
+    builder.add_edge("Planner", "Budgeter")
+
+    if mode == "linear":
+        builder.add_node("Booking", RunnableLambda(booking_node, afunc=abooking_node))
+        builder.add_edge("Budgeter", "Booking")
+    else:
+        builder.add_node("Booking", RunnableLambda(booking_from_plan_node, afunc=abooking_from_plan_node))
+        builder.add_node("Reconcile", reconcile_node)
+        builder.add_edge("Planner", "Booking")
+        builder.add_edge(["Budgeter", "Booking"], "Reconcile")
+    return builder.compile()
+
+graphs = {mode: build_graph(mode) for mode in GRAPH_MODES}
+graph = graphs[DEFAULT_GRAPH_MODE]
+
+def set_budgeter_mode(mode):
+    """Switch how budgets are produced for this process (one of BUDGETER_MODES)"""
+    global BUDGETER_MODE
+    if mode not in BUDGETER_MODES:
+        raise ValueError(f"Unknown budgeter mode '{mode}', expected one of {BUDGETER_MODES}")
+    BUDGETER_MODE = mode
+
+def get_graph(mode=None):
+    mode = mode or DEFAULT_GRAPH_MODE
+    if mode not in graphs:
+        raise ValueError(f"Unknown graph mode '{mode}', expected one of {GRAPH_MODES}")
+    return graphs[mode]
+
+def _initial_state(input_data: dict):
+    return {"input": input_data["input"], 
+            "planner_output": None,
+            "budgeter_output": None,
+            "booking_output": None,
+            "itinerary": None,
+            "planner_brief": None,
+            "budget_brief": None,
+            "errors": {}}
+
+def _cache_mode(mode):
+    # Budgets differ by budgeter mode, so plans are only reused within the same pair
+    return f"{mode or DEFAULT_GRAPH_MODE}/{BUDGETER_MODE}"
+
+def _cached_plan(input_data, mode, use_cache):
+    """An earlier plan for a near-identical request, adapted to this one, or None"""
+    if not (use_cache and SEMANTIC_CACHE_ENABLED):
+        return None
+    hit = get_semantic_cache().lookup(input_data["input"], _cache_mode(mode))
+    return adapt_result(hit[0], input_data["input"], hit[1]) if hit else None
+
+def _remember_plan(input_data, mode, use_cache, result):
+    if use_cache and SEMANTIC_CACHE_ENABLED and result.get("booking_output") and not result.get("errors"):
+        get_semantic_cache().store(input_data["input"], _cache_mode(mode),
+                                   {key: value for key, value in result.items() if key not in ("input", "errors", "cache")})
+
+def plan_trip(input_data: dict, mode=None, use_cache=True):
+    """Plan a trip; a near-duplicate of an earlier request reuses that plan (see utils.semantic_cache)"""
+    get_graph(mode)
+    cached = _cached_plan(input_data, mode, use_cache)
+    if cached:
+        return cached
+    result = get_graph(mode).invoke(_initial_state(input_data))
+    _remember_plan(input_data, mode, use_cache, result)
     return result
+
+async def aplan_trip(input_data: dict, mode=None, use_cache=True):
+    """Plan a trip on the running event loop; many plans can share one loop"""
+    get_graph(mode)
+    # The semantic cache is SQLite plus a NumPy scan, so it runs off the event loop
+    cached = await asyncio.to_thread(_cached_plan, input_data, mode, use_cache)
+    if cached:
+        return cached
+    result = await get_graph(mode).ainvoke(_initial_state(input_data))
+    await asyncio.to_thread(_remember_plan, input_data, mode, use_cache, result)
+    return result
+
+def _cached_events(result, start):
+    """The events of a normal run, replayed from a semantic cache hit"""
+    nodes = ["Planner", "Budgeter", "Booking"]
+    keys = ["planner_output", "budgeter_output", "booking_output"]
+    for node, key in zip(nodes, keys):
+        yield {"type": "node_end", "node": node, "output": result.get(key)}
+    seconds = round(time.perf_counter() - start, 3)
+    timings = {"time_to_first_token": seconds, "nodes": {}, "total_seconds": seconds, "cache": result["cache"]}
+    yield {"type": "done", "result": result, "timings": timings}
+
+def stream_plan_trip(input_data: dict, mode=None, use_cache=True, cancel=None):
+    """Plan a trip and yield progress events as they happen.
+
+    Events are dicts with a "type" of:
+      node_start - a node began running
+      token      - a chunk of a node's output ("node", "text")
+      node_end   - LangGraph finished a node ("node", "output", "error" if it failed)
+      done       - final state plus timings, including time-to-first-token
+      error      - the graph raised ("error")
+
+    A semantic cache hit yields only the node_end events and done (timings["cache"] set).
+    Setting `cancel` (a threading.Event) stops the graph before its next node; the
+    generator then ends once the node that was running has finished.
+    """
+    start = time.perf_counter()
+    cached = _cached_plan(input_data, mode, use_cache)
+    if cached:
+        yield from _cached_events(cached, start)
+        return
+    events = queue.Queue()
+
+    def run():
+        try:
+            config = {"configurable": {"emit": events.put}}
+            updates = get_graph(mode).stream(_initial_state(input_data), config=config, stream_mode="updates")
+            try:
+                for update in updates:
+                    for node, state in update.items():
+                        events.put({"type": "node_end", "node": node, "state": state})
+                    if cancel is not None and cancel.is_set():
+                        break
+            finally:
+                updates.close()
+        except Exception as e:
+            events.put({"type": "error", "error": str(e)})
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, name="plan-trip-stream", daemon=True).start()
+
+    output_keys = {
+        "Planner": "planner_output",
+        "Budgeter": "budgeter_output",
+        "Booking": "booking_output",
+        "Reconcile": "booking_output"
+    }
+    result = _initial_state(input_data)
+    timings = {"time_to_first_token": None, "nodes": {}}
+    node_started = {}
+    while True:
+        event = events.get()
+        if event is None:
+            break
+        now = time.perf_counter() - start
+        if event["type"] == "node_start":
+            node_started[event["node"]] = now
+        elif event["type"] == "token":
+            if timings["time_to_first_token"] is None:
+                timings["time_to_first_token"] = round(now, 3)
+            timings["nodes"].setdefault(event["node"], {}).setdefault(
+                "time_to_first_token", round(now - node_started.get(event["node"], 0), 3)
+            )
+        elif event["type"] == "node_end":
+            update = event.pop("state") or {}
+            errors = update.pop("errors", None)
+            if errors:
+                result["errors"] = _merge_errors(result["errors"], errors)
+                event["error"] = errors.get(event["node"])
+            result.update(update)
+            key = output_keys.get(event["node"])
+            if key and key in update:
+                event["output"] = update[key]
+            timings["nodes"].setdefault(event["node"], {})["seconds"] = round(
+                now - node_started.get(event["node"], now), 3
+            )
+        yield event
+    if cancel is not None and cancel.is_set():
+        return
+    timings["total_seconds"] = round(time.perf_counter() - start, 3)
+    _remember_plan(input_data, mode, use_cache, result)
+    yield {"type": "done", "result": result, "timings": timings}
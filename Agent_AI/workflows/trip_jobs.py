@@ -0,0 +1,102 @@
+"""Trip planning as a background job, so the Streamlit script only submits and polls."""
+import base64
+import os
+
+from api.client import TripPlannerClient
+from utils.jobs import get_job_queue, register_job_handler
+from workflows.trip_graph import stream_plan_trip
+
+TRIP_JOB = "plan_trip"
+
+
+def destination_visuals(destination, include_ai_generation=False):
+    """Visual data for a destination without touching Streamlit, with AI images base64-encoded for storage"""
+    from utils.image_generation import (
+        IMAGE_MODELS, destination_image_jobs, generate_images_concurrently, get_google_images_urls,
+        get_sample_images_urls
+    )
+    visuals = {"google_urls": get_google_images_urls(destination), "sample_urls": [], "generated_images": []}
+    try:
+        visuals["sample_urls"] = get_sample_images_urls(destination)
+    except Exception:
+        pass
+    if include_ai_generation and os.getenv("HUGGINGFACE_API_KEY"):
+        try:
+            images = generate_images_concurrently(destination_image_jobs(destination, 3), models=IMAGE_MODELS[:3])
+        except Exception:
+            images = []
+        visuals["generated_images"] = [
+            {**image, "image_data": base64.b64encode(image["image_data"]).decode("ascii")}
+            for image in images if image is not None
+        ]
+    visuals["success"] = True
+    return visuals
+
+
+def decode_visuals(visuals):
+    """Inverse of the base64 step in destination_visuals"""
+    return {
+        **visuals,
+        "generated_images": [
+            {**image, "image_data": base64.b64decode(image["image_data"])}
+            for image in visuals.get("generated_images", [])
+        ],
+    }
+
+
+def run_trip_job(payload, report):
+    """Stream the trip graph, publishing per-node status and partial text, then gather visuals"""
+    progress = {"stage": "planning", "node": "Planner", "text": {}, "finished_nodes": []}
+    report(progress, force=True)
+    result, timings = None, {}
+    # With TRAVEL_API_URL set the worker is just a client of the planning service
+    api_url = os.getenv("TRAVEL_API_URL")
+    if api_url:
+        events = TripPlannerClient(api_url).stream_plan_trip(payload["input"])
+    else:
+        events = stream_plan_trip({"input": payload["input"]})
+    for event in events:
+        if event["type"] == "node_start":
+            progress["node"] = event["node"]
+            progress["text"][event["node"]] = ""
+            report(progress, force=True)
+        elif event["type"] == "token":
+            progress["text"][event["node"]] = progress["text"].get(event["node"], "") + event["text"]
+            report(progress)
+        elif event["type"] == "node_end":
+            progress["finished_nodes"].append(event["node"])
+            report(progress, force=True)
+        elif event["type"] == "error":
+            raise RuntimeError(event["error"])
+        elif event["type"] == "done":
+            result, timings = event["result"], event["timings"]
+    if result is None:
+        # A dropped connection or a stream cut short ends without a done event
+        raise RuntimeError("The trip plan stream ended before the plan was finished")
+
+    visuals = None
+    if payload.get("destination"):
+        progress["stage"] = "visuals"
+        report(progress, force=True)
+        try:
+            visuals = destination_visuals(payload["destination"], payload.get("ai_images", False))
+        except Exception:
+            visuals = None
+    return {
+        "plan": {key: result.get(key) for key in ("planner_output", "budgeter_output", "booking_output", "itinerary", "cache", "errors")},
+        "timings": timings,
+        "visuals": visuals,
+    }
+
+
+register_job_handler(TRIP_JOB, run_trip_job)
+
+
+def submit_trip_job(input_text, destination="", ai_images=False):
+    """Queue a trip plan and return its job id"""
+    return get_job_queue().submit(TRIP_JOB, {"input": input_text, "destination": destination,
+                                             "ai_images": ai_images})
+
+
+def get_trip_job(job_id):
+    return get_job_queue().get(job_id)